@@ -1,17 +1,99 @@
+import time
+import weakref
+import threading
 from psycopg2 import pool, extensions
 from .IConnectionManager import IConnectionManager
+from .Histogram import Histogram
+from .FairSlots import FairSlots
 
 class ConnMngPsql(IConnectionManager):
+    POOL_OPTIONS = {
+        "pool_timeout": None,
+        "pool_max_lifetime": None,
+        "pool_validate_idle": None,
+        "pool_prewarm": True,
+    }
+    
     def connect(self, **kwargs) -> IConnectionManager:
+        """
+        Args:
+            pool_timeout (float, optional): seconds to wait for a free connection. None waits forever.
+            pool_max_lifetime (float, optional): seconds after which a connection is closed and replaced. None keeps it.
+            pool_validate_idle (float, optional): ping a connection with 'SELECT 1' on checkout when it was idle longer than this. None only checks the closed flag.
+            pool_prewarm (bool, optional): open the first connection in connect() and the rest of minconn in a background thread.
+                a bad dsn or credentials still fail connect(). Defaults to True.
+                it runs only here. a connection dropped for its lifetime or validation is replaced on the checkout that dropped it,
+                and one closed while in use is replaced by a later checkout, so the pool isn't topped up in the background.
+            **kwargs: minconn, maxconn and the arguments of psycopg2.connect.
+
+        Returns:
+            IConnectionManager: self
+        """
         try:
             self.close()
             self._kwargs.update(kwargs)
-            
-            self._conn_pool = pool.ThreadedConnectionPool(**self._kwargs)
-            return self.instance
+
+            pool_kwargs = {key: value for key, value in self._kwargs.items() if key not in self.POOL_OPTIONS}
+            self._options = {key: self._kwargs.get(key, default) for key, default in self.POOL_OPTIONS.items()}
+            minconn, maxconn = pool_kwargs.pop("minconn", 1), pool_kwargs.pop("maxconn", 1)
+            self._conn_pool = pool.ThreadedConnectionPool(0 if self._options["pool_prewarm"] else minconn, maxconn, **pool_kwargs)
+            self._conn_pool.minconn = minconn
+            self._slots = FairSlots(maxconn)
+            self._born = weakref.WeakKeyDictionary()
+            self._last_used = weakref.WeakKeyDictionary()
+            self._idle = weakref.WeakSet()
+            self._stats_lock = threading.Lock()
+            self._stats = {"checkouts": 0, "timeouts": 0, "errors": 0, "discarded": 0, "recycled": 0, "in_use": 0}
+            self._wait_histogram = Histogram()
+            if self._options["pool_prewarm"] and minconn > 0:
+                # the first connection is opened here, so connect() fails like without prewarm.
+                try:
+                    self._putIdle(self._conn_pool, self._conn_pool.getconn())
+                except Exception:
+                    self.close()
+                    raise
+                if minconn > 1:
+                    threading.Thread(target=self._prewarm, args=(self._conn_pool, minconn), daemon=True).start()
+            return self
         except Exception:
             raise
     
+    def _prewarm(self, conn_pool: pool.ThreadedConnectionPool, minconn: int) -> None:
+        conns = []
+        try:
+            for _ in range(minconn):
+                if not self._slots.acquire(0):
+                    break
+                try:
+                    conns.append(conn_pool.getconn())
+                except Exception:
+                    self._slots.release()
+                    self._count("errors")
+                    break
+        finally:
+            for conn in conns:
+                self._putIdle(conn_pool, conn)
+                self._slots.release()
+    
+    def _putIdle(self, conn_pool: pool.ThreadedConnectionPool, conn: extensions.connection) -> None:
+        # marked before putconn, so a thread taking it right after the put can't be undone by the mark.
+        closed = bool(conn.closed)
+        if not closed:
+            self._idle.add(conn)
+        conn_pool.putconn(conn, close=closed)
+        if conn.closed:
+            # the pool keeps at most minconn idle connections and closes the rest.
+            self._idle.discard(conn)
+    
+    def _getIdle(self) -> extensions.connection:
+        conn = self._conn_pool.getconn()
+        self._idle.discard(conn)
+        return conn
+    
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += delta
+    
     def isConnect(self) -> bool:
         return self._conn_pool is not None
     
@@ -20,16 +102,81 @@ class ConnMngPsql(IConnectionManager):
             self._conn_pool.closeall()
             self._conn_pool = None
     
-    def getConnection(self, auto_commit=True, **kwargs) -> extensions.connection:
+    def _isAlive(self, conn: extensions.connection) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        born = self._born.setdefault(conn, now)
+        max_lifetime = self._options["pool_max_lifetime"]
+        if max_lifetime is not None and now - born > max_lifetime:
+            self._count("recycled")
+            return False
+        validate_idle = self._options["pool_validate_idle"]
+        if validate_idle is not None and now - self._last_used.get(conn, born) > validate_idle:
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception:
+                return False
+        return True
+    
+    def getConnection(self, auto_commit=True, timeout: float = None, **kwargs) -> extensions.connection:
+        """
+        Args:
+            auto_commit (bool, optional): autocommit mode of the connection. Defaults to True.
+            timeout (float, optional): seconds to wait for a free connection. Defaults to pool_timeout of connect().
+
+        Raises:
+            RuntimeError: Occurs when the manager is not connected.
+            pool.PoolError: Occurs when no connection is freed within the timeout.
+
+        Returns:
+            extensions.connection: pooled connection.
+        """
+        self._checkConnect()
+        timeout = self._options["pool_timeout"] if timeout is None else timeout
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout):
+            self._count("timeouts")
+            raise pool.PoolError(f"connection pool checkout timed out after {timeout} seconds")
         try:
-            conn = self._conn_pool.getconn()
+            conn = self._getIdle()
+            while not self._isAlive(conn):
+                self._count("discarded")
+                self._conn_pool.putconn(conn, close=True)
+                conn = self._getIdle()
             conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT if auto_commit else extensions.ISOLATION_LEVEL_DEFAULT)
-            return conn
         except Exception:
+            self._slots.release()
+            self._count("errors")
             raise
+        self._wait_histogram.observe(time.perf_counter() - start)
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+        return conn
     
     def releaseConnection(self, conn) -> None:
         try:
-            self._conn_pool.putconn(conn)
+            self._last_used[conn] = time.monotonic()
+            self._putIdle(self._conn_pool, conn)
         except Exception:
+            self._count("errors")
             raise
+        finally:
+            self._count("in_use", -1)
+            self._slots.release()
+    
+    def getStats(self) -> dict:
+        """
+        Returns:
+            dict: pool counters (checkouts, timeouts, errors, discarded, recycled), gauges (in_use, idle, waiting) and the checkout wait histogram in seconds.
+        """
+        self._checkConnect()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["idle"] = len(self._idle)
+        stats["waiting"] = self._slots.waiting()
+        stats["wait"] = self._wait_histogram.getInfo()
+        return stats
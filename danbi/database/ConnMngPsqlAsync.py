@@ -1,3 +1,4 @@
+import contextlib
 import asyncpg
 from .IConnectionManager import IConnectionManager
 
@@ -8,7 +9,7 @@ class ConnMngPsqlAsync(IConnectionManager):
             self._kwargs.update(kwargs)
             
             self._conn_pool = await asyncpg.create_pool(**self._kwargs)
-            return self.instance
+            return self
         except Exception:
             raise
     
@@ -18,8 +19,84 @@ class ConnMngPsqlAsync(IConnectionManager):
     async def close(self, **kwargs) -> None:
         if self._conn_pool is not None:
             await self._conn_pool.close()
+            self._conn_pool = None
+    
+    def connection(self, **kwargs) -> asyncpg.pool.PoolAcquireContext:
+        """scope a pooled connection with 'async with'. the connection is released even if the block raises.
+        inside transaction() the connection of the transaction is used.
+        ex) async with manager.connection() as conn:
+
+        Returns:
+            asyncpg.pool.PoolAcquireContext: async context manager of a pooled connection.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return self._pinnedScope(pinned)
+        self._checkConnect()
+        return self._conn_pool.acquire(**kwargs)
+    
+    @contextlib.asynccontextmanager
+    async def _pinnedScope(self, conn):
+        yield conn
+    
+    @contextlib.asynccontextmanager
+    async def pin(self, **kwargs):
+        """pin one connection to the current task until the block ends without opening a transaction.
+        connection() inside the block returns it, so a series of calls skips the pool acquire and release of each call.
+
+        Yields:
+            asyncpg.pool.PoolConnectionProxy: pinned connection.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        self._checkConnect()
+        async with self._conn_pool.acquire(**kwargs) as conn:
+            token = self._pinned.set(conn)
+            try:
+                yield conn
+            finally:
+                self._pinned.reset(token)
+    
+    @contextlib.asynccontextmanager
+    async def transaction(self, **kwargs):
+        """pin one connection to the current task until the block ends. connection() inside the block returns it,
+        so every call joins one transaction that is committed once at the end and rolled back if the block raises.
+        a nested transaction() becomes a savepoint. statements of a transaction have to be awaited one by one.
+
+        Yields:
+            asyncpg.pool.PoolConnectionProxy: connection of the transaction.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            async with pinned.transaction():
+                yield pinned
+            return
+        self._checkConnect()
+        async with self._conn_pool.acquire(**kwargs) as conn:
+            async with conn.transaction():
+                token = self._pinned.set(conn)
+                try:
+                    yield conn
+                finally:
+                    self._pinned.reset(token)
+    
+    @contextlib.asynccontextmanager
+    async def savepoint(self):
+        """roll back only the statements of the block if it raises. the exception is propagated.
+
+        Raises:
+            RuntimeError: Occurs when it is used outside of transaction(). a pin() without a transaction is outside too.
+        """
+        pinned = self._pinned.get()
+        if pinned is None or not pinned.is_in_transaction():
+            raise RuntimeError("savepoint() has to be used inside transaction().")
+        async with pinned.transaction():
+            yield
     
     async def getConnection(self, **kwargs) -> asyncpg.pool.PoolConnectionProxy:
+        self._checkConnect()
         try:
             conn = await self._conn_pool.acquire()
             return conn
@@ -0,0 +1,167 @@
+import time
+import itertools
+import threading
+from typing import List
+from .IConnectionManager import IConnectionManager
+
+class _Node:
+    """Member manager of ConnMngRouting with its load and health state.
+    """
+    def __init__(self, name: str, manager: IConnectionManager):
+        self.name = name
+        self.manager = manager
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_at = None
+
+class ConnMngRouting(IConnectionManager):
+    """Routes read only connections to replicas and everything else to the primary.
+    """
+    def connect(self, primary: IConnectionManager = None, replicas: List[IConnectionManager] = None, eject_failures: int = 3, readmit_after: float = 30.0, **kwargs) -> IConnectionManager:
+        """
+        Args:
+            primary (IConnectionManager): connected manager of the primary. writes and transactions always use it.
+            replicas (List[IConnectionManager], optional): connected managers of the read replicas. Defaults to None.
+            eject_failures (int, optional): consecutive failures after which a replica is ejected. Defaults to 3.
+            readmit_after (float, optional): seconds after which an ejected replica gets a trial request again. Defaults to 30.0.
+
+        Returns:
+            IConnectionManager: self
+        """
+        try:
+            self.close()
+            self._kwargs.update(kwargs)
+
+            self._primary = _Node("primary", primary)
+            self._replicas = [_Node(f"replica{idx}", replica) for idx, replica in enumerate(replicas or [])]
+            self._eject_failures = eject_failures
+            self._readmit_after = readmit_after
+            self._checked_out = {}
+            self._turn = itertools.count()
+            self._lock = threading.Lock()
+            self._conn_pool = [self._primary] + self._replicas
+            return self
+        except Exception:
+            raise
+    
+    def isConnect(self) -> bool:
+        return self._conn_pool is not None
+    
+    def close(self, **kwargs) -> None:
+        if self._conn_pool is not None:
+            for node in self._conn_pool:
+                node.manager.close(**kwargs)
+            self._conn_pool = None
+    
+    def _candidates(self, read_only: bool) -> List[_Node]:
+        if not read_only:
+            return [self._primary]
+        now = time.monotonic()
+        with self._lock:
+            trials, candidates = [], []
+            for node in self._replicas:
+                if node.ejected_at is None:
+                    candidates.append(node)
+                elif now - node.ejected_at >= self._readmit_after:
+                    # half open: the next trial is allowed only after another readmit_after.
+                    # it goes first, otherwise a healthy replica would take the request and waste the trial.
+                    node.ejected_at = now
+                    trials.append(node)
+            if len(candidates) > 1:
+                # rotate before the stable sort, so replicas with the same load take turns.
+                offset = next(self._turn) % len(candidates)
+                candidates = candidates[offset:] + candidates[:offset]
+                candidates.sort(key=lambda node: node.outstanding)
+        return trials + candidates + [self._primary]
+    
+    def _succeed(self, node: _Node) -> None:
+        with self._lock:
+            node.failures = 0
+            node.ejected_at = None
+    
+    def _fail(self, node: _Node) -> None:
+        with self._lock:
+            node.errors += 1
+            node.failures += 1
+            if node is not self._primary and node.failures >= self._eject_failures:
+                if node.ejected_at is None:
+                    node.ejections += 1
+                node.ejected_at = time.monotonic()
+    
+    def getConnection(self, auto_commit=True, read_only: bool = False, **kwargs):
+        """
+        Args:
+            auto_commit (bool, optional): autocommit mode of the connection. Defaults to True.
+            read_only (bool, optional): use the replica with the least outstanding requests. the primary is used when no replica is available. Defaults to False.
+
+        Returns:
+            connection: connection of the chosen node.
+        """
+        self._checkConnect()
+        error = None
+        for node in self._candidates(read_only):
+            with self._lock:
+                node.outstanding += 1
+                node.requests += 1
+            try:
+                conn = node.manager.getConnection(auto_commit, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    node.outstanding -= 1
+                self._fail(node)
+                error = e
+                continue
+            with self._lock:
+                self._checked_out[id(conn)] = node
+            if node.failures > 0:
+                self._succeed(node)
+            return conn
+        raise error
+    
+    def releaseConnection(self, conn) -> None:
+        with self._lock:
+            node = self._checked_out.pop(id(conn))
+            node.outstanding -= 1
+        if getattr(conn, "closed", False):
+            self._fail(node)
+        node.manager.releaseConnection(conn)
+    
+    def checkHealth(self) -> dict:
+        """ping every node with 'SELECT 1'. a replica that answers is readmitted and a failing one counts a failure.
+
+        Returns:
+            dict: health of each node by name.
+        """
+        self._checkConnect()
+        health = {}
+        for node in self._conn_pool:
+            try:
+                with node.manager.connection() as conn:
+                    self._run(conn, "SELECT 1")
+                self._succeed(node)
+                health[node.name] = True
+            except Exception:
+                self._fail(node)
+                health[node.name] = False
+        return health
+    
+    def getStats(self) -> dict:
+        """
+        Returns:
+            dict: outstanding, requests, errors, ejections and ejected of each node by name.
+        """
+        self._checkConnect()
+        with self._lock:
+            return {
+                node.name: {
+                    "outstanding": node.outstanding,
+                    "requests": node.requests,
+                    "errors": node.errors,
+                    "ejections": node.ejections,
+                    "ejected": node.ejected_at is not None,
+                }
+                for node in self._conn_pool
+            }
@@ -8,7 +8,7 @@ class ConnMngSqlite(IConnectionManager):
             self._kwargs.update(kwargs)
             
             self._conn_pool = PooledDB(**self._kwargs)
-            return self.instance
+            return self
         except Exception:
             raise
     
@@ -17,10 +17,14 @@ class ConnMngSqlite(IConnectionManager):
     
     def close(self, **kwargs) -> None:
         if self._conn_pool is not None:
-            self._conn_pool._close_idle()
+            self._conn_pool.close()
             self._conn_pool = None
     
+    def _begin(self, conn) -> None:
+        self._run(conn, "BEGIN")
+    
     def getConnection(self, auto_commit=True, **kwargs) -> PooledDedicatedDBConnection:
+        self._checkConnect()
         try:
             conn = self._conn_pool.connection()
             return conn
@@ -0,0 +1,136 @@
+import time
+import sqlite3
+import weakref
+import threading
+from .IConnectionManager import IConnectionManager
+from .Histogram import Histogram
+from .FairSlots import FairSlots
+
+class ConnMngSqliteWAL(IConnectionManager):
+    """SQLite manager tuned for concurrent readers. every thread reads on its own connection and
+    writes are serialized in arrival order on a single writer connection.
+    """
+    PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    }
+    
+    def connect(self, **kwargs) -> IConnectionManager:
+        """
+        Args:
+            database (str): path of the database file. WAL needs a file, so ':memory:' is not supported.
+            journal_mode (str, optional): Defaults to "WAL".
+            synchronous (str, optional): OFF, NORMAL, FULL or EXTRA. NORMAL is durable on WAL except for a power loss. Defaults to "NORMAL".
+            mmap_size (int, optional): bytes of the file read through memory mapping. Defaults to 256MB.
+            cache_size (int, optional): page cache per connection. negative values are KiB. Defaults to -65536 (64MB).
+            temp_store (str, optional): DEFAULT, FILE or MEMORY. Defaults to "MEMORY".
+            busy_timeout (int, optional): milliseconds to wait for a lock held by another process. Defaults to 5000.
+            write_timeout (float, optional): seconds to wait for the writer connection. None waits forever.
+            **kwargs: other arguments of sqlite3.connect.
+
+        Raises:
+            ValueError: Occurs when the database is ':memory:'.
+
+        Returns:
+            IConnectionManager: self
+        """
+        try:
+            self.close()
+            self._kwargs.update(kwargs)
+
+            self._connect_kwargs = {key: value for key, value in self._kwargs.items() if key not in self.PRAGMAS and key != "write_timeout"}
+            if self._connect_kwargs.get("database") == ":memory:":
+                raise ValueError("ConnMngSqliteWAL needs a database file. use ConnMngSqlite for ':memory:'.")
+            self._pragmas = {key: self._kwargs.get(key, default) for key, default in self.PRAGMAS.items()}
+            self._write_timeout = self._kwargs.get("write_timeout")
+            self._readers = weakref.WeakKeyDictionary()
+            self._readers_lock = threading.Lock()
+            self._writer_slot = FairSlots(1)
+            self._write_histogram = Histogram()
+            self._stats = {"reads": 0, "writes": 0, "timeouts": 0}
+            self._conn_pool = self._open()
+            return self
+        except Exception:
+            raise
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(**self._connect_kwargs, isolation_level=None, check_same_thread=False)
+        for name, value in self._pragmas.items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        return conn
+    
+    def isConnect(self) -> bool:
+        return self._conn_pool is not None
+    
+    def close(self, **kwargs) -> None:
+        if self._conn_pool is not None:
+            with self._readers_lock:
+                readers = list(self._readers.values())
+                self._readers.clear()
+            for conn in readers:
+                conn.close()
+            self._conn_pool.close()
+            self._conn_pool = None
+    
+    def _reader(self) -> sqlite3.Connection:
+        thread = threading.current_thread()
+        with self._readers_lock:
+            conn = self._readers.get(thread)
+            if conn is None:
+                conn = self._open()
+                self._readers[thread] = conn
+            self._stats["reads"] += 1
+        return conn
+    
+    def getConnection(self, auto_commit=True, read_only: bool = False, timeout: float = None, **kwargs) -> sqlite3.Connection:
+        """
+        Args:
+            auto_commit (bool, optional): ignored. transaction() opens 'BEGIN IMMEDIATE' on the writer connection. Defaults to True.
+            read_only (bool, optional): use the reader connection of the current thread. Defaults to False.
+            timeout (float, optional): seconds to wait for the writer connection. Defaults to write_timeout of connect().
+
+        Raises:
+            RuntimeError: Occurs when the manager is not connected.
+            TimeoutError: Occurs when the writer connection is not freed within the timeout.
+
+        Returns:
+            sqlite3.Connection: reader connection of the thread or the shared writer connection.
+        """
+        self._checkConnect()
+        if read_only:
+            return self._reader()
+        timeout = self._write_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        if not self._writer_slot.acquire(timeout):
+            with self._readers_lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"sqlite writer checkout timed out after {timeout} seconds")
+        self._write_histogram.observe(time.perf_counter() - start)
+        with self._readers_lock:
+            self._stats["writes"] += 1
+        return self._conn_pool
+    
+    def releaseConnection(self, conn) -> None:
+        if conn is self._conn_pool:
+            self._writer_slot.release()
+    
+    def _begin(self, conn) -> None:
+        self._run(conn, "BEGIN IMMEDIATE")
+    
+    def getStats(self) -> dict:
+        """
+        Returns:
+            dict: counters (reads, writes, timeouts), gauges (readers, waiting) and the writer wait histogram in seconds.
+        """
+        self._checkConnect()
+        with self._readers_lock:
+            stats = dict(self._stats)
+            stats["readers"] = len(self._readers)
+        stats["waiting"] = self._writer_slot.waiting()
+        stats["wait"] = self._write_histogram.getInfo()
+        return stats
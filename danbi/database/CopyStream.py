@@ -0,0 +1,86 @@
+import io
+import json
+from typing import Any, Iterable
+import numpy as np
+
+_END = object()
+
+class CopyStream(io.TextIOBase):
+    """File-like object that encodes rows to the postgresql COPY text format on demand.
+    rows are pulled from the iterable only as psycopg2 reads, so the whole data is never materialized.
+    """
+    def __init__(self, rows: Iterable):
+        """
+        Args:
+            rows (Iterable): iterable of row sequences. None and NaN values are written as NULL.
+                dicts are written as json, and lists, tuples and numpy arrays as array literals. ex) {1,2}, {"a","b"}
+        """
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def _isNull(self, value: Any) -> bool:
+        if value is None:
+            return True
+        try:
+            return bool(value != value)
+        except TypeError:
+            return True
+        except ValueError:
+            return False
+    
+    def _element(self, value: Any) -> str:
+        # an element of an array literal. strings are always quoted, so they may hold commas, braces and spaces.
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        if isinstance(value, (list, tuple)):
+            return "{" + ",".join([self._element(element) for element in value]) + "}"
+        if self._isNull(value):
+            return "NULL"
+        if isinstance(value, (bool, int, float)):
+            return str(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = "\\x" + bytes(value).hex()
+        elif isinstance(value, dict):
+            value = json.dumps(value, ensure_ascii=False)
+        return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+    
+    def _encode(self, value: Any) -> str:
+        if value is None:
+            return "\\N"
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return "\\\\x" + bytes(value).hex()
+        if isinstance(value, (dict, list, tuple, np.ndarray)):
+            text = json.dumps(value, ensure_ascii=False) if isinstance(value, dict) else self._element(value)
+        else:
+            try:
+                if value != value:
+                    return "\\N"
+            except TypeError:
+                return "\\N"
+            except ValueError:
+                pass
+            text = str(value)
+        return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size is None or size < 0 or length < size:
+            row = next(self._rows, _END)
+            if row is _END:
+                break
+            line = "\t".join([self._encode(value) for value in row]) + "\n"
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+
+        data = "".join(chunks)
+        if size is None or size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
@@ -1,127 +1,541 @@
-from typing import Union
+import io
+import uuid
+import weakref
+import itertools
+import threading
+from typing import Union, Iterator, Iterable, List
 import pandas as pd
+import psycopg2
+from psycopg2 import extras, extensions, sql
 from .IDB import IDB
+from .IConnectionManager import IConnectionManager
+from .CopyStream import CopyStream
+from .StatementCache import StatementCache
+from .pgbinary import decodeCopyBinary
+from .pgrecords import decodeRecords
+from ..mapping.IMapper import IMapper
 
 class DBPsql(IDB):
+    _prepared_ids = itertools.count(1)
+    
+    def __init__(self, manager: IConnectionManager, mapper: IMapper, name: str = None):
+        super().__init__(manager, mapper, name)
+        self._prepared_size = 0
+        self._prepared_generation = 0
+        self._prepared_conns = weakref.WeakKeyDictionary()
+        self._prepared_lock = threading.Lock()
+    
+    def setPreparedStatement(self, max_size: int = 128) -> IDB:
+        """execute mapper sqls with server-side PREPARE/EXECUTE. statements are cached per connection with
+        (mapper name, rendered sql) as the key, and dropped when the mapper is reloaded.
+        sqls that can not be prepared (ex. multiple statements, DDL) fall back to a plain execute.
+        statements prepared before the call are deallocated on the next use of their connection by this db.
+
+        Args:
+            max_size (int, optional): max number of prepared statements per connection. 0 disables it. Defaults to 128.
+
+        Returns:
+            IDB: self
+        """
+        with self._prepared_lock:
+            self._prepared_size = max_size
+            self._prepared_generation += 1
+
+        return self
+    
+    def getStatementCacheInfo(self) -> dict:
+        """
+        Returns:
+            dict: hit/miss statistics of the statement caches. "prepared" sums the per-connection prepared statement caches.
+        """
+        info = super().getStatementCacheInfo()
+        prepared = {"hits": 0, "misses": 0, "size": 0, "connections": 0}
+        with self._prepared_lock:
+            conns = list(self._prepared_conns.items())
+        for _, (_, _, cache) in conns:
+            conn_info = cache.getInfo()
+            prepared["hits"] += conn_info["hits"]
+            prepared["misses"] += conn_info["misses"]
+            prepared["size"] += conn_info["size"]
+            prepared["connections"] += 1
+        total = prepared["hits"] + prepared["misses"]
+        prepared["hit_rate"] = prepared["hits"] / total if total > 0 else 0.0
+        info["prepared"] = prepared
+
+        return info
+    
+    def _connStatements(self, conn) -> StatementCache:
+        # statements of an older mapper or setPreparedStatement() are deallocated here, because the connection
+        # may be in use by another thread when they become stale. None when prepared statements are disabled.
+        version = self._mapper.getVersion()
+        with self._prepared_lock:
+            size, generation = self._prepared_size, self._prepared_generation
+            entry = self._prepared_conns.get(conn)
+            if entry is None and size > 0:
+                entry = [version, generation, StatementCache(size)]
+                self._prepared_conns[conn] = entry
+        if entry is None:
+            return None
+        if entry[0] != version or entry[1] != generation:
+            # only the statements of this db, another db may share the connection.
+            with conn.cursor() as cursor:
+                for _, (statement_name, _) in entry[2].clear():
+                    if statement_name is not None:
+                        cursor.execute(f"DEALLOCATE {statement_name}")
+            if entry[1] != generation:
+                if size <= 0:
+                    with self._prepared_lock:
+                        self._prepared_conns.pop(conn, None)
+                    return None
+                entry[2] = StatementCache(size)
+            entry[0], entry[1] = version, generation
+        return entry[2]
+    
+    def _prepare(self, cursor, raw_sql: str, values: Union[dict, tuple]) -> tuple:
+        if not values:
+            try:
+                psql_sql, names = raw_sql % (), None
+            except (TypeError, ValueError):
+                psql_sql, names = raw_sql, None
+        elif isinstance(values, dict):
+            psql_sql, names = self._pyformatPositions(raw_sql)
+        else:
+            psql_sql, names = raw_sql % tuple(f"${idx}" for idx in range(1, len(values) + 1)), None
+
+        statement_name = f"danbi_stmt_{next(self._prepared_ids)}"
+        cursor.execute(f"PREPARE {statement_name} AS {psql_sql}")
+        return statement_name, names
+    
+    def _executePrepared(self, cursor, mapper_name: str, raw_sql: str, values: Union[dict, tuple]) -> bool:
+        statements = self._connStatements(cursor.connection)
+        if statements is None:
+            return False
+        key = (mapper_name, raw_sql)
+        statement = statements.get(key)
+        if statement is None:
+            try:
+                statement = self._prepare(cursor, raw_sql, values)
+            except (psycopg2.Error, TypeError, KeyError, ValueError):
+                statement = (None, None)
+            for _, (evicted_name, _) in statements.put(key, statement):
+                if evicted_name is not None:
+                    cursor.execute(f"DEALLOCATE {evicted_name}")
+        statement_name, names = statement
+        if statement_name is None:
+            return False
+
+        if not values:
+            args = []
+        elif names is not None:
+            args = [values[name] for name in names]
+        else:
+            args = list(values)
+        if len(args) > 0:
+            cursor.execute(f"EXECUTE {statement_name} ({', '.join(['%s'] * len(args))})", args)
+        else:
+            cursor.execute(f"EXECUTE {statement_name}")
+        return True
+    
+    def _execute(self, cursor, raw_sql: str, values: Union[dict, tuple], mapper_name: str = None) -> None:
+        # a disabled cache still goes through _executePrepared() while connections hold statements to deallocate.
+        if mapper_name is not None and (self._prepared_size > 0 or len(self._prepared_conns) > 0) and cursor.connection.autocommit:
+            if self._executePrepared(cursor, mapper_name, raw_sql, values):
+                return
+        try:
+            cursor.execute(raw_sql, values)
+        except (TypeError, ValueError, IndexError):
+            # client side formatting failed (ex. a literal '%' without parameters), nothing was sent to the server.
+            cursor.execute(raw_sql)
+    
     def query(self, mapper_name: str, values: Union[dict, tuple] = {}, print_sql: bool = False) -> list:
-        with self._lock_q:
+        def load() -> list:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
-            return self.queryRaw(raw_sql, values)
+            return self.queryRaw(raw_sql, values, mapper_name)
+        with self._trace(mapper_name) as trace:
+            return self._cached("query", mapper_name, values, load, print_sql=print_sql)
     
-    def queryRaw(self, raw_sql: str, values: tuple = {}) -> list:
-        try:
-        # with self._lock_qr:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
+    def queryRaw(self, raw_sql: str, values: tuple = {}, mapper_name: str = None) -> list:
+        with self._trace(mapper_name) as trace, self._manager.connection(read_only=True) as conn:
+            trace.lap("wait", raw_sql)
+            with conn.cursor() as cursor:
+                self._execute(cursor, raw_sql, values, mapper_name)
+                trace.lap("execute")
+                records = cursor.fetchall()
+                trace.lap("fetch")
+                trace.count(len(records), records)
+                return records
+    
+    def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = {}, dtype: dict = None, print_sql: bool = False, output: str = "pandas", category: bool = None) -> pd.DataFrame:
+        if output == "arrow":
+            return self.queryArrow(mapper_name, values, print_sql=print_sql)
+        dtype, category = self._pandasHints(mapper_name, dtype, category)
+        def load() -> pd.DataFrame:
+            raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
+            if print_sql:
+                print(raw_sql)
+            return self.queryPandasRaw(raw_sql, values, dtype, mapper_name, category)
+        with self._trace(mapper_name) as trace:
+            return self._cached("queryPandas", mapper_name, values, load, {"dtype": dtype, "category": category}, print_sql)
+    
+    def queryPandasRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, dtype: dict = None, mapper_name: str = None, category: bool = False) -> pd.DataFrame:
+        """query with raw sql query by raw_sql. the columns are decoded straight into the types of cursor.description.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            dtype (dict, optional): pandas column's data type. these columns are built with it instead. (ex. {"price": "float64"} for numeric) Defaults to None.
+            category (bool, optional): text columns become pandas category. Defaults to False.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        with self._trace(mapper_name) as trace:
+            with self._manager.connection(read_only=True) as conn:
+                trace.lap("wait", raw_sql)
+                with conn.cursor() as cursor:
+                    self._execute(cursor, raw_sql, values, mapper_name)
+                    trace.lap("execute")
+                    records = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
+                    oids = [desc[1] for desc in cursor.description]
+
+            df = decodeRecords(records, columns, oids, dtype, category)
+            trace.lap("fetch")
+            trace.count(len(records), records)
+            return df
+    
+    def queryPandasBinary(self, mapper_name: str, values: Union[dict, tuple] = {}, print_sql: bool = False) -> pd.DataFrame:
+        """query with Jinja2Mapper's query key through 'COPY (query) TO STDOUT WITH (FORMAT binary)'.
+        the positions of the values are found in one pass over the binary stream and fixed width columns are taken as numpy arrays.
+        only text and numeric values are decoded one by one.
+        supported column types are int2/4/8, float4/8, bool, date, timestamp(tz), numeric(as float64) and text.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if print_sql:
+            print(raw_sql)
+        return self.queryPandasBinaryRaw(raw_sql, values)
+    
+    def queryPandasBinaryRaw(self, raw_sql: str, values: Union[dict, tuple] = {}) -> pd.DataFrame:
+        """query with raw sql through 'COPY (query) TO STDOUT WITH (FORMAT binary)'.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        with self._manager.connection(read_only=True) as conn:
+            with conn.cursor() as cursor:
+                bound_sql = cursor.mogrify(raw_sql, values if values else None).decode(extensions.encodings[conn.encoding])
+                bound_sql = bound_sql.strip().rstrip(";")
+                cursor.execute(f"SELECT * FROM ({bound_sql}) AS danbi_binary LIMIT 0")
+                columns = [desc[0] for desc in cursor.description]
+                oids = [desc[1] for desc in cursor.description]
+
+                buffer = io.BytesIO()
+                cursor.copy_expert(f"COPY ({bound_sql}) TO STDOUT WITH (FORMAT binary)", buffer)
+
+        return decodeCopyBinary(buffer.getbuffer(), columns, oids)
+    
+    def queryIter(self, mapper_name: str, values: Union[dict, tuple] = {}, chunksize: int = 10000, print_sql: bool = False) -> Iterator[list]:
+        """query with Jinja2Mapper's query key through a server-side cursor. the result is yielded in chunks.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 10000.
+
+        Yields:
+            list: records of each chunk.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if print_sql:
+            print(raw_sql)
+        return self.queryIterRaw(raw_sql, values, chunksize)
+    
+    def queryIterRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, chunksize: int = 10000) -> Iterator[list]:
+        """query with raw sql through a server-side cursor. the result is yielded in chunks.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 10000.
+
+        Yields:
+            list: records of each chunk.
+        """
+        for records, _, _ in self._iterChunks(raw_sql, values, chunksize):
+            yield records
+    
+    def queryPandasIter(self, mapper_name: str, values: Union[dict, tuple] = {}, chunksize: int = 10000, dtype: dict = None, print_sql: bool = False) -> Iterator[pd.DataFrame]:
+        """query with Jinja2Mapper's query key through a server-side cursor. the result is yielded as dataframe chunks.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            chunksize (int, optional): number of rows of each dataframe. Defaults to 10000.
+            dtype (dict, optional): pandas column's data type. these columns are built with it instead. Defaults to None.
+
+        Yields:
+            pd.DataFrame: pandas dataframe of each chunk.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if print_sql:
+            print(raw_sql)
+        return self.queryPandasIterRaw(raw_sql, values, chunksize, dtype)
+    
+    def queryPandasIterRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, chunksize: int = 10000, dtype: dict = None) -> Iterator[pd.DataFrame]:
+        """query with raw sql through a server-side cursor. the result is yielded as dataframe chunks.
+        columns are decoded by their type oids, so every chunk has the same dtypes. int and bool columns are nullable pandas arrays
+        even in chunks without NULL.
 
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            chunksize (int, optional): number of rows of each dataframe. Defaults to 10000.
+            dtype (dict, optional): pandas column's data type. these columns are built with it instead and a value that doesn't fit raises. Defaults to None.
+
+        Yields:
+            pd.DataFrame: pandas dataframe of each chunk.
+        """
+        for records, columns, oids in self._iterChunks(raw_sql, values, chunksize):
+            yield decodeRecords(records, columns, oids, dtype, nullable=True)
+    
+    def _iterChunks(self, raw_sql: str, values: Union[dict, tuple], chunksize: int, empty: bool = False) -> Iterator[tuple]:
+        with self._manager.connection(auto_commit=False, read_only=True) as conn:
             try:
-                cursor.execute(raw_sql, values)
-            except:
-                cursor.execute(raw_sql)
-            records = cursor.fetchall()
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
-            return records
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
-    
-    def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = {}, dtype: dict = None, print_sql: bool = False) -> pd.DataFrame:
-        with self._lock_qp:
+                with conn.cursor(name=f"danbi_{uuid.uuid4().hex}") as cursor:
+                    cursor.itersize = chunksize
+                    cursor.execute(raw_sql, values if values else None)
+                    records = cursor.fetchmany(chunksize)
+                    columns = [desc[0] for desc in cursor.description]
+                    oids = [desc[1] for desc in cursor.description]
+                    if empty and len(records) == 0:
+                        yield records, columns, oids
+                    while len(records) > 0:
+                        yield records, columns, oids
+                        records = cursor.fetchmany(chunksize)
+            finally:
+                conn.rollback()
+    
+    def _arrowBatches(self, raw_sql: str, values: Union[dict, tuple], chunksize: int) -> Iterator["pyarrow.RecordBatch"]:
+        from .arrow import arrowTypes, carryTypes, recordBatch
+
+        hints = None
+        for records, columns, oids in self._iterChunks(raw_sql, values, chunksize, empty=True):
+            batch = recordBatch(records, columns, arrowTypes(oids), hints)
+            yield batch
+            hints = carryTypes(hints, batch)
+    
+    def queryArrow(self, mapper_name: str, values: Union[dict, tuple] = {}, dictionary: bool = True, chunksize: int = 100000, print_sql: bool = False) -> "pyarrow.Table":
+        """query with Jinja2Mapper's query key into a pyarrow table. it needs pyarrow.
+        the table is built column by column from chunks of a server-side cursor with the column types of the cursor description.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        def load() -> "pyarrow.Table":
             raw_sql = self._mapper.get(mapper_name, values)
             if print_sql:
                 print(raw_sql)
-            return self.queryPandasRaw(raw_sql, values, dtype)
+            return self.queryArrowRaw(raw_sql, values, dictionary, chunksize)
+        return self._cached("queryArrow", mapper_name, values, load, {"dictionary": dictionary}, print_sql)
     
-    def queryPandasRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, dtype: dict = None) -> pd.DataFrame:
-        try:
-        # with self._lock_qpr:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
+    def queryArrowRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, dictionary: bool = True, chunksize: int = 100000) -> "pyarrow.Table":
+        """query with raw sql into a pyarrow table. it needs pyarrow.
 
-            try:
-                cursor.execute(raw_sql, values)
-            except:
-                cursor.execute(raw_sql)
-            records = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-
-            df = pd.DataFrame(records, columns=columns)
-            
-            return df if dtype is None else df.astype(dtype)
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        from .arrow import collectTable
+
+        return collectTable(self._arrowBatches(raw_sql, values, chunksize), dictionary)
+    
+    def queryParquet(self, mapper_name: str, path: str, values: Union[dict, tuple] = {}, chunksize: int = 100000, print_sql: bool = False, **kwargs) -> int:
+        """query with Jinja2Mapper's query key and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            path (str): parquet file path.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            chunksize (int, optional): number of rows fetched from the server and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if print_sql:
+            print(raw_sql)
+        return self.queryParquetRaw(raw_sql, path, values, chunksize, **kwargs)
+    
+    def queryParquetRaw(self, raw_sql: str, path: str, values: Union[dict, tuple] = {}, chunksize: int = 100000, **kwargs) -> int:
+        """query with raw sql and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            path (str): parquet file path.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            chunksize (int, optional): number of rows fetched from the server and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        from .arrow import writeParquet
+
+        return writeParquet(self._arrowBatches(raw_sql, values, chunksize), path, **kwargs)
     
     def execute(self, mapper_name, values={}, print_sql: bool = False) -> int:
-        with self._lock_e:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
-            return self.executeRaw(raw_sql, values)
+            result = self.executeRaw(raw_sql, values, mapper_name)
+        self._invalidateFor(mapper_name)
+        return result
     
-    def executeRaw(self, raw_sql, values={}) -> int:
-        try:
-        # with self._lock_er:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            try:
-                cursor.execute(raw_sql, values)
-            except:
-                cursor.execute(raw_sql)
-            result = cursor.rowcount
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
-            return result
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+    def executeRaw(self, raw_sql, values={}, mapper_name: str = None) -> int:
+        with self._trace(mapper_name) as trace, self._manager.connection() as conn:
+            trace.lap("wait", raw_sql)
+            with conn.cursor() as cursor:
+                self._execute(cursor, raw_sql, values, mapper_name)
+                trace.lap("execute")
+                trace.count(cursor.rowcount)
+                return cursor.rowcount
     
     def executeMany(self, mapper_name, values={}, print_sql: bool = False) -> int:
-        with self._lock_em:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
-            return self.executeManyRaw(raw_sql, values)
+            result = self.executeManyRaw(raw_sql, values)
+        self._invalidateFor(mapper_name)
+        return result
     
     def executeManyRaw(self, raw_sql, values={}) -> int:
-        try:
-        # with self._lock_emr:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            try:
+        with self._trace() as trace, self._manager.connection() as conn:
+            trace.lap("wait", raw_sql)
+            with conn.cursor() as cursor:
                 cursor.executemany(raw_sql, values)
-            except:
-                cursor.executemany(raw_sql)
-            result = cursor.rowcount
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
+                trace.lap("execute")
+                trace.count(cursor.rowcount)
+                return cursor.rowcount
+    
+    def executeValues(self, mapper_name, values: list = [], page_size: int = 1000, template: str = None, print_sql: bool = False) -> int:
+        """insert a lot of rows with psycopg2's execute_values. the mapper sql has to contain a single '%s' for the VALUES list.
+        ex) INSERT INTO book (id, author) VALUES %s
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (list, optional): sequence of rows. Defaults to [].
+            page_size (int, optional): number of rows sent in one statement. Defaults to 1000.
+            template (str, optional): snippet to merge each row. ex) (%s, %s, 'fixed'). Defaults to None.
+
+        Returns:
+            int: The number of results executed.
+        """
+        with self._trace(mapper_name) as trace:
+            raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
+            if print_sql:
+                print(raw_sql)
+            result = self.executeValuesRaw(raw_sql, values, page_size, template)
+        self._invalidateFor(mapper_name)
+        return result
+    
+    def executeValuesRaw(self, raw_sql, values: list = [], page_size: int = 1000, template: str = None) -> int:
+        """insert a lot of rows with psycopg2's execute_values from raw sql string. all pages are committed at once.
+
+        Args:
+            raw_sql (str): query sql from raw string. ex) INSERT INTO book (id, author) VALUES %s
+            values (list, optional): sequence of rows. Defaults to [].
+            page_size (int, optional): number of rows sent in one statement. Defaults to 1000.
+            template (str, optional): snippet to merge each row. ex) (%s, %s, 'fixed'). Defaults to None.
+
+        Returns:
+            int: The number of results executed.
+        """
+        with self._trace() as trace, self._manager.connection(auto_commit=False) as conn:
+            trace.lap("wait", raw_sql)
+            result = 0
+            with conn.cursor() as cursor:
+                rows = iter(values)
+                page = list(itertools.islice(rows, page_size))
+                while len(page) > 0:
+                    extras.execute_values(cursor, raw_sql, page, template, page_size=len(page))
+                    result += cursor.rowcount
+                    page = list(itertools.islice(rows, page_size))
+            conn.commit()
+            trace.lap("execute")
+            trace.count(result)
+
             return result
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+    
+    def copyFromRows(self, table: str, rows: Iterable, columns: List[str] = None, size: int = 65536) -> int:
+        """bulk load rows into a table with 'COPY ... FROM STDIN'. rows are encoded while they are streamed to the server.
+
+        Args:
+            table (str): target table name. ex) book, public.book
+            rows (Iterable): iterable of row sequences. None and NaN values are loaded as NULL.
+            columns (List[str], optional): target column names in the order of each row. Defaults to all columns of the table.
+            size (int, optional): size of each read from the stream. Defaults to 65536.
+
+        Returns:
+            int: The number of rows copied.
+        """
+        copy_sql = sql.SQL("COPY {} FROM STDIN").format(sql.Identifier(*table.split(".")))
+        if columns is not None:
+            copy_sql = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(*table.split(".")),
+                sql.SQL(", ").join([sql.Identifier(column) for column in columns])
+            )
+
+        with self._manager.connection() as conn:
+            stream = CopyStream(rows)
+            with conn.cursor() as cursor:
+                cursor.copy_expert(copy_sql, stream, size)
+
+            return stream.count
+    
+    def copyFromPandas(self, table: str, df: pd.DataFrame, columns: List[str] = None, size: int = 65536) -> int:
+        """bulk load a dataframe into a table with 'COPY ... FROM STDIN'.
+
+        Args:
+            table (str): target table name. ex) book, public.book
+            df (pd.DataFrame): source dataframe. the index is not loaded.
+            columns (List[str], optional): target column names. Defaults to the columns of the dataframe.
+            size (int, optional): size of each read from the stream. Defaults to 65536.
+
+        Returns:
+            int: The number of rows copied.
+        """
+        if columns is None:
+            columns = [str(column) for column in df.columns]
+        return self.copyFromRows(table, df.itertuples(index=False, name=None), columns, size)
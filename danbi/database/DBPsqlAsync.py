@@ -1,84 +1,313 @@
-from typing import Union
+import asyncio
+import contextlib
+from typing import AsyncIterator, Callable, Union, List, Tuple
 import pandas as pd
 from .IDB import IDB
+from .pgbinary import decodeCopyBinary
+from .pgrecords import decodeRecords, inferOids
 
 class DBPsqlAsync(IDB):
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[IDB]:
+        """run every call of the block on one pinned connection in one transaction.
+        it is committed once at the end of the block and rolled back if the block raises. a nested transaction() becomes a savepoint.
+        ex) async with db.transaction() as tx:
+                await tx.execute("book.insert", {"id": 1})
+                async with tx.savepoint():
+                    await tx.execute("book.update", {"id": 1})
+
+        Yields:
+            IDB: self
+        """
+        if self._tx_tags.get() is not None:
+            async with self._manager.transaction():
+                yield self
+            return
+        tags = set()
+        token = self._tx_tags.set(tags)
+        try:
+            async with self._manager.transaction():
+                yield self
+        finally:
+            self._tx_tags.reset(token)
+        self._commitTags(tags)
+    
     async def query(self, mapper_name: str, values: dict = None) -> list:
-        with self._lock:
-            raw_sql = self._mapper.get(mapper_name, values)
+        async def load() -> list:
+            raw_sql, args = self._mapper.get(mapper_name, values), None
             if values is not None:
-                raw_sql, values = self._pyformat2psql(raw_sql, values)
+                raw_sql, args = self._pyformat2psql(raw_sql, values)
+            trace.lap("render", raw_sql)
             
-            return await self.queryRaw(raw_sql, values)
+            return await self.queryRaw(raw_sql, args)
+        with self._trace(mapper_name) as trace:
+            return await self._cachedAsync("query", mapper_name, values, load)
     
     async def queryRaw(self, raw_sql: str, values: list = None) -> list:
-        try:
-            with self._lock:
-                conn = await self._manager.getConnection()
+        with self._trace() as trace:
+            async with self._manager.connection() as conn:
+                trace.lap("wait", raw_sql)
+                # asyncpg returns the rows with the execution, the fetch is counted in 'execute'.
                 if values is None:
                     records = await conn.fetch(raw_sql)
                 else:
                     records = await conn.fetch(raw_sql, *values)
-                await self._manager.releaseConnection(conn)
-                
+                trace.lap("execute")
+                trace.count(len(records), records)
                 return records
-        except Exception:
-            if conn is not None:
-                await self._manager.releaseConnection(conn)
-            raise
     
-    async def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = None, dtype: dict = None) -> pd.DataFrame:
-        with self._lock:
-            raw_sql = self._mapper.get(mapper_name, values)
+    async def queryMany(self, queries: List[Tuple[str, dict]], concurrency: int = None) -> list:
+        """run many Jinja2Mapper queries at the same time over the connection pool.
+
+        Args:
+            queries (List[Tuple[str, dict]]): list of (mapper_name, values).
+            concurrency (int, optional): max number of queries in flight. Defaults to None, limited only by the pool size.
+
+        Returns:
+            list: results of each query in the order of queries.
+        """
+        if concurrency is None:
+            return await asyncio.gather(*[self.query(mapper_name, values) for mapper_name, values in queries])
+
+        semaphore = asyncio.Semaphore(concurrency)
+        async def bounded(mapper_name: str, values: dict) -> list:
+            async with semaphore:
+                return await self.query(mapper_name, values)
+
+        return await asyncio.gather(*[bounded(mapper_name, values) for mapper_name, values in queries])
+    
+    async def queryBatch(self, queries: List[Tuple[str, dict]], transaction: bool = False) -> list:
+        """run many small Jinja2Mapper queries back to back over a single connection.
+        every query is still its own round trip, awaited one after another. what it saves is the pool acquire and the
+        reset query of the release for every query, and the statements are prepared once in the cache of that connection.
+        use queryMany to run slow queries concurrently.
+
+        Args:
+            queries (List[Tuple[str, dict]]): list of (mapper_name, values).
+            transaction (bool, optional): run the batch in one transaction to read a consistent snapshot. Defaults to False.
+
+        Returns:
+            list: results of each query in the order of queries.
+        """
+        scope = self.transaction() if transaction else self._manager.pin()
+        async with scope:
+            return [await self.query(mapper_name, values) for mapper_name, values in queries]
+    
+    async def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = None, dtype: dict = None, output: str = "pandas", category: bool = None) -> pd.DataFrame:
+        if output == "arrow":
+            return await self.queryArrow(mapper_name, values)
+        dtype, category = self._pandasHints(mapper_name, dtype, category)
+        async def load() -> pd.DataFrame:
+            raw_sql, args = self._mapper.get(mapper_name, values), None
             if values is not None:
-                raw_sql, values = self._pyformat2psql(raw_sql, values)
+                raw_sql, args = self._pyformat2psql(raw_sql, values)
+            trace.lap("render", raw_sql)
             
-            return await self.queryPandasRaw(raw_sql, values, dtype)
+            return await self.queryPandasRaw(raw_sql, args, dtype, category)
+        with self._trace(mapper_name) as trace:
+            return await self._cachedAsync("queryPandas", mapper_name, values, load, {"dtype": dtype, "category": category})
     
-    async def queryPandasRaw(self, raw_sql: str, values: list = None, dtype: dict = None) -> pd.DataFrame:
-        try:
-            with self._lock:
-                records = await self.queryRaw(raw_sql, values)
+    async def queryPandasRaw(self, raw_sql: str, values: list = None, dtype: dict = None, category: bool = False) -> pd.DataFrame:
+        """query with raw sql. it runs through the statement cache of the connection and the columns are decoded
+        straight into the types of their first non-null values. int columns become int64.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (list, optional): positional parameter values for sql. Defaults to None.
+            dtype (dict, optional): pandas column's data type. these columns are built with it instead. (ex. {"price": "float64"} for numeric) Defaults to None.
+            category (bool, optional): text columns become pandas category. Defaults to False.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        values = [] if values is None else values
+        with self._trace() as trace:
+            async with self._manager.connection() as conn:
+                trace.lap("wait", raw_sql)
+                records = await conn.fetch(raw_sql, *values)
                 if len(records) > 0:
-                    df = pd.DataFrame(records, columns=records[0].keys())
+                    columns, oids = list(records[0].keys()), inferOids(records)
                 else:
-                    return pd.DataFrame()
-                
-                return df if dtype is None else df.astype(dtype)
-        except Exception:
+                    # only an empty result needs the description of a prepared statement for its columns.
+                    attributes = (await conn.prepare(raw_sql)).get_attributes()
+                    columns, oids = [attr.name for attr in attributes], [attr.type.oid for attr in attributes]
+                trace.lap("execute")
+
+            df = decodeRecords(records, columns, oids, dtype, category)
+            trace.lap("fetch")
+            trace.count(len(records), records)
+            return df
+    
+    async def queryArrow(self, mapper_name: str, values: dict = None, dictionary: bool = True, chunksize: int = 100000) -> "pyarrow.Table":
+        """query with Jinja2Mapper's query key into a pyarrow table. it needs pyarrow.
+        the table is built column by column from chunks of a cursor with the column types of the prepared statement.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (dict, optional): parameter values for sql and mapper. Defaults to None.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        async def load() -> "pyarrow.Table":
+            raw_sql, args = self._mapper.get(mapper_name, values), None
+            if values is not None:
+                raw_sql, args = self._pyformat2psql(raw_sql, values)
+            
+            return await self.queryArrowRaw(raw_sql, args, dictionary, chunksize)
+        return await self._cachedAsync("queryArrow", mapper_name, values, load, {"dictionary": dictionary})
+    
+    async def queryArrowRaw(self, raw_sql: str, values: list = None, dictionary: bool = True, chunksize: int = 100000) -> "pyarrow.Table":
+        """query with raw sql into a pyarrow table. it needs pyarrow.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (list, optional): positional parameter values for sql. Defaults to None.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched from the server at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        from .arrow import collectTable
+
+        batches = []
+        await self._arrowBatches(raw_sql, values, chunksize, batches.append)
+        return collectTable(batches, dictionary)
+    
+    async def queryParquet(self, mapper_name: str, path: str, values: dict = None, chunksize: int = 100000, **kwargs) -> int:
+        """query with Jinja2Mapper's query key and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            path (str): parquet file path.
+            values (dict, optional): parameter values for sql and mapper. Defaults to None.
+            chunksize (int, optional): number of rows fetched from the server and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if values is not None:
+            raw_sql, values = self._pyformat2psql(raw_sql, values)
+
+        return await self.queryParquetRaw(raw_sql, path, values, chunksize, **kwargs)
+    
+    async def queryParquetRaw(self, raw_sql: str, path: str, values: list = None, chunksize: int = 100000, **kwargs) -> int:
+        """query with raw sql and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            path (str): parquet file path.
+            values (list, optional): positional parameter values for sql. Defaults to None.
+            chunksize (int, optional): number of rows fetched from the server and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        from .arrow import ParquetSink
+
+        sink = ParquetSink(path, **kwargs)
+        try:
+            await self._arrowBatches(raw_sql, values, chunksize, sink.write)
+        except BaseException:
+            sink.abort()
             raise
+        return sink.close()
+    
+    async def _arrowBatches(self, raw_sql: str, values: list, chunksize: int, consume: Callable) -> None:
+        from .arrow import arrowTypes, carryTypes, recordBatch
+
+        values = [] if values is None else values
+        async with self._manager.connection() as conn:
+            statement = await conn.prepare(raw_sql)
+            attributes = statement.get_attributes()
+            columns = [attr.name for attr in attributes]
+            types = arrowTypes([attr.type.oid for attr in attributes])
+            async with conn.transaction():
+                cursor = await statement.cursor(*values)
+                records = await cursor.fetch(chunksize)
+                hints = None
+                batch = recordBatch(records, columns, types)
+                consume(batch)
+                while len(records) == chunksize:
+                    records = await cursor.fetch(chunksize)
+                    if len(records) > 0:
+                        hints = carryTypes(hints, batch)
+                        batch = recordBatch(records, columns, types, hints)
+                        consume(batch)
+    
+    async def queryPandasBinary(self, mapper_name: str, values: dict = None) -> pd.DataFrame:
+        """query with Jinja2Mapper's query key through asyncpg's binary copy_from_query.
+        the positions of the values are found in one pass over the binary stream and fixed width columns are taken as numpy arrays.
+        only text and numeric values are decoded one by one.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (dict, optional): parameter values for sql and mapper. Defaults to None.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if values is not None:
+            raw_sql, values = self._pyformat2psql(raw_sql, values)
+
+        return await self.queryPandasBinaryRaw(raw_sql, values)
+    
+    async def queryPandasBinaryRaw(self, raw_sql: str, values: list = None) -> pd.DataFrame:
+        """query with raw sql through asyncpg's binary copy_from_query.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (list, optional): positional parameter values for sql. Defaults to None.
+
+        Returns:
+            pd.DataFrame: pandas dataframe.
+        """
+        values = [] if values is None else values
+        chunks = []
+        async def collect(data: bytes) -> None:
+            chunks.append(data)
+
+        async with self._manager.connection() as conn:
+            raw_sql = raw_sql.strip().rstrip(";")
+            attributes = (await conn.prepare(raw_sql)).get_attributes()
+            await conn.copy_from_query(raw_sql, *values, output=collect, format="binary")
+
+        return decodeCopyBinary(b"".join(chunks), [attr.name for attr in attributes], [attr.type.oid for attr in attributes])
     
     async def execute(self, mapper_name, values=None) -> None:
-        with self._lock:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             await self.executeRaw(raw_sql, values)
+        self._invalidateFor(mapper_name)
     
     async def executeRaw(self, raw_sql, values=None) -> None:
-        try:
-            with self._lock:
-                conn = await self._manager.getConnection()
+        with self._trace() as trace:
+            async with self._manager.connection() as conn:
+                trace.lap("wait", raw_sql)
                 if values is None:
                     await conn.execute(raw_sql)
                 else:
                     await conn.execute(raw_sql, *values)
-                await self._manager.releaseConnection(conn)
-        except Exception:
-            if conn is not None:
-                await self._manager.releaseConnection(conn)
-            raise
+                trace.lap("execute")
     
     async def executeMany(self, mapper_name, values=None) -> None:
-        with self._lock:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             await self.executeManyRaw(raw_sql, values)
+        self._invalidateFor(mapper_name)
     
     async def executeManyRaw(self, raw_sql, values=None) -> None:
-        try:
-            with self._lock:
-                conn = await self._manager.getConnection()
+        with self._trace() as trace:
+            async with self._manager.connection() as conn:
+                trace.lap("wait", raw_sql)
                 await conn.executemany(raw_sql, values)
-                await self._manager.releaseConnection(conn)
-        except Exception:
-            if conn is not None:
-                await self._manager.releaseConnection(conn)
-            raise
+                trace.lap("execute")
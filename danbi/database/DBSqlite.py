@@ -1,113 +1,182 @@
-from typing import Union
+from contextlib import closing
+from typing import Iterator, Union
 import pandas as pd
 from .IDB import IDB
 
 class DBSqlite(IDB):
     def query(self, mapper_name: str, values: Union[dict, tuple] = {}, print_sql: bool = False) -> list:
-        with self._lock_q:
+        def load() -> list:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
             return self.queryRaw(raw_sql, values)
+        with self._trace(mapper_name) as trace:
+            return self._cached("query", mapper_name, values, load, print_sql=print_sql)
     
     def queryRaw(self, raw_sql: str, values: tuple = ()) -> list:
-        try:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            cursor.execute(raw_sql, values)
-            records = cursor.fetchall()
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
-            return records
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+        with self._trace() as trace, self._manager.connection(read_only=True) as conn:
+            trace.lap("wait", raw_sql)
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(raw_sql, values)
+                trace.lap("execute")
+                records = cursor.fetchall()
+                trace.lap("fetch")
+                trace.count(len(records), records)
+                return records
     
-    def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = {}, dtype: dict = None, print_sql: bool = False) -> pd.DataFrame:
-        with self._lock_qp:
+    def queryPandas(self, mapper_name: str, values: Union[dict, tuple] = {}, dtype: dict = None, print_sql: bool = False, output: str = "pandas") -> pd.DataFrame:
+        if output == "arrow":
+            return self.queryArrow(mapper_name, values, print_sql=print_sql)
+        dtype, _ = self._pandasHints(mapper_name, dtype, False)
+        def load() -> pd.DataFrame:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
             return self.queryPandasRaw(raw_sql, values, dtype)
+        with self._trace(mapper_name) as trace:
+            return self._cached("queryPandas", mapper_name, values, load, dtype, print_sql)
     
     def queryPandasRaw(self, raw_sql: str, values: Union[dict, tuple] = (), dtype: dict = None) -> pd.DataFrame:
-        try:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            cursor.execute(raw_sql, values)
-            records = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
+        with self._trace() as trace:
+            with self._manager.connection(read_only=True) as conn:
+                trace.lap("wait", raw_sql)
+                with closing(conn.cursor()) as cursor:
+                    cursor.execute(raw_sql, values)
+                    trace.lap("execute")
+                    records = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
 
             df = pd.DataFrame(records, columns=columns)
-            
-            return df if dtype is None else df.astype(dtype)
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+            df = df if dtype is None else df.astype(dtype)
+            trace.lap("fetch")
+            trace.count(len(records), records)
+            return df
+    
+    def _arrowBatches(self, raw_sql: str, values: Union[dict, tuple], chunksize: int) -> Iterator["pyarrow.RecordBatch"]:
+        from .arrow import carryTypes, recordBatch
+
+        with self._manager.connection(read_only=True) as conn:
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(raw_sql, values)
+                columns = [desc[0] for desc in cursor.description]
+                types, hints = [None] * len(columns), None
+                records = cursor.fetchmany(chunksize)
+                while True:
+                    batch = recordBatch(records, columns, types, hints)
+                    yield batch
+                    hints = carryTypes(hints, batch)
+                    records = cursor.fetchmany(chunksize)
+                    if len(records) == 0:
+                        break
+    
+    def queryArrow(self, mapper_name: str, values: Union[dict, tuple] = {}, dictionary: bool = True, chunksize: int = 100000, print_sql: bool = False) -> "pyarrow.Table":
+        """query with Jinja2Mapper's query key into a pyarrow table. it needs pyarrow.
+        the table is built column by column from chunks of a cursor. sqlite has no column types, so pyarrow infers them from the values.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        def load() -> "pyarrow.Table":
+            raw_sql = self._mapper.get(mapper_name, values)
+            if print_sql:
+                print(raw_sql)
+            return self.queryArrowRaw(raw_sql, values, dictionary, chunksize)
+        return self._cached("queryArrow", mapper_name, values, load, {"dictionary": dictionary}, print_sql)
+    
+    def queryArrowRaw(self, raw_sql: str, values: Union[dict, tuple] = {}, dictionary: bool = True, chunksize: int = 100000) -> "pyarrow.Table":
+        """query with raw sql into a pyarrow table. it needs pyarrow.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            dictionary (bool, optional): dictionary encode string columns with at most half distinct values. Defaults to True.
+            chunksize (int, optional): number of rows fetched at once. Defaults to 100000.
+
+        Returns:
+            pyarrow.Table: arrow table.
+        """
+        from .arrow import collectTable
+
+        return collectTable(self._arrowBatches(raw_sql, values, chunksize), dictionary)
+    
+    def queryParquet(self, mapper_name: str, path: str, values: Union[dict, tuple] = {}, chunksize: int = 100000, print_sql: bool = False, **kwargs) -> int:
+        """query with Jinja2Mapper's query key and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            mapper_name (str): key value of yaml file of Jinja2Mapper.
+            path (str): parquet file path.
+            values (Union[dict, tuple], optional): parameter values for sql and mapper. Defaults to {}.
+            chunksize (int, optional): number of rows fetched and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        raw_sql = self._mapper.get(mapper_name, values)
+        if print_sql:
+            print(raw_sql)
+        return self.queryParquetRaw(raw_sql, path, values, chunksize, **kwargs)
+    
+    def queryParquetRaw(self, raw_sql: str, path: str, values: Union[dict, tuple] = {}, chunksize: int = 100000, **kwargs) -> int:
+        """query with raw sql and write the result to a parquet file chunk by chunk. it needs pyarrow.
+
+        Args:
+            raw_sql (str): query sql from raw string.
+            path (str): parquet file path.
+            values (Union[dict, tuple], optional): parameter values for sql. Defaults to {}.
+            chunksize (int, optional): number of rows fetched and written at once. Defaults to 100000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+        Returns:
+            int: The number of rows written.
+        """
+        from .arrow import writeParquet
+
+        return writeParquet(self._arrowBatches(raw_sql, values, chunksize), path, **kwargs)
     
     def execute(self, mapper_name, values={}, print_sql: bool = False) -> int:
-        with self._lock_e:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
-            return self.executeRaw(raw_sql, values)
+            result = self.executeRaw(raw_sql, values)
+        self._invalidateFor(mapper_name)
+        return result
     
     def executeRaw(self, raw_sql, values=()) -> int:
-        try:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            cursor.execute(raw_sql, values)
-            result = cursor.rowcount
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
-            return result
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+        with self._trace() as trace, self._manager.connection() as conn:
+            trace.lap("wait", raw_sql)
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(raw_sql, values)
+                trace.lap("execute")
+                trace.count(cursor.rowcount)
+                return cursor.rowcount
     
     def executeMany(self, mapper_name, values={}, print_sql: bool = False) -> int:
-        with self._lock_em:
+        with self._trace(mapper_name) as trace:
             raw_sql = self._mapper.get(mapper_name, values)
+            trace.lap("render", raw_sql)
             if print_sql:
                 print(raw_sql)
-            return self.executeManyRaw(raw_sql, values)
+            result = self.executeManyRaw(raw_sql, values)
+        self._invalidateFor(mapper_name)
+        return result
     
     def executeManyRaw(self, raw_sql, values={}) -> int:
-        try:
-        # with self._lock_emr:
-            conn = self._manager.getConnection()
-            cursor = conn.cursor()
-
-            cursor.executemany(raw_sql, values)
-            result = cursor.rowcount
-            
-            cursor.close()
-            self._manager.releaseConnection(conn)
-            
-            return result
-        except Exception:
-            if cursor is not None:
-                cursor.close()
-            if conn is not None:
-                self._manager.releaseConnection(conn)
-            raise
+        with self._trace() as trace, self._manager.connection() as conn:
+            trace.lap("wait", raw_sql)
+            with closing(conn.cursor()) as cursor:
+                cursor.executemany(raw_sql, values)
+                trace.lap("execute")
+                trace.count(cursor.rowcount)
+                return cursor.rowcount
 
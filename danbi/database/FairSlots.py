@@ -0,0 +1,35 @@
+import threading
+from collections import deque
+
+class FairSlots:
+    """Counting semaphore that hands free slots to waiters in arrival order.
+    """
+    def __init__(self, size: int):
+        self._available = size
+        self._waiters = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self, timeout: float = None) -> bool:
+        with self._lock:
+            if self._available > 0 and len(self._waiters) == 0:
+                self._available -= 1
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        with self._lock:
+            if waiter.is_set():
+                return True
+            self._waiters.remove(waiter)
+            return False
+    
+    def release(self) -> None:
+        with self._lock:
+            if len(self._waiters) > 0:
+                self._waiters.popleft().set()
+            else:
+                self._available += 1
+    
+    def waiting(self) -> int:
+        return len(self._waiters)
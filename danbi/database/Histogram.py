@@ -0,0 +1,39 @@
+import bisect
+import threading
+from typing import Sequence
+
+class Histogram:
+    """Thread-safe cumulative histogram like the prometheus one.
+    """
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (Sequence[float], optional): upper bounds of the buckets in ascending order. Defaults to DEFAULT_BUCKETS.
+        """
+        self._bounds = list(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count, self._sum = 0, 0.0
+        self._min, self._max = None, None
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self._bounds, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._min = value if self._min is None or value < self._min else self._min
+            self._max = value if self._max is None or value > self._max else self._max
+    
+    def getInfo(self) -> dict:
+        """
+        Returns:
+            dict: count, sum, min, max and cumulative bucket counts keyed by upper bound. ("+Inf" is the last one)
+        """
+        with self._lock:
+            buckets, total = {}, 0
+            for bound, count in zip(self._bounds + ["+Inf"], self._counts):
+                total += count
+                buckets[bound] = total
+            return {"count": self._count, "sum": self._sum, "min": self._min, "max": self._max, "buckets": buckets}
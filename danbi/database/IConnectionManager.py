@@ -1,12 +1,81 @@
 import abc
+import weakref
+import itertools
+import threading
+import contextlib
+import contextvars
+
+class _PinnedConnection:
+    """Connection of an open transaction. commit and rollback are left to the transaction.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def commit(self) -> None:
+        pass
+    
+    def rollback(self) -> None:
+        pass
 
 class IConnectionManager(abc.ABC):
-    def __new__(self, **kwargs):
+    _registry = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, name: str = None, **kwargs):
+        """every manager owns its own pool, so managers of different databases can live side by side.
+
+        Args:
+            name (str, optional): register the manager under the name to get it back with IConnectionManager.getNamed(name).
+                the registry holds it weakly, so the name is freed when the manager is garbage collected or unregistered. Defaults to None.
+            **kwargs: default arguments of connect().
+
+        Raises:
+            ValueError: Occurs when another live manager is registered under the name.
+        """
+        self._name = name
         self._kwargs = kwargs
-        if not hasattr(self, 'instance'):
-            self.instance = super(IConnectionManager, self).__new__(self)
-            self._conn_pool = None
-        return self.instance
+        self._conn_pool = None
+        self._pinned = contextvars.ContextVar(f"danbi_pinned_{id(self)}", default=None)
+        self._savepoint_ids = itertools.count(1)
+        if name is not None:
+            with IConnectionManager._registry_lock:
+                if IConnectionManager._registry.get(name) is not None:
+                    raise ValueError(f"a connection manager named '{name}' is already registered. unregister() it first.")
+                IConnectionManager._registry[name] = self
+    
+    @classmethod
+    def getNamed(cls, name: str) -> "IConnectionManager":
+        """
+        Args:
+            name (str): name given to the constructor.
+
+        Raises:
+            KeyError: Occurs when no manager is registered under the name.
+
+        Returns:
+            IConnectionManager: registered manager.
+        """
+        with IConnectionManager._registry_lock:
+            if name not in IConnectionManager._registry:
+                raise KeyError(f"there is no connection manager named '{name}'.")
+            return IConnectionManager._registry[name]
+    
+    def getName(self) -> str:
+        return self._name
+    
+    def unregister(self) -> None:
+        """free the name of the manager, so another manager can be registered under it.
+        """
+        with IConnectionManager._registry_lock:
+            if self._name is not None and IConnectionManager._registry.get(self._name) is self:
+                del IConnectionManager._registry[self._name]
+    
+    def _checkConnect(self) -> None:
+        if self._conn_pool is None:
+            raise RuntimeError(f"{type(self).__name__} is not connected. call connect() first.")
     
     @abc.abstractclassmethod
     def connect(self, **kwargs):
@@ -27,3 +96,87 @@ class IConnectionManager(abc.ABC):
     @abc.abstractclassmethod
     def releaseConnection(self, conn):
         ...
+    
+    @contextlib.contextmanager
+    def connection(self, auto_commit=True, **kwargs):
+        """scope a pooled connection with 'with'. if the block raises, the connection is rolled back.
+        the connection is always released to the pool. inside transaction() the connection of the transaction is used.
+        ex) with manager.connection() as conn:
+
+        Args:
+            auto_commit (bool, optional): autocommit mode of the connection. Defaults to True.
+
+        Yields:
+            connection: pooled connection.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        conn = self.getConnection(auto_commit, **kwargs)
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self.releaseConnection(conn)
+    
+    def _run(self, conn, raw_sql: str) -> None:
+        with contextlib.closing(conn.cursor()) as cursor:
+            cursor.execute(raw_sql)
+    
+    def _begin(self, conn) -> None:
+        pass
+    
+    @contextlib.contextmanager
+    def transaction(self, **kwargs):
+        """pin one connection to the current thread (or task) until the block ends. connection() inside the block
+        returns it, so every call joins one transaction that is committed once at the end and rolled back if the block raises.
+        a nested transaction() becomes a savepoint.
+
+        Yields:
+            connection: connection of the transaction.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            with self.savepoint():
+                yield pinned
+            return
+        conn = self.getConnection(False, **kwargs)
+        token = self._pinned.set(_PinnedConnection(conn))
+        try:
+            self._begin(conn)
+            yield self._pinned.get()
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._pinned.reset(token)
+            self.releaseConnection(conn)
+    
+    @contextlib.contextmanager
+    def savepoint(self):
+        """roll back only the statements of the block if it raises. the exception is propagated.
+
+        Raises:
+            RuntimeError: Occurs when it is used outside of transaction().
+        """
+        pinned = self._pinned.get()
+        if pinned is None:
+            raise RuntimeError("savepoint() has to be used inside transaction().")
+        name = f"danbi_savepoint_{next(self._savepoint_ids)}"
+        self._run(pinned, f"SAVEPOINT {name}")
+        try:
+            yield
+        except BaseException:
+            self._run(pinned, f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        self._run(pinned, f"RELEASE SAVEPOINT {name}")
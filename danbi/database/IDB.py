@@ -1,41 +1,295 @@
 import abc
+import contextlib
+import contextvars
 import collections
+import weakref
 import itertools
-from typing import Any, Dict, Tuple, List, Union
+import threading
+from typing import Any, Callable, Dict, Iterator, Tuple, List, Union
 import pandas as pd
-from multiprocessing import Lock
 
 from .IConnectionManager import IConnectionManager
+from .StatementCache import StatementCache
+from .ResultCache import ResultCache
+from .Histogram import Histogram
+from .QueryStats import QueryStats, QueryTrace, NULL_TRACE
 from ..mapping.IMapper import IMapper
 
 class IDB(abc.ABC):
-    def __new__(self, manager: IConnectionManager, mapper: IMapper):
+    _pyformat_cache = StatementCache(1024)
+    _registry = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, manager: IConnectionManager, mapper: IMapper, name: str = None):
+        """
+        Args:
+            manager (IConnectionManager): connection manager of the database.
+            mapper (IMapper): sql mapper.
+            name (str, optional): register the db under the name to get it back with IDB.getNamed(name).
+                the registry holds it weakly, so the name is freed when the db is garbage collected or unregistered. Defaults to None.
+
+        Raises:
+            ValueError: Occurs when another live db is registered under the name.
+        """
+        self._name = name
         self._manager = manager
         self._mapper = mapper
-        self._lock_q = Lock()
-        self._lock_qr = Lock()
-        self._lock_qp = Lock()
-        self._lock_qpr = Lock()
-        self._lock_e = Lock()
-        self._lock_er = Lock()
-        self._lock_em = Lock()
-        self._lock_emr = Lock()
-
-        if not hasattr(self, 'instance'):
-            self.instance = super(IDB, self).__new__(self)
-        return self.instance
+        self._result_cache = None
+        self._result_version = None
+        self._tx_tags = contextvars.ContextVar(f"danbi_tx_tags_{id(self)}", default=None)
+        self._query_stats = None
+        self._active_trace = contextvars.ContextVar(f"danbi_trace_{id(self)}", default=None)
+        if name is not None:
+            with IDB._registry_lock:
+                if IDB._registry.get(name) is not None:
+                    raise ValueError(f"a db named '{name}' is already registered. unregister() it first.")
+                IDB._registry[name] = self
+    
+    @classmethod
+    def getNamed(cls, name: str) -> "IDB":
+        """
+        Args:
+            name (str): name given to the constructor.
+
+        Raises:
+            KeyError: Occurs when no db is registered under the name.
 
+        Returns:
+            IDB: registered db.
+        """
+        with IDB._registry_lock:
+            if name not in IDB._registry:
+                raise KeyError(f"there is no db named '{name}'.")
+            return IDB._registry[name]
+    
+    def getName(self) -> str:
+        return self._name
+    
+    def unregister(self) -> None:
+        """free the name of the db, so another db can be registered under it.
+        """
+        with IDB._registry_lock:
+            if self._name is not None and IDB._registry.get(self._name) is self:
+                del IDB._registry[self._name]
+    
+    def _pyformatPositions(self, query: str) -> Tuple[str, List[str]]:
+        converted = self._pyformat_cache.get(query)
+        if converted is None:
+            positional_generator = itertools.count(1)
+            positional_map = collections.defaultdict(lambda: '${}'.format(next(positional_generator)))
+            formatted_query = query % positional_map
+            positional_items = sorted(
+                positional_map.items(),
+                key=lambda item: int(item[1].replace('$', '')),
+            )
+            converted = (formatted_query, [named_arg for named_arg, _ in positional_items])
+            self._pyformat_cache.put(query, converted)
+        return converted
+    
     def _pyformat2psql(self, query: str, named_args: Dict[str, Any]) -> Tuple[str, List[Any]]:
-        positional_generator = itertools.count(1)
-        positional_map = collections.defaultdict(lambda: '${}'.format(next(positional_generator)))
-        formatted_query = query % positional_map
-        positional_items = sorted(
-            positional_map.items(),
-            key=lambda item: int(item[1].replace('$', '')),
-        )
-        positional_args = [named_args[named_arg] for named_arg, _ in positional_items]
+        formatted_query, positional_names = self._pyformatPositions(query)
+        positional_args = [named_args[named_arg] for named_arg in positional_names]
         return formatted_query, positional_args
+    
+    def getStatementCacheInfo(self) -> dict:
+        """
+        Returns:
+            dict: hit/miss statistics of the statement caches. "pyformat" is the named-to-positional parameter conversion cache.
+        """
+        return {"pyformat": self._pyformat_cache.getInfo()}
+    
+    def setResultCache(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024) -> "IDB":
+        """cache the results of query/queryPandas for mappers with a 'ttl' in the yaml mapper entry.
+        execute/executeMany of a mapper with 'tags' drop the cached results sharing any of those tags.
+        ex) - name: code.select
+              ttl: 60
+              tags: [code]
+
+        Args:
+            max_entries (int, optional): max number of cached results. 0 disables the cache. Defaults to 1024.
+            max_bytes (int, optional): max estimated memory of cached results. Defaults to 64MB.
+
+        Returns:
+            IDB: self
+        """
+        self._result_cache = ResultCache(max_entries, max_bytes) if max_entries > 0 else None
+
+        return self
+    
+    def getResultCache(self) -> ResultCache:
+        """
+        Returns:
+            ResultCache: query result cache. None if it is not set.
+        """
+        return self._result_cache
+    
+    def invalidateCache(self, tags: List[str] = None) -> int:
+        """drop cached query results. use it after raw sql changes cached tables.
+
+        Args:
+            tags (List[str], optional): invalidation tags. None drops everything. Defaults to None.
+
+        Returns:
+            int: number of dropped results.
+        """
+        if self._result_cache is None:
+            return 0
+        return self._result_cache.invalidate(tags)
+    
+    def setQueryStats(self, slow_seconds: float = 1.0, slow_log_size: int = 100, buckets: List[float] = Histogram.DEFAULT_BUCKETS) -> "IDB":
+        """record render, connection wait, execute and fetch time, rows and estimated bytes of every call per mapper name.
+        calls longer than slow_seconds are kept in a slow query log. export them with getQueryStats().getInfo() or toPrometheus().
 
+        Args:
+            slow_seconds (float, optional): threshold of the slow query log in seconds. None disables it. Defaults to 1.0.
+            slow_log_size (int, optional): number of the latest slow queries kept. Defaults to 100.
+            buckets (List[float], optional): upper bounds of the histogram buckets in seconds. Defaults to Histogram.DEFAULT_BUCKETS.
+
+        Returns:
+            IDB: self
+        """
+        self._query_stats = QueryStats(slow_seconds, slow_log_size, buckets)
+
+        return self
+    
+    def getQueryStats(self) -> QueryStats:
+        """
+        Returns:
+            QueryStats: per mapper query statistics. None if it is not set.
+        """
+        return self._query_stats
+    
+    def _trace(self, mapper_name: str = None) -> QueryTrace:
+        if self._query_stats is None:
+            return NULL_TRACE
+        trace = self._active_trace.get()
+        if trace is None:
+            trace = QueryTrace(self._query_stats, self._active_trace, mapper_name)
+        return trace
+    
+    def _normalize(self, values: Any) -> Any:
+        if isinstance(values, dict):
+            return tuple(sorted((str(key), self._normalize(value)) for key, value in values.items()))
+        if isinstance(values, (list, tuple)):
+            return tuple(self._normalize(value) for value in values)
+        if isinstance(values, (set, frozenset)):
+            return frozenset(self._normalize(value) for value in values)
+        try:
+            hash(values)
+            return values
+        except TypeError:
+            return repr(values)
+    
+    def _cachePlan(self, kind: str, mapper_name: str, values: Any, dtype: dict = None) -> tuple:
+        if self._result_cache is None or self._tx_tags.get() is not None:
+            return None
+        if self._result_version != self._mapper.getVersion():
+            self._result_cache.invalidate()
+            self._result_version = self._mapper.getVersion()
+        meta = self._mapper.getMeta(mapper_name)
+        if meta.get("ttl") is None:
+            return None
+        key = (kind, mapper_name, self._normalize(values), self._normalize(dtype))
+        return key, meta["ttl"], meta.get("tags", []), self._result_cache.getGeneration()
+    
+    def _pandasHints(self, mapper_name: str, dtype: dict, category: bool) -> Tuple[dict, bool]:
+        """'dtype' and 'category' of the yaml mapper entry are used when they are not given.
+        ex) - name: book.select
+              dtype: {price: float32}
+              category: true
+        """
+        meta = self._mapper.getMeta(mapper_name)
+        dtype = meta.get("dtype") if dtype is None else dtype
+        category = meta.get("category", False) if category is None else category
+        return dtype, category
+    
+    def _copyResult(self, result: Any) -> Any:
+        if isinstance(result, pd.DataFrame):
+            return result.copy()
+        # arrow tables are immutable and shared as they are.
+        return list(result) if isinstance(result, list) else result
+    
+    def _cacheHit(self, mapper_name: str, values: Any, result: Any, print_sql: bool = False) -> Any:
+        # a hit is traced as its own 'cache' phase, the load() that renders and prints the sql is skipped.
+        with self._trace(mapper_name) as trace:
+            if print_sql:
+                print(self._mapper.get(mapper_name, values))
+            result = self._copyResult(result)
+            trace.lap("cache")
+            return result
+    
+    def _cached(self, kind: str, mapper_name: str, values: Any, load: Callable, dtype: dict = None, print_sql: bool = False) -> Any:
+        plan = self._cachePlan(kind, mapper_name, values, dtype)
+        if plan is None:
+            return load()
+        key, ttl, tags, generation = plan
+        found, result = self._result_cache.get(key)
+        if not found:
+            result = load()
+            self._result_cache.put(key, self._copyResult(result), ttl, tags, generation)
+            return result
+        return self._cacheHit(mapper_name, values, result, print_sql)
+    
+    async def _cachedAsync(self, kind: str, mapper_name: str, values: Any, load: Callable, dtype: dict = None) -> Any:
+        plan = self._cachePlan(kind, mapper_name, values, dtype)
+        if plan is None:
+            return await load()
+        key, ttl, tags, generation = plan
+        found, result = self._result_cache.get(key)
+        if not found:
+            result = await load()
+            self._result_cache.put(key, self._copyResult(result), ttl, tags, generation)
+            return result
+        return self._cacheHit(mapper_name, values, result)
+    
+    def _invalidateFor(self, mapper_name: str) -> None:
+        if self._result_cache is not None:
+            tags = self._mapper.getMeta(mapper_name).get("tags")
+            pending = self._tx_tags.get()
+            if tags and pending is not None:
+                pending.update(tags)
+            elif tags:
+                self._result_cache.invalidate(tags)
+    
+    def _commitTags(self, tags: set) -> None:
+        if tags and self._result_cache is not None:
+            self._result_cache.invalidate(tags)
+    
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["IDB"]:
+        """run every call of the block on one pinned connection in one transaction.
+        it is committed once at the end of the block and rolled back if the block raises. a nested transaction() becomes a savepoint.
+        the result cache is bypassed inside the block and the cached results of changed tags are dropped after the commit.
+        ex) with db.transaction() as tx:
+                tx.execute("book.insert", {"id": 1})
+                with tx.savepoint():
+                    tx.execute("book.update", {"id": 1})
+
+        Yields:
+            IDB: self
+        """
+        if self._tx_tags.get() is not None:
+            with self._manager.transaction():
+                yield self
+            return
+        tags = set()
+        token = self._tx_tags.set(tags)
+        try:
+            with self._manager.transaction():
+                yield self
+        finally:
+            self._tx_tags.reset(token)
+        self._commitTags(tags)
+    
+    def savepoint(self):
+        """roll back only the statements of the block if it raises inside transaction(). the exception is propagated.
+        ex) with tx.savepoint():
+
+        Returns:
+            context manager of the savepoint.
+        """
+        return self._manager.savepoint()
+    
     def getManager(self) -> IConnectionManager:
         """
         Returns:
@@ -0,0 +1,201 @@
+import sys
+import time
+import logging
+import threading
+import collections
+from typing import Callable, List, Sequence
+from .Histogram import Histogram
+
+logger = logging.getLogger("danbi.database")
+
+class QueryTrace:
+    """timings of one call of IDB. every lap() adds the time since the previous lap to the phase.
+    """
+    __slots__ = ("_stats", "_var", "_token", "_depth", "_start", "_last", "mapper_name", "sql", "phases", "rows", "bytes")
+    
+    def __init__(self, stats: "QueryStats", var, mapper_name: str):
+        self._stats = stats
+        self._var = var
+        self._token = var.set(self)
+        self._depth = 0
+        self._start = self._last = time.perf_counter()
+        self.mapper_name = mapper_name
+        self.sql = None
+        self.phases = {}
+        self.rows = 0
+        self.bytes = 0
+    
+    def __enter__(self) -> "QueryTrace":
+        self._depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._var.reset(self._token)
+            self.phases["total"] = time.perf_counter() - self._start
+            self._stats.record(self, exc_type is not None)
+    
+    def lap(self, phase: str, sql: str = None) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+        if sql is not None and self.sql is None:
+            self.sql = sql
+    
+    def count(self, rows: int, records: Sequence = None) -> None:
+        self.rows += max(rows, 0)
+        if records:
+            self.bytes += self._stats.estimateBytes(records)
+
+class _NullTrace:
+    """shared trace of a db without QueryStats. it keeps the instrumented paths almost free.
+    """
+    __slots__ = ()
+    
+    def __enter__(self) -> "_NullTrace":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+    
+    def lap(self, phase: str, sql: str = None) -> None:
+        pass
+    
+    def count(self, rows: int, records: Sequence = None) -> None:
+        pass
+
+NULL_TRACE = _NullTrace()
+
+class QueryStats:
+    """per mapper latency histograms of IDB calls and a log of slow queries.
+    phases are 'render' (Jinja2 mapper), 'wait' (connection checkout), 'execute', 'fetch', 'cache' (result cache hit) and 'total'.
+    direct calls of the raw methods are recorded under the mapper name 'raw'.
+    """
+    PHASES = ("render", "wait", "execute", "fetch", "cache", "total")
+    SAMPLE_ROWS = 64
+    
+    def __init__(self, slow_seconds: float = 1.0, slow_log_size: int = 100, buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS):
+        """
+        Args:
+            slow_seconds (float, optional): calls longer than it are kept in the slow query log and logged as a warning of 'danbi.database'. None disables it. Defaults to 1.0.
+            slow_log_size (int, optional): number of the latest slow queries kept. Defaults to 100.
+            buckets (Sequence[float], optional): upper bounds of the histogram buckets in seconds. Defaults to Histogram.DEFAULT_BUCKETS.
+        """
+        self._slow_seconds = slow_seconds
+        self._buckets = buckets
+        self._mappers = {}
+        self._slow = collections.deque(maxlen=slow_log_size)
+        self._hooks = []
+        self._lock = threading.Lock()
+    
+    def addHook(self, hook: Callable[[dict], None]) -> "QueryStats":
+        """
+        Args:
+            hook (Callable[[dict], None]): called after every call with mapper, sql, phases, rows, bytes and failed.
+                an exception of the hook is logged as an error of 'danbi.database' and never reaches the query.
+
+        Returns:
+            QueryStats: self
+        """
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+        return self
+    
+    def estimateBytes(self, records: Sequence) -> int:
+        sample = records[:self.SAMPLE_ROWS]
+        size = sum(sys.getsizeof(value) for record in sample for value in record)
+        return size * len(records) // len(sample)
+    
+    def _entry(self, mapper_name: str) -> dict:
+        entry = self._mappers.get(mapper_name)
+        if entry is None:
+            with self._lock:
+                entry = self._mappers.get(mapper_name)
+                if entry is None:
+                    entry = {"calls": 0, "errors": 0, "rows": 0, "bytes": 0, "phases": {phase: Histogram(self._buckets) for phase in self.PHASES}}
+                    self._mappers[mapper_name] = entry
+        return entry
+    
+    def record(self, trace: QueryTrace, failed: bool = False) -> None:
+        mapper_name = trace.mapper_name or "raw"
+        entry = self._entry(mapper_name)
+        for phase, seconds in trace.phases.items():
+            entry["phases"][phase].observe(seconds)
+        with self._lock:
+            entry["calls"] += 1
+            entry["errors"] += 1 if failed else 0
+            entry["rows"] += trace.rows
+            entry["bytes"] += trace.bytes
+        info = None
+        if self._slow_seconds is not None and trace.phases["total"] >= self._slow_seconds:
+            info = self._traceInfo(mapper_name, trace, failed)
+            with self._lock:
+                self._slow.append(info)
+            logger.warning("slow query %s took %.3fs: %s", mapper_name, trace.phases["total"], trace.sql)
+        for hook in self._hooks:
+            try:
+                hook(info or self._traceInfo(mapper_name, trace, failed))
+            except Exception:
+                logger.exception("query stats hook %r failed", hook)
+    
+    def _traceInfo(self, mapper_name: str, trace: QueryTrace, failed: bool) -> dict:
+        return {"time": time.time(), "mapper": mapper_name, "sql": trace.sql, "phases": dict(trace.phases), "rows": trace.rows, "bytes": trace.bytes, "failed": failed}
+    
+    def getSlowQueries(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: the latest slow queries, oldest first. (time, mapper, sql, phases, rows, bytes, failed)
+        """
+        with self._lock:
+            return list(self._slow)
+    
+    def getInfo(self) -> dict:
+        """
+        Returns:
+            dict: calls, errors, rows, bytes and a histogram of every phase in seconds keyed by mapper name.
+        """
+        with self._lock:
+            mappers = dict(self._mappers)
+            counters = {name: {key: entry[key] for key in ("calls", "errors", "rows", "bytes")} for name, entry in mappers.items()}
+        info = {}
+        for name, entry in mappers.items():
+            info[name] = counters[name]
+            info[name]["phases"] = {phase: histogram.getInfo() for phase, histogram in entry["phases"].items()}
+        return info
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._mappers = {}
+            self._slow.clear()
+    
+    def toPrometheus(self, prefix: str = "danbi") -> str:
+        """
+        Args:
+            prefix (str, optional): prefix of the metric names. Defaults to "danbi".
+
+        Returns:
+            str: metrics in the prometheus text exposition format.
+        """
+        def label(value: str) -> str:
+            return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+        info = self.getInfo()
+        lines = [
+            f"# HELP {prefix}_query_seconds latency of db calls by mapper and phase.",
+            f"# TYPE {prefix}_query_seconds histogram",
+        ]
+        for name, entry in info.items():
+            for phase, histogram in entry["phases"].items():
+                if histogram["count"] == 0:
+                    continue
+                labels = f'mapper="{label(name)}",phase="{phase}"'
+                for bound, count in histogram["buckets"].items():
+                    lines.append(f'{prefix}_query_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{prefix}_query_seconds_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"{prefix}_query_seconds_count{{{labels}}} {histogram['count']}")
+        for counter in ("calls", "errors", "rows", "bytes"):
+            lines.append(f"# TYPE {prefix}_query_{counter}_total counter")
+            for name, entry in info.items():
+                lines.append(f'{prefix}_query_{counter}_total{{mapper="{label(name)}"}} {entry[counter]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,133 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Tuple
+import pandas as pd
+
+class ResultCache:
+    """Thread-safe LRU cache of query results with per-entry TTL, a memory bound and invalidation tags.
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_entries (int, optional): max number of cached results. Defaults to 1024.
+            max_bytes (int, optional): max estimated memory of cached results. Defaults to 64MB.
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits, self._misses, self._evictions, self._invalidations = 0, 0, 0, 0
+    
+    def _sizeof(self, value: Any) -> int:
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if hasattr(value, "nbytes"):
+            return int(value.nbytes)
+        size = sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            for row in value:
+                size += sys.getsizeof(row)
+                if isinstance(row, tuple):
+                    size += sum(sys.getsizeof(field) for field in row)
+        return size
+    
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags, size = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self._tags[tag]
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Returns:
+            Tuple[bool, Any]: (found, value). expired entries are not found.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, entry[0]
+                self._remove(key)
+            self._misses += 1
+            return False, None
+    
+    def getGeneration(self) -> int:
+        """
+        Returns:
+            int: counter increased by every invalidation. pass it to put() to skip results loaded before an invalidation.
+        """
+        return self._generation
+    
+    def put(self, key: Hashable, value: Any, ttl: float, tags: Iterable[str] = (), generation: int = None) -> None:
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags, size)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+    
+    def invalidate(self, tags: Iterable[str] = None) -> int:
+        """drop cached results with any of the tags.
+
+        Args:
+            tags (Iterable[str], optional): invalidation tags. None drops everything. Defaults to None.
+
+        Returns:
+            int: number of dropped results.
+        """
+        with self._lock:
+            if tags is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+                self._bytes = 0
+            else:
+                keys = set()
+                for tag in tags:
+                    keys.update(self._tags.get(tag, ()))
+                for key in keys:
+                    self._remove(key)
+                count = len(keys)
+            self._invalidations += count
+            self._generation += 1
+            return count
+    
+    def getInfo(self) -> dict:
+        """
+        Returns:
+            dict: cache statistics. (hits, misses, hit_rate, evictions, invalidations, size, bytes, maxsize, maxbytes)
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total > 0 else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "maxsize": self._max_entries,
+                "maxbytes": self._max_bytes,
+            }
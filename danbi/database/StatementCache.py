@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Tuple
+
+class StatementCache:
+    """Thread-safe LRU cache with hit/miss counters for statements and their derived forms.
+    """
+    def __init__(self, max_size: int = 256):
+        """
+        Args:
+            max_size (int, optional): max number of entries. 0 or less means unbounded. Defaults to 256.
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits, self._misses = 0, 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+            return default
+    
+    def put(self, key: Hashable, value: Any) -> List[Tuple[Hashable, Any]]:
+        """
+        Returns:
+            List[Tuple[Hashable, Any]]: evicted (key, value) entries, so the caller can release them.
+        """
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while 0 < self._max_size < len(self._entries):
+                evicted.append(self._entries.popitem(last=False))
+        return evicted
+    
+    def clear(self) -> List[Tuple[Hashable, Any]]:
+        with self._lock:
+            evicted = list(self._entries.items())
+            self._entries.clear()
+        return evicted
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def getInfo(self) -> dict:
+        """
+        Returns:
+            dict: cache statistics. (hits, misses, hit_rate, size, maxsize)
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total > 0 else 0.0,
+                "size": len(self._entries),
+                "maxsize": self._max_size,
+            }
@@ -1,21 +1,23 @@
 from .IConnectionManager import IConnectionManager
 from .ConnMngPsql import ConnMngPsql
 from .ConnMngSqlite import ConnMngSqlite
+from .ConnMngSqliteWAL import ConnMngSqliteWAL
+from .ConnMngRouting import ConnMngRouting
 from .IDB import IDB
 from .DBPsql import DBPsql
 from .DBSqlite import DBSqlite
 from .ConnMngPsqlAsync import ConnMngPsqlAsync
 from .DBPsqlAsync import DBPsqlAsync
 from .factory import (
-    usePgDBMapper, usePgDBMapperAsync
+    usePgDBMapper, usePgDBMapperAsync, useRoutingDBMapper, useSqliteDBMapper
 )
 import sqlite3
 from ..mapping import Jinja2Mapper
 
 psql: IDB = DBPsql(ConnMngPsql(), Jinja2Mapper())
-def setPsql(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list = None, namespace: str = None, tag: str = None, base_package: str = None):
+def setPsql(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list = None, namespace: str = None, tag: str = None, base_package: str = None, bundle: str = None):
     if psql.getMapper().getConfigPaths() is None and mappers is not None and base_package is not None:
-        psql.getMapper().setConfigPaths(mappers).setNamespaceTag(namespace, tag, base_package)
+        psql.getMapper().setConfigPaths(mappers).setBundle(bundle).setNamespaceTag(namespace, tag, base_package)
     if not psql.getManager().isConnect():
         psql.getManager().connect(
             user=user,
@@ -37,5 +39,7 @@ def setSqlite(database: str, pool_min: int, pool_max: int, mappers: list = None,
             database=database,
             maxconnections=pool_max,
             mincached=pool_min,
-            isolation_level=None
+            blocking=True,
+            isolation_level=None,
+            check_same_thread=False
         )
\ No newline at end of file
@@ -0,0 +1,241 @@
+import os
+import uuid
+from typing import Iterable, List
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# type oid: arrow type
+PG_ARROW_TYPES = {
+    16: pa.bool_(),
+    17: pa.binary(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    25: pa.string(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1042: pa.string(),
+    1043: pa.string(),
+    1082: pa.date32(),
+    1083: pa.time64("us"),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+}
+
+def arrowTypes(oids: List[int]) -> List[pa.DataType]:
+    """
+    Args:
+        oids (List[int]): postgresql type oid of each column. None for unknown types.
+
+    Returns:
+        List[pa.DataType]: arrow type of each column. None lets pyarrow infer it from the values. (ex. numeric to decimal128)
+    """
+    return [PG_ARROW_TYPES.get(oid) for oid in oids]
+
+def recordBatch(records: list, columns: List[str], types: List[pa.DataType], hints: List[pa.DataType] = None) -> pa.RecordBatch:
+    """build a record batch column by column from cursor records.
+
+    Args:
+        records (list): rows of the cursor.
+        columns (List[str]): column names.
+        types (List[pa.DataType]): arrow type of each column. None infers it.
+        hints (List[pa.DataType], optional): types of the earlier chunks by carryTypes. an inferred column is cast to its hint
+            when the cast is lossless, otherwise it keeps the inferred type. Defaults to None.
+
+    Returns:
+        pa.RecordBatch: record batch.
+    """
+    hints = hints or [None] * len(columns)
+    if len(records) == 0:
+        return pa.RecordBatch.from_arrays([pa.array([], type=col_type or hint or pa.null()) for col_type, hint in zip(types, hints)], names=columns)
+    arrays = []
+    for values, col_type, hint in zip(zip(*records), types, hints):
+        if col_type is not None:
+            arrays.append(pa.array(values, type=col_type))
+            continue
+        # inferred first, pa.array(values, type=int64) would truncate floats silently.
+        array = pa.array(values)
+        if hint is not None and array.type != hint:
+            try:
+                array = array.cast(hint)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                pass
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=columns)
+
+def carryTypes(types: List[pa.DataType], batch: pa.RecordBatch) -> List[pa.DataType]:
+    """fill the unknown types with the types of the batch, so the next chunks of a result take the types of the first
+    non-null values as the hints of recordBatch. (ex. a chunk of NULLs only infers the null type)
+
+    Args:
+        types (List[pa.DataType]): arrow type of each column. None for unknown types. None is the same as all unknown.
+        batch (pa.RecordBatch): record batch of the chunk.
+
+    Returns:
+        List[pa.DataType]: arrow type of each column.
+    """
+    types = types or [None] * batch.num_columns
+    return [field.type if col_type is None and not pa.types.is_null(field.type) else col_type for col_type, field in zip(types, batch.schema)]
+
+def encodeDictionary(table: pa.Table, max_ratio: float = 0.5) -> pa.Table:
+    """dictionary encode string columns whose number of distinct values is at most max_ratio of the rows.
+
+    Args:
+        table (pa.Table): arrow table.
+        max_ratio (float, optional): distinct values / rows limit. Defaults to 0.5.
+
+    Returns:
+        pa.Table: arrow table with dictionary encoded string columns.
+    """
+    for idx, field in enumerate(table.schema):
+        if not pa.types.is_string(field.type) or table.num_rows == 0:
+            continue
+        column = table.column(idx)
+        if pc.count_distinct(column).as_py() <= table.num_rows * max_ratio:
+            table = table.set_column(idx, field.name, pc.dictionary_encode(column))
+    return table
+
+def collectTable(batches: Iterable[pa.RecordBatch], dictionary: bool = True) -> pa.Table:
+    """
+    Args:
+        batches (Iterable[pa.RecordBatch]): record batches of a result.
+        dictionary (bool, optional): dictionary encode low cardinality string columns. Defaults to True.
+
+    Returns:
+        pa.Table: arrow table.
+    """
+    tables = [pa.Table.from_batches([batch]) for batch in batches]
+    try:
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise TypeError(f"the chunks of the result have types that can't be unified: {e}") from e
+    return encodeDictionary(table) if dictionary else table
+
+def _castBatch(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    try:
+        return batch.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        columns = [f"{field.name} ({field.type} to {target.type})" for field, target in zip(batch.schema, schema) if field.type != target.type]
+        raise TypeError(f"a chunk doesn't fit the parquet schema of the earlier chunks: {', '.join(columns)}") from e
+
+def writeBatch(writer: pq.ParquetWriter, batch: pa.RecordBatch, path: str, **kwargs) -> pq.ParquetWriter:
+    """append a record batch to a parquet file. the writer is opened with the schema of the first batch,
+    so columns without a known type keep the type of the first batch. ParquetSink waits for the types of NULL only columns.
+
+    Args:
+        writer (pq.ParquetWriter): writer of the previous batch. None opens the file.
+        batch (pa.RecordBatch): record batch.
+        path (str): parquet file path.
+        **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+    Returns:
+        pq.ParquetWriter: writer for the next batch. close it after the last one.
+
+    Raises:
+        TypeError: Occurs when the batch can't be cast to the schema of the writer.
+    """
+    if writer is None:
+        writer = pq.ParquetWriter(path, batch.schema, **kwargs)
+    elif batch.schema != writer.schema:
+        batch = _castBatch(batch, writer.schema)
+    writer.write_batch(batch)
+    return writer
+
+class ParquetSink:
+    """parquet file written from record batches while they arrive. the batches are held back while a column has only
+    NULLs, up to buffer_rows, so the file gets the type of its first non-null values instead of the null type.
+    the file is written beside the path and moved there by close(), so a failed result leaves no partial file.
+    """
+    def __init__(self, path: str, buffer_rows: int = 1000000, **kwargs):
+        """
+        Args:
+            path (str): parquet file path.
+            buffer_rows (int, optional): rows held back at most while a column has only NULLs. Defaults to 1000000.
+            **kwargs: arguments of pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+        """
+        self._path = path
+        self._temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._buffer_rows = buffer_rows
+        self._kwargs = kwargs
+        self._writer = None
+        self._pending = []
+        self._types = None
+        self.rows = 0
+    
+    def write(self, batch: pa.RecordBatch) -> None:
+        """
+        Args:
+            batch (pa.RecordBatch): record batch of the result.
+
+        Raises:
+            TypeError: Occurs when the batch can't be cast to the schema of the file.
+        """
+        self.rows += batch.num_rows
+        if self._writer is not None:
+            writeBatch(self._writer, batch, self._temp_path)
+            return
+        self._pending.append(batch)
+        self._types = carryTypes(self._types or [None] * batch.num_columns, batch)
+        if None not in self._types or self.rows >= self._buffer_rows:
+            self._flush()
+    
+    def _flush(self) -> None:
+        first = self._pending[0].schema
+        schema = pa.schema([pa.field(field.name, col_type or field.type) for field, col_type in zip(first, self._types)])
+        self._writer = pq.ParquetWriter(self._temp_path, schema, **self._kwargs)
+        for batch in self._pending:
+            writeBatch(self._writer, batch, self._temp_path)
+        self._pending = []
+    
+    def close(self) -> int:
+        """write the held back batches and move the file to the path. nothing is written for a result without batches.
+
+        Returns:
+            int: The number of rows written.
+        """
+        try:
+            if self._writer is None and len(self._pending) > 0:
+                self._flush()
+        except BaseException:
+            self.abort()
+            raise
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._temp_path, self._path)
+        return self.rows
+    
+    def abort(self) -> None:
+        """close the writer and remove the unfinished file.
+        """
+        self._pending = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+def writeParquet(batches: Iterable[pa.RecordBatch], path: str, **kwargs) -> int:
+    """write record batches to a parquet file while they arrive, so the result is never held in memory at once.
+    string columns are dictionary encoded by the parquet writer.
+
+    Args:
+        batches (Iterable[pa.RecordBatch]): record batches of a result.
+        path (str): parquet file path.
+        **kwargs: arguments of ParquetSink and pyarrow.parquet.ParquetWriter. (ex. compression="zstd")
+
+    Raises:
+        TypeError: Occurs when a batch can't be cast to the schema of the earlier batches. no file is left then.
+
+    Returns:
+        int: The number of rows written.
+    """
+    sink = ParquetSink(path, **kwargs)
+    try:
+        for batch in batches:
+            sink.write(batch)
+    except BaseException:
+        sink.abort()
+        raise
+    return sink.close()
@@ -1,30 +1,52 @@
 from danbi import Jinja2Mapper
 from danbi.database import ConnMngPsqlAsync, DBPsqlAsync
 from danbi.database import ConnMngPsql, DBPsql, IDB
+from danbi.database import ConnMngRouting, IConnectionManager
+from danbi.database import ConnMngSqliteWAL, DBSqlite
 
-def usePgDBMapper(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list, namespace: str, tag, base_package: str = None) -> IDB:
+def usePgDBMapper(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list, namespace: str, tag, base_package: str = None, name: str = None, bundle: str = None) -> IDB:
     psql = ConnMngPsql(
+        name=name,
         user=user,
         password=password,
         host=host,
         port=port,
         database=database
     ).connect(minconn=pool_min, maxconn=pool_max)
-    mapper = Jinja2Mapper(mappers, namespace, tag, base_package)
-    db = DBPsql(psql, mapper)
+    mapper = Jinja2Mapper(mappers, namespace, tag, base_package, bundle=bundle)
+    db = DBPsql(psql, mapper, name)
 
     return db
 
-async def usePgDBMapperAsync(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list, namespace: str, tag, base_package: str = None) -> IDB:
+async def usePgDBMapperAsync(user: str, password: str, host: str, port: int, database: str, pool_min: int, pool_max: int, mappers: list, namespace: str, tag, base_package: str = None, name: str = None, bundle: str = None) -> IDB:
     psql = await ConnMngPsqlAsync(
+        name=name,
         user=user,
         password=password,
         host=host,
         port=port,
         database=database
     ).connect(min_size=pool_min, max_size=pool_max)
-    mapper = Jinja2Mapper(mappers,namespace, tag, base_package)
-    db = DBPsqlAsync(psql, mapper)
+    mapper = Jinja2Mapper(mappers,namespace, tag, base_package, bundle=bundle)
+    db = DBPsqlAsync(psql, mapper, name)
+
+    return db
+
+def useRoutingDBMapper(primary: IConnectionManager, replicas: list, mappers: list, namespace: str, tag, base_package: str = None, eject_failures: int = 3, readmit_after: float = 30.0, name: str = None) -> IDB:
+    router = ConnMngRouting(name=name).connect(
+        primary=primary,
+        replicas=replicas,
+        eject_failures=eject_failures,
+        readmit_after=readmit_after
+    )
+    mapper = Jinja2Mapper(mappers, namespace, tag, base_package)
+    db = DBPsql(router, mapper, name)
 
     return db
 
+def useSqliteDBMapper(database: str, mappers: list, namespace: str, tag, base_package: str = None, name: str = None, **pragmas) -> IDB:
+    sqlite = ConnMngSqliteWAL(name=name).connect(database=database, **pragmas)
+    mapper = Jinja2Mapper(mappers, namespace, tag, base_package)
+    db = DBSqlite(sqlite, mapper, name)
+
+    return db
@@ -0,0 +1,323 @@
+import struct
+from typing import List
+import numpy as np
+import pandas as pd
+
+COPY_SIGNATURE = b"PGCOPY\n\377\r\n\0"
+PG_EPOCH_US = 946684800 * 1000000
+PG_EPOCH_DAYS = 10957
+# distinct sets of NULLs kept as row layouts. rows with other sets are read field by field.
+MAX_LAYOUTS = 64
+
+# type oid: (wire format, fixed width, kind)
+PG_TYPES = {
+    16: ("?", 1, "bool"),
+    20: (">i8", 8, "int"),
+    21: (">i2", 2, "int"),
+    23: (">i4", 4, "int"),
+    700: (">f4", 4, "float"),
+    701: (">f8", 8, "float"),
+    1082: (">i4", 4, "date"),
+    1114: (">i8", 8, "timestamp"),
+    1184: (">i8", 8, "timestamptz"),
+    1700: (None, None, "numeric"),
+    25: (None, None, "text"),
+    1042: (None, None, "text"),
+    1043: (None, None, "text"),
+}
+
+def _bodyOffset(data: memoryview) -> int:
+    if bytes(data[:11]) != COPY_SIGNATURE:
+        raise ValueError("invalid binary COPY signature.")
+    ext_length = struct.unpack_from(">i", data, 15)[0]
+    return 19 + ext_length
+
+def _decodeNumeric(data: memoryview, offset: int) -> float:
+    ndigits, weight, sign, _ = struct.unpack_from(">hhHH", data, offset)
+    if sign == 0xC000:
+        return np.nan
+    value = 0.0
+    for idx, digit in enumerate(struct.unpack_from(f">{ndigits}H", data, offset + 8)):
+        value += digit * 10000.0 ** (weight - idx)
+    return -value if sign == 0x4000 else value
+
+def _toSeries(values: np.ndarray, mask: np.ndarray, kind: str) -> pd.Series:
+    if kind == "int":
+        return pd.Series(pd.arrays.IntegerArray(values, mask) if mask.any() else values)
+    if kind == "bool":
+        return pd.Series(pd.arrays.BooleanArray(values, mask) if mask.any() else values)
+    if kind == "float":
+        if mask.any():
+            values[mask] = np.nan
+        return pd.Series(values)
+    if kind in ("timestamp", "timestamptz"):
+        values = (values + PG_EPOCH_US).view("datetime64[us]")
+        values[mask] = np.datetime64("NaT")
+        series = pd.Series(values)
+        return series.dt.tz_localize("UTC") if kind == "timestamptz" else series
+    if kind == "date":
+        values = (values.astype(np.int64) + PG_EPOCH_DAYS).astype("datetime64[D]")
+        values[mask] = np.datetime64("NaT")
+        return pd.Series(values)
+    return pd.Series(values)
+
+def _decodeFixed(data: memoryview, offset: int, types: list) -> list:
+    fields = [("count", ">i2")]
+    for idx, (wire, width, _) in enumerate(types):
+        fields.extend([(f"l{idx}", ">i4"), (f"v{idx}", wire)])
+    dtype = np.dtype(fields)
+
+    body_length = len(data) - offset - 2
+    if body_length % dtype.itemsize != 0:
+        return None
+    records = np.frombuffer(data, dtype=dtype, count=body_length // dtype.itemsize, offset=offset)
+    if not (records["count"] == len(types)).all():
+        return None
+    for idx, (_, width, _) in enumerate(types):
+        if not (records[f"l{idx}"] == width).all():
+            return None
+
+    return [
+        _toSeries(records[f"v{idx}"].astype(wire[1:] if wire != "?" else "?"), np.zeros(len(records), dtype=bool), kind)
+        for idx, (wire, _, kind) in enumerate(types)
+    ]
+
+class _RowLayout:
+    """byte layout of a row with a given set of NULLs in its fixed width columns. variable width columns are
+    read by their length. a row matching it is recognized with one unpack per variable width column, and rows
+    of fixed width columns only are recognized many at once with numpy.
+    """
+    __slots__ = ("id", "lengths", "groups", "size", "relative", "dtype", "variable", "starts", "variable_lengths", "last")
+    
+    def __init__(self, id: int, lengths: tuple):
+        """
+        Args:
+            id (int): index of the layout.
+            lengths (tuple): width, or -1 for NULL, of every fixed width column and None of every variable width column.
+        """
+        self.id = id
+        self.lengths = lengths
+        # every group ends at the length of a variable width column or at the end of the row.
+        self.groups, fmt, expected = [], ">h", [len(lengths)]
+        for length in lengths:
+            if length is None:
+                group = struct.Struct(fmt + "i")
+                self.groups.append((group.unpack_from, tuple(expected), group.size, True))
+                fmt, expected = ">", []
+            else:
+                fmt += f"i{max(length, 0)}x"
+                expected.append(length)
+        if fmt != ">":
+            group = struct.Struct(fmt)
+            self.groups.append((group.unpack_from, tuple(expected), group.size, False))
+        self.variable = any(length is None for length in lengths)
+        self.size = self.groups[0][2]
+        # position of every value from the start of the row, not counting the variable width values before it.
+        self.relative, position = [], 2
+        for length in lengths:
+            self.relative.append(position + 4)
+            position += 4 + max(length or 0, 0)
+        # start and lengths of the variable width values of the rows read with a variable layout.
+        self.starts, self.variable_lengths, self.last = [], [], []
+        if not self.variable:
+            fields = [("count", ">i2")]
+            for idx, length in enumerate(lengths):
+                fields.append((f"l{idx}", ">i4"))
+                if length > 0:
+                    fields.append((f"v{idx}", f"V{length}"))
+            self.dtype = np.dtype(fields)
+    
+    def match(self, data: memoryview, position: int, end: int) -> int:
+        # position of the next row, or -1 when the row at position doesn't match. the lengths of its variable width values are kept in last.
+        self.last = lengths = []
+        for unpack, expected, size, variable in self.groups:
+            if position + size > end:
+                return -1
+            values = unpack(data, position)
+            position += size
+            if not variable:
+                if values != expected:
+                    return -1
+            elif values[:-1] != expected:
+                return -1
+            elif values[-1] > 0:
+                lengths.append(values[-1])
+                position += values[-1]
+            else:
+                lengths.append(values[-1])
+        return position
+    
+    def countRows(self, data: memoryview, position: int, end: int) -> int:
+        # number of rows of fixed width columns from position matching the layout, read in growing windows.
+        rows, window = 0, 256
+        while True:
+            count = min(window, (end - position) // self.size)
+            if count <= 0:
+                return rows
+            records = np.frombuffer(data, dtype=self.dtype, count=count, offset=position)
+            matched = records["count"] == len(self.lengths)
+            for idx, length in enumerate(self.lengths):
+                matched &= records[f"l{idx}"] == length
+            good = count if matched.all() else int(matched.argmin())
+            rows += good
+            position += good * self.size
+            if good < count:
+                return rows
+            window *= 2
+
+def _fieldIndex(data: memoryview, offset: int, types: list) -> tuple:
+    # one walk over the rows for the position and the length of every field. a NULL has the length -1.
+    # rows are matched against the layouts seen so far and a run of rows of fixed width columns with the
+    # same layout is skipped with numpy, so only rows with a new set of NULLs are read field by field.
+    fixed = [width is not None for _, width, _ in types]
+    layouts, layout, previous = {}, None, None
+    unpack_count = struct.Struct(">h").unpack_from
+    unpack_length = struct.Struct(">i").unpack_from
+    end = len(data) - 2
+
+    # runs of rows with a known layout: (layout id, first row, rows, position of the first row).
+    # rows of a variable layout keep their positions in the layout.
+    runs, rows, positions, lengths = [], [], [], []
+    position, row_idx = offset, 0
+    while True:
+        if layout is not None:
+            first = row_idx
+            if layout.variable:
+                match, starts, variable_lengths = layout.match, layout.starts, layout.variable_lengths
+                while True:
+                    next_position = match(data, position, end)
+                    if next_position < 0:
+                        break
+                    starts.append(position)
+                    variable_lengths.extend(layout.last)
+                    position, row_idx = next_position, row_idx + 1
+                if row_idx > first:
+                    runs.append((layout.id, first, row_idx - first, -1))
+            else:
+                unpack, expected, size, _ = layout.groups[0]
+                while position + size <= end and unpack(data, position) == expected:
+                    position += size
+                    row_idx += 1
+                    if row_idx - first == 32:
+                        count = layout.countRows(data, position, end)
+                        position += count * size
+                        row_idx += count
+                if row_idx > first:
+                    runs.append((layout.id, first, row_idx - first, position - (row_idx - first) * size))
+            # rows often alternate between two sets of NULLs.
+            if previous is not None and previous.match(data, position, end) >= 0:
+                layout, previous = previous, layout
+                continue
+        start = position
+        count = unpack_count(data, position)[0]
+        if count == -1:
+            break
+        position += 2
+        row, row_positions = [], []
+        for _ in range(count):
+            length = unpack_length(data, position)[0]
+            row_positions.append(position + 4)
+            row.append(length)
+            position += 4 + max(length, 0)
+        key = tuple(length if is_fixed else None for length, is_fixed in zip(row, fixed))
+        if key in layouts or len(layouts) < MAX_LAYOUTS:
+            # the row is read again as the first row of its layout.
+            if key not in layouts:
+                layouts[key] = _RowLayout(len(layouts), key)
+            layout, previous, position = layouts[key], layout, start
+            continue
+        rows.append(row_idx)
+        positions.extend(row_positions)
+        lengths.extend(row)
+        row_idx += 1
+
+    index = np.empty((row_idx, len(types)), dtype=np.int64)
+    length_index = np.empty((row_idx, len(types)), dtype=np.int64)
+    if rows:
+        index[rows] = np.array(positions, dtype=np.int64).reshape(len(rows), len(types))
+        length_index[rows] = np.array(lengths, dtype=np.int64).reshape(len(rows), len(types))
+    if runs:
+        ids, firsts, counts, starts = (np.array(values, dtype=np.int64) for values in zip(*runs))
+        for layout in layouts.values():
+            selected = ids == layout.id
+            if not selected.any():
+                continue
+            layout_counts = counts[selected]
+            steps = np.arange(layout_counts.sum()) - np.repeat(np.cumsum(layout_counts) - layout_counts, layout_counts)
+            layout_rows = np.repeat(firsts[selected], layout_counts) + steps
+            if layout.variable:
+                layout_starts = np.array(layout.starts, dtype=np.int64)
+            else:
+                layout_starts = np.repeat(starts[selected], layout_counts) + steps * layout.size
+            # variable width values move the values after them.
+            variable = np.array(layout.variable_lengths, dtype=np.int64).reshape(len(layout_rows), -1)
+            shifts = np.zeros((len(layout_rows), variable.shape[1] + 1), dtype=np.int64)
+            np.cumsum(np.maximum(variable, 0), axis=1, out=shifts[:, 1:])
+            ahead = 0
+            for idx, length in enumerate(layout.lengths):
+                index[layout_rows, idx] = layout_starts + layout.relative[idx] + shifts[:, ahead]
+                if length is None:
+                    length_index[layout_rows, idx] = variable[:, ahead]
+                    ahead += 1
+                else:
+                    length_index[layout_rows, idx] = length
+    return index, length_index
+
+def _decodeRows(data: memoryview, offset: int, types: list) -> list:
+    index, lengths = _fieldIndex(data, offset, types)
+    raw = None
+    series = []
+    for idx, (wire, width, kind) in enumerate(types):
+        positions, mask = index[:, idx], lengths[:, idx] == -1
+        if wire is not None:
+            # a view with a value starting at every byte, so the values of a column are taken at once.
+            # a NULL reads the first bytes of the buffer and is masked.
+            every_byte = np.ndarray((len(data) - width + 1,), dtype=wire, buffer=data, strides=(1,))
+            values = every_byte[np.where(mask, 0, positions)].astype(wire[1:] if wire != "?" else "?")
+        elif kind == "text":
+            raw = bytes(data) if raw is None else raw
+            values = np.empty(len(positions), dtype=object)
+            values[:] = [None if length == -1 else raw[position:position + length].decode("utf-8") for position, length in zip(positions.tolist(), lengths[:, idx].tolist())]
+        else:
+            values = np.array([np.nan if length == -1 else _decodeNumeric(data, position) for position, length in zip(positions.tolist(), lengths[:, idx].tolist())], dtype=np.float64)
+        series.append(_toSeries(values, mask, kind))
+    return series
+
+def decodeCopyBinary(data: bytes, columns: List[str], oids: List[int]) -> pd.DataFrame:
+    """decode the output of 'COPY ... TO STDOUT WITH (FORMAT binary)' column by column into a dataframe.
+    when every column is fixed width and not null, the whole buffer is read at once as a numpy structured array.
+    otherwise the rows are walked once for the position of every value, rows with the same set of NULLs are
+    matched as a whole, and fixed width columns are taken from the buffer with numpy. text and numeric values
+    are decoded one by one.
+
+    Args:
+        data (bytes): binary COPY output.
+        columns (List[str]): column names of the result.
+        oids (List[int]): postgresql type oid of each column.
+
+    Raises:
+        ValueError: Occurs when the data is not binary COPY output or a column type is not supported.
+
+    Returns:
+        pd.DataFrame: pandas dataframe.
+    """
+    types = []
+    for column, oid in zip(columns, oids):
+        if oid not in PG_TYPES:
+            raise ValueError(f"type oid {oid} of column '{column}' is not supported for binary export. cast it in the query.")
+        types.append(PG_TYPES[oid])
+
+    data = memoryview(data)
+    offset = _bodyOffset(data)
+    series = None
+    if all(width is not None for _, width, _ in types):
+        series = _decodeFixed(data, offset, types)
+    if series is None:
+        series = _decodeRows(data, offset, types)
+
+    if len(series) == 0:
+        return pd.DataFrame()
+    df = pd.concat(series, axis=1)
+    df.columns = columns
+
+    return df
@@ -0,0 +1,119 @@
+import decimal
+import datetime
+from typing import List
+import numpy as np
+import pandas as pd
+from .pgbinary import PG_TYPES
+
+UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+NAT = np.iinfo(np.int64).min
+
+def _nullMask(values: tuple) -> tuple:
+    objects = np.array(values, dtype=object)
+    mask = objects == None
+    return objects, mask
+
+def _toUtc(values: tuple) -> pd.Series:
+    # the difference of aware datetimes is exact and much faster than parsing them with pd.to_datetime.
+    micros = np.fromiter(((value - UTC_EPOCH) // MICROSECOND if value is not None else NAT for value in values), np.int64, len(values))
+    return pd.Series(micros.view("datetime64[us]")).dt.tz_localize("UTC")
+
+def _decodeColumn(values: tuple, oid: int, category: bool, nullable: bool = False) -> pd.Series:
+    wire, width, kind = PG_TYPES.get(oid, (None, None, None))
+    if kind == "int":
+        if nullable or None in values:
+            objects, mask = _nullMask(values)
+            objects[mask] = 0
+            return pd.Series(pd.arrays.IntegerArray(objects.astype(wire[1:]), mask))
+        return pd.Series(np.array(values, dtype=wire[1:]))
+    if kind == "float":
+        return pd.Series(np.array(values, dtype=wire[1:]))
+    if kind == "numeric":
+        # float64 would round the decimals. it is opt-in by dtype.
+        return pd.Series(values, dtype=object)
+    if kind == "bool":
+        if nullable or None in values:
+            objects, mask = _nullMask(values)
+            objects[mask] = False
+            return pd.Series(pd.arrays.BooleanArray(objects.astype(bool), mask))
+        return pd.Series(np.array(values, dtype=bool))
+    if kind in ("timestamp", "timestamptz", "date"):
+        try:
+            if kind == "timestamptz":
+                return _toUtc(values)
+            return pd.Series(pd.to_datetime(list(values)))
+        except (ValueError, OverflowError, TypeError):
+            # out of range values (ex. 'infinity') are kept as python objects.
+            return pd.Series(values, dtype=object)
+    if kind == "text" and category:
+        return pd.Series(pd.Categorical(np.array(values, dtype=object)))
+    if nullable:
+        # inference would give a string column for text but an object column for a chunk of NULLs only.
+        return pd.Series(values, dtype=object)
+    return pd.Series(values)
+
+def decodeRecords(records: list, columns: List[str], oids: List[int], dtype: dict = None, category: bool = False, nullable: bool = False) -> pd.DataFrame:
+    """decode cursor records column by column straight into typed columns by the type oids of cursor.description.
+    int2/4/8, float4/8 and bool become numpy columns (nullable pandas arrays when they have NULL), numeric keeps Decimal
+    objects unless dtype asks for float64, and date/timestamp(tz) become datetime64. the object frame of pd.DataFrame(records) and the copy of astype are skipped.
+
+    Args:
+        records (list): rows of the cursor.
+        columns (List[str]): column names of the result.
+        oids (List[int]): postgresql type oid of each column.
+        dtype (dict, optional): pandas data type by column name. those columns are built with it instead. Defaults to None.
+        category (bool, optional): text columns become pandas category. Defaults to False.
+        nullable (bool, optional): int and bool columns are always nullable pandas arrays and other columns are object, so the dtypes don't depend on NULLs of the records. Defaults to False.
+
+    Returns:
+        pd.DataFrame: pandas dataframe.
+    """
+    dtype = {} if dtype is None else dtype
+    columns_values = list(zip(*records)) if len(records) > 0 else [()] * len(columns)
+
+    series = []
+    for column, oid, values in zip(columns, oids, columns_values):
+        if column in dtype:
+            series.append(pd.Series(values, dtype=dtype[column]))
+        else:
+            series.append(_decodeColumn(values, oid, category, nullable))
+
+    df = pd.DataFrame(dict(enumerate(series)), copy=False)
+    df.columns = columns
+
+    return df
+
+# python type of a decoded value: type oid. bool and datetime come before their base classes int and date.
+PYTHON_OIDS = (
+    (bool, 16),
+    (int, 20),
+    (float, 701),
+    (decimal.Decimal, 1700),
+    (datetime.datetime, None),
+    (datetime.date, 1082),
+    (str, 25),
+)
+
+def inferOids(records: list) -> List[int]:
+    """type oid of each column from the python type of its first non-null value, for records without a type description.
+    (ex. asyncpg records of conn.fetch) int columns are taken as int8 and columns of NULLs only or other types are None.
+
+    Args:
+        records (list): rows of the result. at least one row.
+
+    Returns:
+        List[int]: postgresql type oid of each column.
+    """
+    oids = []
+    for values in zip(*records):
+        value = next((value for value in values if value is not None), None)
+        oid = None
+        for python_type, type_oid in PYTHON_OIDS:
+            if isinstance(value, python_type):
+                oid = type_oid
+                if python_type is datetime.datetime:
+                    oid = 1114 if value.tzinfo is None else 1184
+                break
+        oids.append(oid)
+    return oids
@@ -18,4 +18,20 @@ class IMapper(abc.ABC):
     @abc.abstractclassmethod
     def get(self, name: str, values: Any = None) -> str:
         ...
+    
+    def getVersion(self) -> int:
+        """
+        Returns:
+            int: counter changed whenever the mapper is reloaded. None for a mapper that is never reloaded.
+        """
+        return None
+    
+    def getMeta(self, name: str) -> dict:
+        """
+        Args:
+            name (str): mapper name.
 
+        Returns:
+            dict: extra keys of the mapper entry like ttl and tags. empty for a mapper without them.
+        """
+        return {}
@@ -1,15 +1,62 @@
-from jinja2 import Template
+import os
+import pickle
+import marshal
+import hashlib
+import logging
+import tempfile
+import threading
+import importlib.util
+from collections import OrderedDict
+import jinja2
+from jinja2 import Environment, BytecodeCache
 from .YAMLConfig import YAMLConfig
 from .IMapper import IMapper
 
+logger = logging.getLogger("danbi.mapping")
+
 class Jinja2Mapper(IMapper):
-    def __init__(self, conf_paths: list = None, namespace: str = None, tag = None, base_package: str = None):
+    _env = Environment()
+    BUNDLE_FORMAT = 1
+    
+    def __init__(self, conf_paths: list = None, namespace: str = None, tag = None, base_package: str = None, cache_size: int = 512, precompile: bool = False, bundle: str = None):
+        """
+        Args:
+            conf_paths (list, optional): file or directory path for yaml mapper file. Defaults to None.
+            namespace (str, optional): namespace of mapper. Defaults to None.
+            tag (optional): tag/version of mapper. Defaults to None.
+            base_package (str, optional): package name when mapper files are package resources. Defaults to None.
+            cache_size (int, optional): max number of compiled templates kept in the LRU cache. 0 or less means unbounded. Defaults to 512.
+            precompile (bool, optional): compile every template at setNamespaceTag() time instead of lazily. Defaults to False.
+            bundle (str, optional): file path of the compiled mapper bundle. see setBundle(). Defaults to None.
+        """
         self._conf_paths = conf_paths
         self._mapper = {}
+        self._meta = {}
         self._base_package = base_package
+        self._namespace, self._tag = None, None
+        self._version = 0
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._precompile = precompile
+        self._hits, self._misses = 0, 0
+        self._files = {}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._bundle = bundle
+        self._codes = {}
         if (namespace is not None) and (tag is not None):
             self.setNamespaceTag(namespace, tag)
     
+    @classmethod
+    def setBytecodeCache(cls, bytecode_cache: BytecodeCache = None) -> None:
+        """Set the bytecode cache of the shared jinja2 environment. ex) jinja2.FileSystemBytecodeCache("/tmp/danbi")
+
+        Args:
+            bytecode_cache (BytecodeCache, optional): jinja2 bytecode cache. None disables it. Defaults to None.
+        """
+        cls._env.bytecode_cache = bytecode_cache
+    
     def setConfigPaths(self, conf_paths: list = None) -> IMapper:
         self._conf_paths = conf_paths
 
@@ -17,20 +64,317 @@ class Jinja2Mapper(IMapper):
     
     def getConfigPaths(self) -> list:
         return self._conf_paths
+    
+    def setBundle(self, bundle: str = None) -> IMapper:
+        """use a compiled mapper bundle at setNamespaceTag(). a bundle holds the mapper table and the compiled code of
+        every template of one namespace:tag. it is used when the python and jinja2 versions, the namespace:tag and
+        the (mtime, size) of every mapper file match, otherwise the yaml files are loaded and the bundle is written again.
+        mapper files of a package are not checked, so remove the bundle when the package is upgraded.
+        load it before forking workers, so they start without parsing or compiling and share the templates.
+
+        Args:
+            bundle (str, optional): file path of the bundle. None disables it. Defaults to None.
 
+        Returns:
+            IMapper: self
+        """
+        self._bundle = bundle
+
+        return self
+    
     def setNamespaceTag(self, namespace: str, tag: str, base_package: str = None) -> None:
         if base_package is not None:
             self._base_package = base_package
-        template = YAMLConfig(self._conf_paths, self._base_package)
-        template.setCurrent(namespace, tag)
-        
-        self._mapper = {}
-        for config in template.getCurrent():
-            for mapper in config["mapper"]:
-                self._mapper[mapper["name"]] = mapper["temp"]
+        if self._bundle is not None and self.loadBundle(self._bundle, namespace, tag):
+            return
+        with self._reload_lock:
+            if self._base_package is None:
+                files, _ = self._loadFiles()
+                configs = [config for _, configs in files.values() for config in configs if config["namespace"] == namespace and config["tag"] == tag]
+                if len(configs) == 0:
+                    raise Exception(f"There is no sutable data. in [namespace: {namespace}, tag: {tag}].")
+            else:
+                files = {}
+                template = YAMLConfig(self._conf_paths, self._base_package)
+                configs = template.setCurrent(namespace, tag).getCurrent()
+
+            mapper, meta = self._buildTable(configs)
+            with self._cache_lock:
+                self._mapper = mapper
+                self._meta = meta
+                self._namespace, self._tag = namespace, tag
+                self._version += 1
+                self._cache.clear()
+            self._files = files
+
+        if self._bundle is not None:
+            try:
+                self.buildBundle(self._bundle)
+            except OSError:
+                logger.warning("can not write the mapper bundle %s.", self._bundle)
+        elif self._precompile:
+            for name in mapper.keys():
+                self._getTemplate(name)
+    
+    def _bundleHeader(self, namespace: str, tag) -> dict:
+        if self._base_package is None:
+            stamps = {path: os.stat(path) for path in YAMLConfig.listFiles(self._conf_paths)}
+            stamps = {path: (stat.st_mtime_ns, stat.st_size) for path, stat in stamps.items()}
+        else:
+            stamps = {"package": self._base_package, "paths": list(self._conf_paths)}
+        return {
+            "format": self.BUNDLE_FORMAT,
+            "python": importlib.util.MAGIC_NUMBER,
+            "jinja2": jinja2.__version__,
+            "namespace": namespace,
+            "tag": tag,
+            "stamps": stamps,
+        }
+    
+    def buildBundle(self, path: str) -> str:
+        """compile every template of the current namespace:tag and write them with the mapper table to a bundle file.
+
+        Args:
+            path (str): file path of the bundle.
+
+        Returns:
+            str: sha1 digest of the mapper table in the bundle.
+        """
+        with self._cache_lock:
+            namespace, tag, mapper, meta = self._namespace, self._tag, self._mapper, self._meta
+        codes = {name: marshal.dumps(self._env.compile(source, name)) for name, source in mapper.items()}
+        digest = self._digest(mapper)
+        bundle = {"header": self._bundleHeader(namespace, tag), "digest": digest, "mapper": mapper, "meta": meta, "codes": codes}
+        self._codes = {name: (mapper[name], code) for name, code in codes.items()}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as file:
+            pickle.dump(bundle, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file.name, path)
+
+        return digest
+    
+    def _digest(self, mapper: dict) -> str:
+        return hashlib.sha1(pickle.dumps(sorted(mapper.items()), protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    
+    def loadBundle(self, path: str, namespace: str, tag) -> bool:
+        """load the mapper table and the compiled templates of a bundle written by buildBundle().
+        templates are made from the compiled code when they are used first.
+
+        Args:
+            path (str): file path of the bundle.
+            namespace (str): namespace of mapper.
+            tag: tag/version of mapper.
+
+        Returns:
+            bool: False if the bundle is missing or stale. the mapper is not changed then.
+        """
+        try:
+            with open(path, "rb") as file:
+                bundle = pickle.load(file)
+            if bundle["header"] != self._bundleHeader(namespace, tag) or bundle["digest"] != self._digest(bundle["mapper"]):
+                return False
+            mapper = bundle["mapper"]
+            codes = {name: (mapper[name], code) for name, code in bundle["codes"].items()}
+        except (OSError, EOFError, ValueError, KeyError, TypeError, pickle.UnpicklingError):
+            return False
+
+        with self._reload_lock:
+            with self._cache_lock:
+                self._mapper = mapper
+                self._meta = bundle["meta"]
+                self._namespace, self._tag = namespace, tag
+                self._version += 1
+                self._cache.clear()
+                self._codes = codes
+            self._files = {}
+        return True
+    
+    def _loadFiles(self) -> tuple:
+        # only files with a new (mtime, size) are parsed again.
+        files, changed = {}, False
+        for path in YAMLConfig.listFiles(self._conf_paths):
+            stat = os.stat(path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            entry = self._files.get(path)
+            if entry is None or entry[0] != stamp:
+                entry, changed = (stamp, YAMLConfig.loadFile(path)), True
+            files[path] = entry
+        return files, changed or files.keys() != self._files.keys()
+    
+    def _buildTable(self, configs: list) -> tuple:
+        mapper, meta = {}, {}
+        for config in configs:
+            for item in config["mapper"]:
+                mapper[item["name"]] = item["temp"]
+                meta[item["name"]] = {key: value for key, value in item.items() if key not in ("name", "temp")}
+        return mapper, meta
+    
+    def reload(self) -> bool:
+        """parse the yaml files changed since the last load and swap in the new mapper table at once.
+        changed templates are compiled before the swap and the compiled templates of unchanged ones are kept,
+        so get() sees either the old or the new table and never a half built one.
+
+        Raises:
+            ValueError: Occurs when the mapper files are package resources.
+
+        Returns:
+            bool: True if the mapper table is replaced.
+        """
+        if self._base_package is not None:
+            raise ValueError("mapper files of a package can not be reloaded.")
+        with self._reload_lock:
+            if self._namespace is None:
+                return False
+            files, changed = self._loadFiles()
+            if not changed:
+                return False
+            configs = [config for _, configs in files.values() for config in configs if config["namespace"] == self._namespace and config["tag"] == self._tag]
+            if len(configs) == 0:
+                raise Exception(f"There is no sutable data. in [namespace: {self._namespace}, tag: {self._tag}].")
+            mapper, meta = self._buildTable(configs)
+
+            with self._cache_lock:
+                old_mapper, old_cache = self._mapper, OrderedDict(self._cache)
+            cache = OrderedDict()
+            for key, template in old_cache.items():
+                if old_mapper.get(key[2]) == mapper.get(key[2]):
+                    cache[key] = template
+            for name, source in mapper.items():
+                key = (self._namespace, self._tag, name)
+                if key not in cache and (self._precompile or old_mapper.get(name) != source):
+                    cache[key] = self._compile(key, source)
+            while 0 < self._cache_size < len(cache):
+                cache.popitem(last=False)
+
+            with self._cache_lock:
+                self._mapper = mapper
+                self._meta = meta
+                self._version += 1
+                self._cache = cache
+            self._files = files
+        return True
+    
+    def watch(self, interval: float = 1.0) -> IMapper:
+        """reload() the mapper files every interval seconds on a daemon thread. a file that fails to parse is logged
+        to 'danbi.mapping' once and the previous mapper table is kept until the file is fixed.
+
+        Args:
+            interval (float, optional): seconds between the checks of file modification times. Defaults to 1.0.
+
+        Raises:
+            ValueError: Occurs when the mapper files are package resources.
+
+        Returns:
+            IMapper: self
+        """
+        if self._base_package is not None:
+            raise ValueError("mapper files of a package can not be watched.")
+        self.unwatch()
+        stop = threading.Event()
+        def run() -> None:
+            failure = None
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                    failure = None
+                except Exception as e:
+                    if str(e) != failure:
+                        logger.exception("mapper reload failed. the previous mapper is kept.")
+                    failure = str(e)
+        watcher = threading.Thread(target=run, name="danbi-mapper-watch", daemon=True)
+        self._watcher = (watcher, stop)
+        watcher.start()
+
+        return self
+    
+    def unwatch(self) -> None:
+        """stop the watcher thread of watch().
+        """
+        if self._watcher is not None:
+            watcher, stop = self._watcher
+            stop.set()
+            watcher.join()
+            self._watcher = None
+    
+    def getMeta(self, name: str) -> dict:
+        """
+        Args:
+            name (str): mapper name.
+
+        Returns:
+            dict: extra keys of the mapper entry except name and temp. ex) {"ttl": 60, "tags": ["code"]}
+        """
+        return self._meta.get(name, {})
+    
+    def getVersion(self) -> int:
+        """
+        Returns:
+            int: counter increased whenever the mapper table is reloaded. caches derived from rendered sql compare it to detect reloads.
+        """
+        return self._version
+    
+    def _compile(self, key: tuple, source: str):
+        name = key[2]
+        bcc = self._env.bytecode_cache
+        compiled = self._codes.get(name)
+        if compiled is not None and compiled[0] == source:
+            code = marshal.loads(compiled[1])
+        elif bcc is None:
+            code = self._env.compile(source, name)
+        else:
+            bucket = bcc.get_bucket(self._env, "{}:{}:{}".format(*key), None, source)
+            code = bucket.code
+            if code is None:
+                code = self._env.compile(source, name)
+                bucket.code = code
+                bcc.set_bucket(bucket)
+
+        return self._env.template_class.from_code(self._env, code, self._env.make_globals(None))
+    
+    def _getTemplate(self, name: str):
+        with self._cache_lock:
+            key = (self._namespace, self._tag, name)
+            source = self._mapper[name]
+            template = self._cache.get(key)
+            if template is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return template
+            self._misses += 1
+
+        template = self._compile(key, source)
+        with self._cache_lock:
+            # a template compiled from the table before a reload is not cached.
+            if self._mapper.get(name) == source:
+                self._cache[key] = template
+            if 0 < self._cache_size < len(self._cache):
+                self._cache.popitem(last=False)
+
+        return template
+    
+    def getCacheInfo(self) -> dict:
+        """
+        Returns:
+            dict: compiled template cache statistics. (hits, misses, size, maxsize)
+        """
+        with self._cache_lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._cache),
+                "maxsize": self._cache_size,
+            }
+    
+    def clearCache(self) -> None:
+        """Drop all compiled templates and reset the hit/miss counters.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+            self._hits, self._misses = 0, 0
     
     def get(self, name: str, values=None, verbose=False) -> str:
-        result = Template(self._mapper[name]).render(values=values)
+        result = self._getTemplate(name).render(values=values)
         if verbose:
             print(result)
         return result
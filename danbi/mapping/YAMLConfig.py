@@ -1,10 +1,59 @@
-from typing import Any, Union, List
+from typing import Any, Union, List, Tuple
 import yaml
-import os, pkgutil, glob
+import os, pkgutil, glob, re, functools, hashlib, pickle, tempfile
+
+# libyaml's loader is several times faster than the pure python one.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_PATH_INDEX = re.compile(r"\[\s*(-?\d+|'[^']*'|\"[^\"]*\")\s*\]")
+
+@functools.lru_cache(maxsize=1024)
+def _compilePath(dot_query: str) -> Tuple[Union[str, int], ...]:
+    """parse a dot notation path once into the keys to follow.
+    ex) a.b[1].c -> ("a", "b", 1, "c"), a['x.y'] -> ("a", "x.y")
+
+    Args:
+        dot_query (str): variable position using dot notation.
+
+    Raises:
+        ValueError: Occurs when the path has an empty key or an index that is not an integer or a quoted key.
+
+    Returns:
+        Tuple[Union[str, int], ...]: keys of the dicts and indexes of the lists.
+    """
+    keys, pos = [], 0
+    while pos < len(dot_query):
+        end = len(dot_query)
+        for mark in (".", "["):
+            found = dot_query.find(mark, pos)
+            end = found if 0 <= found < end else end
+        if end > pos:
+            keys.append(dot_query[pos:end])
+        elif dot_query[pos:pos + 1] != "[":
+            raise ValueError(f"empty key at {pos} of '{dot_query}'.")
+        pos = end
+        while pos < len(dot_query) and dot_query[pos] == "[":
+            matched = _PATH_INDEX.match(dot_query, pos)
+            if matched is None:
+                raise ValueError(f"invalid index at {pos} of '{dot_query}'.")
+            index = matched.group(1)
+            keys.append(index[1:-1] if index[0] in "'\"" else int(index))
+            pos = matched.end()
+        if pos < len(dot_query):
+            if dot_query[pos] != ".":
+                raise ValueError(f"invalid path at {pos} of '{dot_query}'.")
+            pos += 1
+            if pos == len(dot_query):
+                raise ValueError(f"empty key at {pos} of '{dot_query}'.")
+    if len(keys) == 0:
+        raise ValueError("empty path.")
+    return tuple(keys)
 
 class YAMLConfig:
     """ Manage various config file with yaml file.
     """
+    _cache_dir = None
+
     def __init__(self, conf_paths: List[str] = [], base_package: str = None):
         """
         Args:
@@ -13,6 +62,9 @@ class YAMLConfig:
         assert isinstance(conf_paths, list), "param 'conf_paths' have to a list"
         self._configs = []
         self._current = []
+        self._index = {}
+        self._unhashable = []
+        self._signatures = []
         
         self._first_name, self._first_tag = None, None
         if base_package is None:
@@ -20,8 +72,7 @@ class YAMLConfig:
                 config = {}
                 config["path"] = conf_file
                 config["configs"] = []
-                with open(conf_file, "r") as data:
-                    self._add_config(config, data)
+                self._add_config(config, self.loadFile(conf_file))
         else:
             for conf_file in conf_paths:
                 if conf_file.endswith(".yaml") or conf_file.endswith(".yml"):
@@ -29,20 +80,81 @@ class YAMLConfig:
                     config["path"] = base_package + conf_file
                     config["configs"] = []
                     data = pkgutil.get_data(base_package, conf_file)
-                    self._add_config(config, data)
+                    self._add_config(config, self._loadCached(config["path"], None, lambda: data))
 
         self.setCurrent(self._first_name, self._first_tag)
 
-    def _add_config(self, config, data):
-        configs_raw = yaml.safe_load_all(data)
-        for data in configs_raw:
-            config["configs"].append(data)
-            if self._first_name is None:
-                self._first_name = data["namespace"]
-                self._first_tag = data["tag"]
-        self._configs.append(config)
+    @classmethod
+    def setParseCache(cls, cache_dir: str = None) -> None:
+        """keep the parsed documents of every yaml file as a pickle in cache_dir. a file is parsed again only when
+        its content changes, so loading unchanged files costs a stat and an unpickle. the directory has to be
+        writable only by trusted users since pickles are loaded from it.
 
-    def _parsePaths(self, conf_paths: list = []) -> list:
+        Args:
+            cache_dir (str, optional): directory of the parse cache. None disables it. Defaults to None.
+        """
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        cls._cache_dir = cache_dir
+
+    @classmethod
+    def loadFile(cls, conf_file: str) -> list:
+        """
+        Args:
+            conf_file (str): path of a yaml file.
+
+        Returns:
+            list: all documents of the file.
+        """
+        def read() -> bytes:
+            with open(conf_file, "rb") as data:
+                return data.read()
+
+        if cls._cache_dir is None:
+            return list(yaml.load_all(read(), Loader=YAML_LOADER))
+        stat = os.stat(conf_file)
+        return cls._loadCached(os.path.abspath(conf_file), (stat.st_mtime_ns, stat.st_size), read)
+
+    @classmethod
+    def _loadCached(cls, key: str, stamp: tuple, read) -> list:
+        # entries are checked by (mtime, size) first and by the content digest when the stamp differs.
+        if cls._cache_dir is None:
+            return list(yaml.load_all(read(), Loader=YAML_LOADER))
+        cache_file = os.path.join(cls._cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".pickle")
+        try:
+            with open(cache_file, "rb") as file:
+                entry = pickle.load(file)
+        except Exception:
+            entry = None
+        if entry is not None and stamp is not None and entry["stamp"] == stamp:
+            return entry["docs"]
+
+        data = read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry["digest"] == digest:
+            # package resources have no stamp, an unchanged one is not written again.
+            if entry["stamp"] == stamp:
+                return entry["docs"]
+            docs = entry["docs"]
+        else:
+            docs = list(yaml.load_all(data, Loader=YAML_LOADER))
+        try:
+            with tempfile.NamedTemporaryFile("wb", dir=cls._cache_dir, delete=False) as file:
+                pickle.dump({"stamp": stamp, "digest": digest, "docs": docs}, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(file.name, cache_file)
+        except OSError:
+            pass
+        return docs
+
+    @staticmethod
+    def listFiles(conf_paths: list = []) -> list:
+        """
+        Args:
+            conf_paths (list, optional): file or directory path for yaml config file. Defaults to [].
+
+        Returns:
+            list: yaml file paths. directories are expanded to their '*.yaml' files.
+        """
         all_paths = []
         for conf_path in conf_paths:
             if os.path.isfile(conf_path):
@@ -51,18 +163,41 @@ class YAMLConfig:
                 for conf_file in glob.glob(conf_path+"/*.yaml"):
                     all_paths.append(conf_file)
         return all_paths
+
+    def _add_config(self, config, configs_raw):
+        for data in configs_raw:
+            config["configs"].append(data)
+            if self._first_name is None:
+                self._first_name = data["namespace"]
+                self._first_tag = data["tag"]
+            self._indexConfig(config["path"], data)
+        self._configs.append(config)
+
+    def _indexConfig(self, path: str, data: dict) -> None:
+        entry = {"path": path, "config": data}
+        try:
+            self._index.setdefault((data["namespace"], data["tag"]), []).append(entry)
+        except TypeError:
+            # a list or dict tag can't be a key, it is found by a scan with ==.
+            self._unhashable.append(((data["namespace"], data["tag"]), entry))
+        self._signatures.append((data["namespace"], data["tag"], path))
+
+    def _reindex(self) -> None:
+        # namespace or tag of a document can be changed by setValue().
+        self._index, self._unhashable, self._signatures = {}, [], []
+        for config_meta in self._configs:
+            for config in config_meta["configs"]:
+                self._indexConfig(config_meta["path"], config)
+
+    def _parsePaths(self, conf_paths: list = []) -> list:
+        return self.listFiles(conf_paths)
     
     def getSignatures(self) -> list:
         """
         Returns:
             list: all (namespace, tag, path)
         """
-        signatures = []
-        for config_meta in self._configs:
-            for config in config_meta["configs"]:
-                signatures.append((config["namespace"], config["tag"], config_meta["path"]))
-        
-        return signatures
+        return list(self._signatures)
     
     def getConfig(self, namespace: str, tag: Any) -> dict:
         """Search for settings of config file with the same "name:tag".
@@ -80,21 +215,14 @@ class YAMLConfig:
         return result
     
     def _findConfig(self, namespace: str, tag: Any) -> dict:
-        result = {"configs": []}
-        for config_meta in self._configs:
-            for config in config_meta["configs"]:
-                if config["namespace"] == namespace and config["tag"] == tag:
-                    result["namespace"] = namespace
-                    result["tag"] = tag
-                    result["configs"].append({
-                        "path": config_meta["path"],
-                        "config": config
-                    })
-        
-        if len(result["configs"]) == 0:
+        try:
+            configs = self._index.get((namespace, tag))
+        except TypeError:
+            configs = [entry for signature, entry in self._unhashable if signature == (namespace, tag)] or None
+        if configs is None:
             raise Exception(f"There is no sutable data. in [namespace: {namespace}, tag: {tag}].")
         else:
-            return result
+            return {"namespace": namespace, "tag": tag, "configs": configs}
     
     def setCurrent(self, namespace: str, tag: Any):
         """Set the signature ("namespace:tag") to use. 
@@ -117,21 +245,6 @@ class YAMLConfig:
         
         return result
     
-    def __genCmdString(self, dot_query: str) -> str:
-        command = "config['config']"
-        for element in dot_query.split("."):
-            try:
-                array = element[element.index("["):]
-                element = element[:element.index("[")]
-            except Exception:
-                array = None
-                pass
-
-            command += f"['{element}']"
-            if array is not None:
-                command += array
-        return command
-    
     def getValue(self, dot_query: str) -> str:
         """The value of the configuration variables in the "namespace:tag" specified by the setCurrent() method.
         Args:
@@ -140,19 +253,37 @@ class YAMLConfig:
         Returns:
             str: the value of the position.
         """
+        keys = _compilePath(dot_query)
         result = []
         for config in self._current["configs"]:
-            result.append(eval(self.__genCmdString(dot_query)))
+            value = config["config"]
+            for key in keys:
+                value = value[key]
+            result.append(value)
         return result
     
-    def setValue(self, dot_query: str, value: Union[tuple, dict, list]) -> None:
-        """Set the value at the location of the variable using dot notation.
+    def getValues(self, dot_queries: List[str]) -> dict:
+        """getValue() of many positions at once.
+        Args:
+            dot_queries (List[str]): variable positions using dot notation.
+        Returns:
+            dict: the values of each position keyed by the dot query.
+        """
+        return {dot_query: self.getValue(dot_query) for dot_query in dot_queries}
+    
+    def setValue(self, dot_query: str, value: Any) -> None:
+        """Set the value at the location of the variable using dot notation. the value is stored as it is.
         Args:
             dot_query (str): variable position using dot notation.
-            value (str): The setting value you want to set.
+            value (Any): The setting value you want to set.
         """
+        keys = _compilePath(dot_query)
         for config in self._current["configs"]:
-            exec(f"{self.__genCmdString(dot_query)}='{value}'")
+            target = config["config"]
+            for key in keys[:-1]:
+                target = target[key]
+            target[keys[-1]] = value
+        self._reindex()
     
     def persist(self) -> None:
         """save the current configurations to the source file.
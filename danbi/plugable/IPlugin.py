@@ -1,6 +1,9 @@
 import abc
 
 class IPlugin(abc.ABC):
+    # full names of the plugins to plug before this one. ex) ["my_plugins.db.DBPlugin"]
+    depends = []
+    
     def __new__(self, name):
         if not hasattr(self, 'instance'):
             self.instance = super(IPlugin, self).__new__(self)
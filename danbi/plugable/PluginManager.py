@@ -1,23 +1,158 @@
-import os, pkgutil, inspect
+import os, ast, json, time, pkgutil, inspect, asyncio, functools, importlib, importlib.util, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from .IPlugin import IPlugin
+from .IPluginAsync import IPluginAsync
 from danbi import utils
 
+# qualified names of the plugin base classes a module can import.
+PLUGIN_BASES = {
+    "danbi.IPlugin", "danbi.plugable.IPlugin", "danbi.plugable.IPlugin.IPlugin",
+    "danbi.IPluginAsync", "danbi.plugable.IPluginAsync", "danbi.plugable.IPluginAsync.IPluginAsync",
+}
+# bumped when the entries of the discovery cache change, so old entries are parsed again.
+SCAN_FORMAT = 2
+
 class PluginManager:
+    _scan_cache = {}
+    _scan_lock = threading.Lock()
+    _cache_file = None
+    
     def __init__(self, **kwargs):
         self._plugins = {}
         self._kwargs = kwargs
+        self._timings = {}
     
-    def addPackagePath(self, path: str):
-        self._discover_plugins(path)
+    def addPackagePath(self, path: str, lazy: bool = False):
+        """
+        Args:
+            path (str): package name to find plugins in. sub packages are searched too.
+            lazy (bool, optional): find IPlugin subclasses from the source of the modules without importing them.
+                a base has to be imported from danbi (or danbi.plugable) or be a plugin class of the package imported by its module,
+                not through a re-export of an __init__. a plugin module is imported when it is plugged. Defaults to False.
+        """
+        if lazy:
+            self._scan_plugins(path)
+        else:
+            self._discover_plugins(path)
 
         return self
     
-    def addPackage(self, package_regex_name: str):
+    def addPackage(self, package_regex_name: str, lazy: bool = False):
         packages_info = utils.infoInstalledPackage(package_regex_name)
         for package in packages_info:
-            self._discover_plugins(package[0])
+            self.addPackagePath(package[0], lazy)
         
         return self
+    
+    @classmethod
+    def setDiscoveryCache(cls, cache_file: str = None) -> None:
+        """keep the classes found by lazy discovery in a json file. a module is parsed again only when its (mtime, size) changes.
+
+        Args:
+            cache_file (str, optional): path of the json file. None keeps the cache in memory only. Defaults to None.
+        """
+        with cls._scan_lock:
+            cls._cache_file = cache_file
+            if cache_file is not None and os.path.isfile(cache_file):
+                try:
+                    with open(cache_file, "r") as file:
+                        cls._scan_cache.update(json.load(file))
+                except (OSError, ValueError):
+                    pass
+    
+    @classmethod
+    def _save_cache(cls) -> None:
+        with cls._scan_lock:
+            if cls._cache_file is None:
+                return
+            try:
+                directory = os.path.dirname(os.path.abspath(cls._cache_file))
+                with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as file:
+                    json.dump(cls._scan_cache, file)
+                os.replace(file.name, cls._cache_file)
+            except OSError:
+                pass
+    
+    def _scan_module(self, path: str) -> list:
+        stat = os.stat(path)
+        stamp = [stat.st_mtime_ns, stat.st_size, SCAN_FORMAT]
+        with self._scan_lock:
+            entry = self._scan_cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        with open(path, "rb") as file:
+            tree = ast.parse(file.read(), path)
+        # bases are kept as the names they are imported from. ex) 'danbi.plugable.IPlugin', '.base.Base' or 'Base' of the same module.
+        imports, classes = {}, []
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom):
+                module = "." * node.level + (f"{node.module}." if node.module else "")
+                imports.update({alias.asname or alias.name: module + alias.name for alias in node.names})
+            elif isinstance(node, ast.Import):
+                imports.update({alias.asname: alias.name for alias in node.names if alias.asname})
+            elif isinstance(node, ast.ClassDef):
+                bases = []
+                for base in node.bases:
+                    parts = []
+                    while isinstance(base, ast.Attribute):
+                        parts.insert(0, base.attr)
+                        base = base.value
+                    if isinstance(base, ast.Name):
+                        bases.append(".".join([imports.get(base.id, base.id)] + parts))
+                classes.append([node.name, bases])
+        with self._scan_lock:
+            self._scan_cache[path] = [stamp, classes]
+        return classes
+    
+    def _scan_plugins(self, package: str) -> None:
+        spec = importlib.util.find_spec(package)
+        if spec is None or spec.submodule_search_locations is None:
+            raise ModuleNotFoundError(f"No package named '{package}'")
+
+        classes = {}
+        for root in spec.submodule_search_locations:
+            for dir_path, dir_names, file_names in os.walk(root):
+                dir_names[:] = sorted(name for name in dir_names if not name.startswith(".") and not name.startswith("__"))
+                relative = os.path.relpath(dir_path, root)
+                prefix = package if relative == "." else package + "." + relative.replace(os.sep, ".")
+                for file_name in sorted(file_names):
+                    if file_name.endswith(".py") and file_name != "__init__.py":
+                        module_name = f"{prefix}.{file_name[:-3]}"
+                        for class_name, bases in self._scan_module(os.path.abspath(os.path.join(dir_path, file_name))):
+                            classes[f"{module_name}.{class_name}"] = [self._resolve_base(module_name, base) for base in bases]
+        self._save_cache()
+
+        # subclasses of plugin classes of the package are plugins too. a base re-exported by an __init__ is not followed.
+        plugin_names, found = set(PLUGIN_BASES), True
+        while found:
+            found = False
+            for full_name, bases in classes.items():
+                if full_name not in plugin_names and any(base in plugin_names for base in bases):
+                    plugin_names.add(full_name)
+                    found = True
+        for full_name in classes:
+            if full_name not in self._plugins and full_name in plugin_names:
+                self._plugins[full_name] = [None, False, None]
+    
+    def _resolve_base(self, module_name: str, base: str) -> str:
+        if base.startswith("."):
+            relative = base.lstrip(".")
+            return module_name.rsplit(".", len(base) - len(relative))[0] + "." + relative
+        if "." not in base:
+            # a class defined in the same module.
+            return f"{module_name}.{base}"
+        return base
+    
+    def _plugin_class(self, target: str):
+        plugin = self._plugins[target]
+        if plugin[2] is None:
+            module_name, class_name = target.rsplit(".", 1)
+            clazz = getattr(importlib.import_module(module_name), class_name)
+            if not (inspect.isclass(clazz) and issubclass(clazz, (IPlugin, IPluginAsync))):
+                raise TypeError(f"{target} is not a subclass of IPlugin or IPluginAsync.")
+            plugin[2] = clazz
+        return plugin[2]
 
     def getPlugins(self) -> list:
         return list(self._plugins.keys())
@@ -29,7 +164,7 @@ class PluginManager:
                 plugin_module = __import__(pluginname, fromlist=['blah'])
                 clazz_members = inspect.getmembers(plugin_module, inspect.isclass)
                 for (_, clazz) in clazz_members:
-                    if issubclass(clazz, IPlugin) & (clazz is not IPlugin):
+                    if issubclass(clazz, (IPlugin, IPluginAsync)) and clazz not in (IPlugin, IPluginAsync):
                         full_name = f'{clazz.__module__}.{clazz.__name__}'
                         self._plugins[full_name] = [None, False, clazz]
         
@@ -49,30 +184,252 @@ class PluginManager:
                         continue
                     self._discover_plugins(package + '.' + child_pkg)
     
-    def plug(self, target: str = None) -> None:
-        if target is None:
-            for fullname, plugin in self._plugins.items():
-                if not plugin[1]:
-                    plugin[0] = plugin[2](fullname)
-                    plugin[0].plug(**self._kwargs)
-                    plugin[1] = True
-        else:
-            plugin = self._plugins[target]
-            if not plugin[1]:
-                plugin[0] = plugin[2](target)
-                plugin[0].plug(**self._kwargs)
-                plugin[1] = True
-    
-    def unplug(self, target: str = None) -> None:
-        if target is None:
-            for key, plugin in self._plugins.items():
-                if plugin[1]:
-                    plugin[0].unplug(**self._kwargs)
-                    del plugin[0]
-                    self._plugins[key] = [None, False, plugin[1]]
-        else:
-            plugin = self._plugins[target]
-            if plugin[1]:
-                plugin[0].unplug(**self._kwargs)
-                del plugin[0]
-                self._plugins[target] = [None, False, plugin[1]]
+    def _order(self, names: list, deps: dict) -> list:
+        # topological order. names keep their given order among independent plugins.
+        waiting = {name: [dep for dep in deps[name] if dep in deps] for name in names}
+        order, done = [], set()
+        while len(order) < len(names):
+            ready = [name for name in names if name not in done and all(dep in done for dep in waiting[name])]
+            if len(ready) == 0:
+                raise ValueError(f"plugin dependencies have a cycle in {[name for name in names if name not in done]}.")
+            order.extend(ready)
+            done.update(ready)
+        return order
+    
+    def _closure(self, target: str, plugged: bool, asynchronous: bool) -> tuple:
+        # plugins to plug with their dependencies, or plugged plugins to unplug with their dependents.
+        # without a target only the plugins to change are resolved, so a lazy manager doesn't import the others.
+        names = [name for name, plugin in self._plugins.items() if plugin[1] == plugged] if target is None else [target]
+        classes = {}
+        while names:
+            name = names.pop()
+            if name in classes:
+                continue
+            if name not in self._plugins:
+                raise KeyError(f"there is no plugin named '{name}'.")
+            classes[name] = self._plugin_class(name)
+            if target is not None and not plugged:
+                names.extend(classes[name].depends)
+        if target is not None and plugged:
+            changed = True
+            while changed:
+                changed = False
+                for name, plugin in self._plugins.items():
+                    if plugin[1] and name not in classes and any(dep in classes for dep in self._plugin_class(name).depends):
+                        classes[name] = self._plugin_class(name)
+                        changed = True
+
+        selected = [name for name in self._plugins if name in classes and self._plugins[name][1] == plugged]
+        if not asynchronous:
+            if target is not None and any(issubclass(classes[name], IPluginAsync) for name in selected):
+                raise TypeError(f"'{target}' needs an IPluginAsync plugin. use {'unplugAsync' if plugged else 'plugAsync'}().")
+            selected = [name for name in selected if not issubclass(classes[name], IPluginAsync)]
+        for name in selected:
+            for dep in classes[name].depends:
+                if dep not in self._plugins:
+                    raise KeyError(f"there is no plugin named '{dep}'. it is a dependency of '{name}'.")
+        if not asynchronous and target is None:
+            self._check_sync(selected, classes, plugged)
+        deps = {name: [dep for dep in classes[name].depends if dep in selected] for name in selected}
+        if plugged:
+            # dependents are unplugged before their dependencies.
+            deps = {name: [other for other in selected if name in deps[other]] for name in selected}
+        return self._order(selected, deps), deps
+    
+    def _check_sync(self, selected: list, classes: dict, plugged: bool) -> None:
+        # plug() and unplug() leave IPluginAsync plugins out, an IPlugin plugin must not need one of them.
+        for name in selected:
+            for dep in classes[name].depends:
+                if not plugged and not self._plugins[dep][1] and issubclass(self._plugin_class(dep), IPluginAsync):
+                    raise TypeError(f"'{name}' needs the IPluginAsync plugin '{dep}'. use plugAsync().")
+        if plugged:
+            for other, plugin in self._plugins.items():
+                if plugin[1] and issubclass(plugin[2], IPluginAsync) and any(dep in selected for dep in plugin[2].depends):
+                    raise TypeError(f"the IPluginAsync plugin '{other}' depends on IPlugin plugins to unplug. use unplugAsync().")
+    
+    def _finish(self, name: str, apply) -> None:
+        apply()
+    
+    def _plug_one(self, name: str, finish=None) -> None:
+        plugin = self._plugins[name]
+        start = time.perf_counter()
+        instance = self._plugin_class(name)(name)
+        instance.plug(**self._kwargs)
+        def apply() -> None:
+            plugin[0], plugin[1] = instance, True
+            self._timings.setdefault(name, {})["plug"] = time.perf_counter() - start
+        (finish or self._finish)(name, apply)
+    
+    def _unplug_one(self, name: str, finish=None) -> None:
+        plugin = self._plugins[name]
+        start = time.perf_counter()
+        plugin[0].unplug(**self._kwargs)
+        def apply() -> None:
+            self._plugins[name] = [None, False, plugin[2]]
+            self._timings.setdefault(name, {})["unplug"] = time.perf_counter() - start
+        (finish or self._finish)(name, apply)
+    
+    def _run(self, order: list, deps: dict, call, workers: int, timeout: float) -> None:
+        if workers <= 1 and timeout is None:
+            for name in order:
+                call(name)
+            return
+
+        dependents = {name: [other for other in order if name in deps[other]] for name in order}
+        waiting = {name: set(deps[name]) for name in order}
+        ready = [name for name in order if len(waiting[name]) == 0]
+        # at most 'workers' plugins run at once. the pool may start more threads than that, because a timed out plugin
+        # keeps its thread and must not delay the plugins after it.
+        executor = ThreadPoolExecutor(max_workers=max(len(order), 1))
+        running, started, finished, timed_out, errors = {}, {}, set(), set(), []
+        lock = threading.Lock()
+        def run(name: str) -> None:
+            # the clock of a plugin starts when it runs, not when it is submitted.
+            started[name] = time.perf_counter()
+            call(name, finish)
+        def finish(name: str, apply) -> None:
+            with lock:
+                if name not in timed_out:
+                    apply()
+                    finished.add(name)
+        try:
+            while ready or running:
+                while ready and len(running) < max(workers, 1):
+                    name = ready.pop(0)
+                    running[executor.submit(run, name)] = name
+                wait_for = None
+                if timeout is not None:
+                    now = time.perf_counter()
+                    wait_for = max(min(started.get(name, now) for name in running.values()) + timeout - now, 0)
+                done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    for dependent in dependents[name]:
+                        waiting[dependent].discard(name)
+                        if len(waiting[dependent]) == 0:
+                            ready.append(dependent)
+                if timeout is None:
+                    continue
+                now = time.perf_counter()
+                for future, name in list(running.items()):
+                    if name in started and now - started[name] >= timeout:
+                        with lock:
+                            if name in finished:
+                                continue
+                            timed_out.add(name)
+                        running.pop(future)
+                        errors.append(TimeoutError(f"plugin '{name}' did not finish in {timeout} seconds."))
+        finally:
+            # a timed out plugin keeps running on its thread. it is not waited for.
+            executor.shutdown(wait=False)
+        if errors:
+            raise errors[0]
+    
+    async def _run_async(self, order: list, deps: dict, call, timeout: float) -> None:
+        tasks = {}
+        async def run(name: str) -> None:
+            for dep in deps[name]:
+                await tasks[dep]
+            if timeout is None:
+                await call(name)
+            else:
+                await asyncio.wait_for(call(name), timeout)
+        for name in order:
+            tasks[name] = asyncio.ensure_future(run(name))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+    
+    def plug(self, target: str = None, workers: int = 1, timeout: float = None) -> None:
+        """plug a plugin after the plugins of its 'depends', or every IPlugin plugin. independent plugins are
+        plugged at the same time on a thread pool when workers is more than 1.
+
+        Args:
+            target (str, optional): full name of the plugin. None plugs every IPlugin plugin. Defaults to None.
+            workers (int, optional): number of threads. 1 plugs them one by one in dependency order. Defaults to 1.
+            timeout (float, optional): seconds a plugin may take. Defaults to None.
+
+        Raises:
+            KeyError: Occurs when the plugin or a dependency is unknown.
+            ValueError: Occurs when the dependencies have a cycle.
+            TimeoutError: Occurs when a plugin takes longer than the timeout from its start. the plugins depending on it are not plugged.
+                the timed out plugin keeps running on its thread and is not marked as plugged even if it returns.
+            TypeError: Occurs when an IPlugin plugin depends on an IPluginAsync plugin that isn't plugged. use plugAsync() then.
+        """
+        order, deps = self._closure(target, False, False)
+        self._run(order, deps, self._plug_one, workers, timeout)
+    
+    def unplug(self, target: str = None, workers: int = 1, timeout: float = None) -> None:
+        """unplug a plugin after the plugged plugins depending on it, or every IPlugin plugin.
+
+        Args:
+            target (str, optional): full name of the plugin. None unplugs every IPlugin plugin. Defaults to None.
+            workers (int, optional): number of threads. 1 unplugs them one by one in reverse dependency order. Defaults to 1.
+            timeout (float, optional): seconds a plugin may take. Defaults to None.
+
+        Raises:
+            TypeError: Occurs when a plugged IPluginAsync plugin depends on an IPlugin plugin to unplug. use unplugAsync() then.
+        """
+        order, deps = self._closure(target, True, False)
+        self._run(order, deps, self._unplug_one, workers, timeout)
+    
+    async def plugAsync(self, target: str = None, workers: int = 1, timeout: float = None) -> None:
+        """plug IPluginAsync and IPlugin plugins in dependency order. independent IPluginAsync plugins run together with asyncio
+        and IPlugin plugins run on a thread pool.
+
+        Args:
+            target (str, optional): full name of the plugin. None plugs every plugin. Defaults to None.
+            workers (int, optional): number of threads for IPlugin plugins. Defaults to 1.
+            timeout (float, optional): seconds a plugin may take. Defaults to None.
+        """
+        order, deps = self._closure(target, False, True)
+        executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        async def call(name: str) -> None:
+            plugin = self._plugins[name]
+            start = time.perf_counter()
+            instance = self._plugin_class(name)(name)
+            if isinstance(instance, IPluginAsync):
+                await instance.plug(**self._kwargs)
+            else:
+                await asyncio.get_running_loop().run_in_executor(executor, functools.partial(instance.plug, **self._kwargs))
+            plugin[0], plugin[1] = instance, True
+            self._timings.setdefault(name, {})["plug"] = time.perf_counter() - start
+        try:
+            await self._run_async(order, deps, call, timeout)
+        finally:
+            executor.shutdown(wait=False)
+    
+    async def unplugAsync(self, target: str = None, workers: int = 1, timeout: float = None) -> None:
+        """unplug IPluginAsync and IPlugin plugins after the plugged plugins depending on them.
+
+        Args:
+            target (str, optional): full name of the plugin. None unplugs every plugin. Defaults to None.
+            workers (int, optional): number of threads for IPlugin plugins. Defaults to 1.
+            timeout (float, optional): seconds a plugin may take. Defaults to None.
+        """
+        order, deps = self._closure(target, True, True)
+        executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        async def call(name: str) -> None:
+            plugin = self._plugins[name]
+            start = time.perf_counter()
+            if isinstance(plugin[0], IPluginAsync):
+                await plugin[0].unplug(**self._kwargs)
+            else:
+                await asyncio.get_running_loop().run_in_executor(executor, functools.partial(plugin[0].unplug, **self._kwargs))
+            self._plugins[name] = [None, False, plugin[2]]
+            self._timings.setdefault(name, {})["unplug"] = time.perf_counter() - start
+        try:
+            await self._run_async(order, deps, call, timeout)
+        finally:
+            executor.shutdown(wait=False)
+    
+    def getTimings(self) -> dict:
+        """
+        Returns:
+            dict: seconds of the last plug and unplug of each plugin. ex) {"pkg.mod.Plugin": {"plug": 0.12, "unplug": 0.01}}
+        """
+        return {name: dict(timing) for name, timing in self._timings.items()}
@@ -0,0 +1,38 @@
+import time, asyncio
+from danbi import Jinja2Mapper
+from danbi.database import ConnMngPsqlAsync, DBPsqlAsync
+
+QUERIES = 200
+SLEEP = 0.005
+
+async def timed(db: DBPsqlAsync, idx: int, latencies: list) -> None:
+    start = time.perf_counter()
+    await db.query("bench.sleep", {"sec": SLEEP, "idx": idx})
+    latencies.append(time.perf_counter() - start)
+
+async def main():
+    mapper = Jinja2Mapper(["res/bench/psql.yaml"], "bench-psql", 1.0)
+    print("------------------------ Throughput by Pool Size -----------------------")
+    for pool_size in [1, 2, 5, 10, 20]:
+        psql = await ConnMngPsqlAsync(
+            user="rsnet",
+            password="rsnet",
+            host="postgresql-hl.postgresql",
+            port="5432",
+            database="rsnet"
+        ).connect(min_size=pool_size, max_size=pool_size)
+        db = DBPsqlAsync(psql, mapper)
+
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*[timed(db, idx, latencies) for idx in range(QUERIES)])
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        print(f"pool: {pool_size:2d}  queries/sec: {QUERIES / elapsed:8.1f}  p50: {latencies[len(latencies) // 2] * 1000:7.1f}ms  p99: {latencies[int(len(latencies) * 0.99)] * 1000:7.1f}ms")
+
+        start = time.perf_counter()
+        await db.queryMany([("bench.sleep", {"sec": SLEEP, "idx": idx}) for idx in range(QUERIES)], concurrency=pool_size)
+        print(f"          queryMany queries/sec: {QUERIES / (time.perf_counter() - start):8.1f}")
+        await psql.close()
+
+asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,35 @@
+import time, random
+from datetime import datetime
+import pandas as pd
+from danbi import Jinja2Mapper
+from danbi.database import ConnMngPsql, DBPsql
+
+psql = ConnMngPsql(
+    user="rsnet",
+    password="rsnet",
+    host="postgresql-hl.postgresql",
+    port="5432",
+    database="rsnet"
+).connect(minconn=1, maxconn=2)
+db = DBPsql(psql, Jinja2Mapper(["res/bench/psql.yaml"], "bench-psql", 1.0))
+db.execute("bench.create")
+
+ROWS = 100_000
+now = datetime.now()
+rows = [(idx, idx % 100, random.random(), f"name-{idx}", now) for idx in range(ROWS)]
+df = pd.DataFrame(rows, columns=["id", "grp", "val", "name", "created"])
+
+def report(title, func, count):
+    db.execute("bench.truncate")
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{title:16s} rows: {count:8d}  rows/sec: {count / elapsed:12.1f}")
+
+print("--------------------------- Bulk Insert Rows/sec ---------------------------")
+report("executeMany", lambda: db.executeMany("bench.insert", rows[:ROWS // 10]), ROWS // 10)
+report("executeValues", lambda: db.executeValues("bench.insert.values", rows, page_size=1000), ROWS)
+report("copyFromRows", lambda: db.copyFromRows("bench", rows), ROWS)
+report("copyFromPandas", lambda: db.copyFromPandas("bench", df), ROWS)
+
+psql.close()
@@ -0,0 +1,31 @@
+import os, time, random, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from danbi.database import sqlite, setSqlite
+
+# SQLite stand-in for a pooled database. each thread checks out its own pooled connection.
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+setSqlite(
+    database=db_path,
+    pool_min=1,
+    pool_max=16,
+)
+sqlite.getMapper().setConfigPaths(["res/bench/sqlite.yaml"]).setNamespaceTag("bench-sqlite", 1.0)
+
+sqlite.execute("bench.create")
+sqlite.executeMany("bench.insert", [(idx, idx % 100, random.random(), f"name-{idx}") for idx in range(200_000)])
+
+def work(count: int) -> None:
+    for _ in range(count):
+        sqlite.query("bench.select", {"id": random.randrange(20_000)})
+
+TOTAL = 8000
+print("------------------------ Throughput by Threads -------------------------")
+for threads in [1, 2, 4, 8]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, [TOTAL // threads] * threads))
+    elapsed = time.perf_counter() - start
+    print(f"threads: {threads:2d}  queries/sec: {TOTAL / elapsed:9.1f}")
+
+print(sqlite.getMapper().getCacheInfo())
+sqlite.getManager().close()
@@ -0,0 +1,42 @@
+import time, asyncio
+from danbi import Jinja2Mapper
+from danbi.database import ConnMngPsqlAsync, DBPsqlAsync
+
+QUERIES = 50
+ROUNDS = 20
+
+async def main():
+    mapper = Jinja2Mapper(["res/bench/psql.yaml"], "bench-psql", 1.0)
+    psql = await ConnMngPsqlAsync(
+        user="rsnet",
+        password="rsnet",
+        host="postgresql-hl.postgresql",
+        port="5432",
+        database="rsnet"
+    ).connect(min_size=1, max_size=1)
+    db = DBPsqlAsync(psql, mapper)
+    queries = [("bench.lookup", {"idx": idx}) for idx in range(QUERIES)]
+    await db.queryBatch(queries)
+
+    print(f"------------------ {QUERIES} Small Queries x {ROUNDS} Rounds ------------------")
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for mapper_name, values in queries:
+            await db.query(mapper_name, values)
+    sequential = time.perf_counter() - start
+    print(f"sequential query           : {sequential / ROUNDS * 1000:8.2f}ms/batch")
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await db.queryBatch(queries)
+    elapsed = time.perf_counter() - start
+    print(f"queryBatch                 : {elapsed / ROUNDS * 1000:8.2f}ms/batch  x{sequential / elapsed:5.2f}")
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await db.queryBatch(queries, transaction=True)
+    elapsed = time.perf_counter() - start
+    print(f"queryBatch(transaction)    : {elapsed / ROUNDS * 1000:8.2f}ms/batch  x{sequential / elapsed:5.2f}")
+    await psql.close()
+
+asyncio.get_event_loop().run_until_complete(main())
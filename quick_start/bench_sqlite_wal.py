@@ -0,0 +1,53 @@
+import os, time, random, sqlite3, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from danbi import Jinja2Mapper
+from danbi.database import ConnMngSqlite, ConnMngSqliteWAL, DBSqlite
+
+ROWS = 20_000
+TOTAL = 4000
+WRITE_RATIO = 0.2
+
+def prepare(db: DBSqlite) -> None:
+    db.execute("bench.create")
+    with db.transaction() as tx:
+        tx.executeMany("bench.insert", [(idx, idx % 100, random.random(), f"name-{idx}") for idx in range(ROWS)])
+
+def work(db: DBSqlite, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        if random.random() < WRITE_RATIO:
+            db.execute("bench.update", {"id": random.randrange(ROWS), "val": random.random()})
+        else:
+            db.query("bench.select", {"id": random.randrange(ROWS)})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run(title: str, db: DBSqlite) -> None:
+    prepare(db)
+    print(f"------------------ {title} ({int(WRITE_RATIO * 100)}% writes) ------------------")
+    for threads in [1, 2, 4, 8]:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(work, [db] * threads, [TOTAL // threads] * threads))
+        elapsed = time.perf_counter() - start
+        latencies = sorted(latency for result in results for latency in result)
+        print(f"threads: {threads:2d}  ops/sec: {TOTAL / elapsed:9.1f}  p99: {latencies[int(len(latencies) * 0.99)] * 1000:7.2f}ms")
+    db.getManager().close()
+
+mapper = Jinja2Mapper(["res/bench/sqlite.yaml"], "bench-sqlite", 1.0)
+
+pooled = ConnMngSqlite().connect(
+    creator=sqlite3,
+    database=os.path.join(tempfile.mkdtemp(), "bench.db"),
+    maxconnections=8,
+    blocking=True,
+    isolation_level=None,
+    check_same_thread=False,
+    timeout=30
+)
+run("PooledDB, rollback journal", DBSqlite(pooled, mapper))
+
+wal = ConnMngSqliteWAL().connect(database=os.path.join(tempfile.mkdtemp(), "bench.db"))
+run("ConnMngSqliteWAL", DBSqlite(wal, mapper))
+print(wal.getStats()["wait"]["count"], "writer checkouts")
@@ -0,0 +1,12 @@
+from unittest import TestCase
+from psycopg2 import OperationalError
+from danbi.database.ConnMngPsql import ConnMngPsql
+
+class TestConnMngPsql(TestCase):
+    def test_connect_fails_fast(self):
+        # nothing listens on port 1, so the first connection is refused at once.
+        for prewarm in (True, False):
+            manager = ConnMngPsql()
+            with self.assertRaises(OperationalError):
+                manager.connect(host="127.0.0.1", port=1, user="danbi", dbname="danbi", minconn=2, maxconn=2, pool_prewarm=prewarm)
+            assert manager.isConnect() is False
@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+from unittest import TestCase
+from danbi.database.ConnMngPsqlAsync import ConnMngPsqlAsync
+
+class StubConnection:
+    def __init__(self):
+        self.depth = 0
+    
+    def is_in_transaction(self):
+        return self.depth > 0
+    
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+class StubPool:
+    def __init__(self):
+        self.conn = StubConnection()
+    
+    @contextlib.asynccontextmanager
+    async def acquire(self, **kwargs):
+        yield self.conn
+
+class TestConnMngPsqlAsync(TestCase):
+    def setUp(self):
+        self.manager = ConnMngPsqlAsync()
+        self.manager._conn_pool = StubPool()
+    
+    def test_savepoint(self):
+        async def run() -> list:
+            depths = []
+            async with self.manager.transaction() as conn:
+                async with self.manager.savepoint():
+                    depths.append(conn.depth)
+            async with self.manager.pin() as conn:
+                async with self.manager.transaction():
+                    async with self.manager.savepoint():
+                        depths.append(conn.depth)
+            return depths
+
+        assert asyncio.run(run()) == [2, 2]
+    
+    def test_savepoint_outside(self):
+        async def run(scope) -> None:
+            async with scope:
+                async with self.manager.savepoint():
+                    pass
+
+        for scope in (contextlib.nullcontext(), self.manager.pin()):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(run(scope))
+        assert self.manager._conn_pool.conn.depth == 0
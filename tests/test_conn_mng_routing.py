@@ -0,0 +1,117 @@
+import time
+from unittest import TestCase
+from danbi.database.IConnectionManager import IConnectionManager
+from danbi.database.ConnMngRouting import ConnMngRouting
+
+class StubCursor:
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def execute(self, sql, values=None):
+        if self._conn.manager.fail:
+            raise ConnectionError("down")
+    
+    def close(self):
+        pass
+
+class StubConnection:
+    def __init__(self, manager):
+        self.manager = manager
+        self.closed = 0
+    
+    def cursor(self):
+        return StubCursor(self)
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        pass
+
+class StubManager(IConnectionManager):
+    def connect(self, **kwargs):
+        self._conn_pool = []
+        self.fail = False
+        return self
+    
+    def isConnect(self):
+        return self._conn_pool is not None
+    
+    def close(self, **kwargs):
+        self._conn_pool = None
+    
+    def getConnection(self, auto_commit=True, **kwargs):
+        if self.fail:
+            raise ConnectionError("down")
+        conn = StubConnection(self)
+        self._conn_pool.append(conn)
+        return conn
+    
+    def releaseConnection(self, conn):
+        self._conn_pool.remove(conn)
+
+class TestConnMngRouting(TestCase):
+    def setUp(self):
+        self.primary = StubManager().connect()
+        self.replicas = [StubManager().connect(), StubManager().connect()]
+        self.router = ConnMngRouting().connect(primary=self.primary, replicas=self.replicas, eject_failures=2, readmit_after=0.05)
+    
+    def test_routing(self):
+        conn = self.router.getConnection()
+        assert conn.manager is self.primary
+        self.router.releaseConnection(conn)
+
+        conn = self.router.getConnection(read_only=True)
+        assert conn.manager in self.replicas
+        self.router.releaseConnection(conn)
+    
+    def test_least_outstanding(self):
+        first = self.router.getConnection(read_only=True)
+        second = self.router.getConnection(read_only=True)
+        assert {first.manager, second.manager} == set(self.replicas)
+
+        self.router.releaseConnection(first)
+        third = self.router.getConnection(read_only=True)
+        assert third.manager is first.manager
+        assert self.router.getStats()["replica0"]["outstanding"] == 1
+        assert self.router.getStats()["replica1"]["outstanding"] == 1
+    
+    def test_eject_readmit(self):
+        self.replicas[0].fail = True
+        for _ in range(4):
+            self.router.releaseConnection(self.router.getConnection(read_only=True))
+
+        stats = self.router.getStats()
+        assert stats["replica0"]["ejected"] and stats["replica0"]["ejections"] == 1
+        assert stats["replica0"]["errors"] == 2
+        for _ in range(4):
+            conn = self.router.getConnection(read_only=True)
+            assert conn.manager is self.replicas[1]
+            self.router.releaseConnection(conn)
+
+        self.replicas[0].fail = False
+        time.sleep(0.06)
+        managers = set()
+        for _ in range(4):
+            conn = self.router.getConnection(read_only=True)
+            managers.add(conn.manager)
+            self.router.releaseConnection(conn)
+        assert self.replicas[0] in managers
+        assert not self.router.getStats()["replica0"]["ejected"]
+    
+    def test_fallback_to_primary(self):
+        for replica in self.replicas:
+            replica.fail = True
+
+        conn = self.router.getConnection(read_only=True)
+        assert conn.manager is self.primary
+        self.router.releaseConnection(conn)
+    
+    def test_health(self):
+        self.replicas[1].fail = True
+
+        assert self.router.checkHealth() == {"primary": True, "replica0": True, "replica1": False}
+    
+    def test_not_connected(self):
+        with self.assertRaises(RuntimeError):
+            ConnMngRouting().getConnection()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+from danbi.database.ConnMngSqliteWAL import ConnMngSqliteWAL
+
+class TestConnMngSqliteWAL(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manager = ConnMngSqliteWAL().connect(database=os.path.join(self.directory, "test.db"), write_timeout=0.05)
+    
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.directory)
+    
+    def test_pragmas(self):
+        with self.manager.connection(read_only=True) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    
+    def test_readers(self):
+        readers = []
+        def read() -> None:
+            with self.manager.connection(read_only=True) as conn:
+                readers.append(conn)
+
+        read()
+        read()
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+
+        assert readers[0] is readers[1]
+        assert readers[2] is not readers[0]
+        assert self.manager.getStats()["reads"] == 3
+    
+    def test_writer(self):
+        writer = self.manager.getConnection()
+        with self.assertRaises(TimeoutError):
+            self.manager.getConnection()
+        self.manager.releaseConnection(writer)
+
+        with self.manager.connection() as conn:
+            assert conn is writer
+        stats = self.manager.getStats()
+        assert (stats["writes"], stats["timeouts"], stats["waiting"]) == (2, 1, 0)
+    
+    def test_transaction(self):
+        with self.manager.connection() as conn:
+            conn.execute("CREATE TABLE code (id INTEGER)")
+        with self.assertRaises(ZeroDivisionError):
+            with self.manager.transaction() as conn:
+                conn.execute("INSERT INTO code VALUES (1)")
+                1 / 0
+        with self.manager.transaction() as conn:
+            conn.execute("INSERT INTO code VALUES (2)")
+
+        with self.manager.connection(read_only=True) as conn:
+            assert conn.execute("SELECT id FROM code").fetchall() == [(2,)]
+    
+    def test_memory(self):
+        with self.assertRaises(ValueError):
+            ConnMngSqliteWAL().connect(database=":memory:")
+    
+    def test_not_connected(self):
+        with self.assertRaises(RuntimeError):
+            ConnMngSqliteWAL().getConnection()
@@ -0,0 +1,56 @@
+import math
+from unittest import TestCase
+import numpy as np
+from danbi.database.CopyStream import CopyStream
+
+class TestCopyStream(TestCase):
+    def test_encode(self):
+        stream = CopyStream([(1, "a\tb", None), (2.5, "line\nbreak\\", math.nan), (b"\x00\xff", "cr\r", True)])
+
+        assert stream.read() == "1\ta\\tb\t\\N\n2.5\tline\\nbreak\\\\\t\\N\n\\\\x00ff\tcr\\r\tTrue\n"
+        assert stream.count == 3
+    
+    def test_json_array(self):
+        stream = CopyStream([
+            ({"a": 1, "b": [None, "x\ty"]}, [1, 2], ("a,b", 'q"uote', "back\\slash", None)),
+            ([[1, 2], [3, math.nan]], np.array([1.5, 2.5]), [{"k": "v"}, b"\x01"]),
+            ([], {}, ["가", ""]),
+        ])
+
+        assert stream.read().split("\n")[:-1] == [
+            '{"a": 1, "b": [null, "x\\\\ty"]}\t{1,2}\t{"a,b","q\\\\"uote","back\\\\\\\\slash",NULL}',
+            '{{1,2},{3,NULL}}\t{1.5,2.5}\t{"{\\\\"k\\\\": \\\\"v\\\\"}","\\\\\\\\x01"}',
+            '{}\t{}\t{"가",""}',
+        ]
+    
+    def test_read_size(self):
+        rows = [(idx, "x" * 10) for idx in range(100)]
+        stream = CopyStream(rows)
+
+        chunks = []
+        chunk = stream.read(7)
+        while chunk:
+            assert len(chunk) <= 7
+            chunks.append(chunk)
+            chunk = stream.read(7)
+
+        assert "".join(chunks) == "".join(f"{idx}\t{'x' * 10}\n" for idx in range(100))
+        assert stream.count == 100
+    
+    def test_lazy(self):
+        pulled = []
+        def rows():
+            for idx in range(1000):
+                pulled.append(idx)
+                yield (idx,)
+        stream = CopyStream(rows())
+
+        stream.read(4)
+        assert len(pulled) < 10
+    
+    def test_empty(self):
+        stream = CopyStream([])
+
+        assert stream.read() == ""
+        assert stream.read(10) == ""
+        assert stream.count == 0
@@ -0,0 +1,65 @@
+from unittest import TestCase
+from danbi.database.ConnMngSqliteWAL import ConnMngSqliteWAL
+from danbi.database.DBPsql import DBPsql
+from danbi.mapping.Jinja2Mapper import Jinja2Mapper
+
+class StubCursor:
+    def __init__(self, conn):
+        self.connection = conn
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        pass
+    
+    def execute(self, sql, values=None):
+        self.connection.sqls.append(sql.split(" AS ")[0])
+
+class StubConnection:
+    autocommit = True
+    
+    def __init__(self):
+        self.sqls = []
+    
+    def cursor(self):
+        return StubCursor(self)
+
+class TestDBPsql(TestCase):
+    def setUp(self):
+        self.db = DBPsql(ConnMngSqliteWAL(), Jinja2Mapper())
+        self.conn = StubConnection()
+    
+    def execute(self, mapper_name: str) -> list:
+        start = len(self.conn.sqls)
+        self.db._execute(self.conn.cursor(), f"SELECT '{mapper_name}'", {}, mapper_name)
+        return [sql.rsplit("_", 1)[0] for sql in self.conn.sqls[start:]]
+    
+    def test_prepared(self):
+        self.db.setPreparedStatement(2)
+        assert self.execute("a") == ["PREPARE danbi_stmt", "EXECUTE danbi_stmt"]
+        assert self.execute("a") == ["EXECUTE danbi_stmt"]
+        self.execute("b")
+        assert self.execute("c") == ["PREPARE danbi_stmt", "DEALLOCATE danbi_stmt", "EXECUTE danbi_stmt"]
+        assert self.db.getStatementCacheInfo()["prepared"]["size"] == 2
+    
+    def test_resize(self):
+        self.db.setPreparedStatement(2)
+        self.execute("a")
+        self.execute("b")
+        prepared = [sql for sql in self.conn.sqls if sql.startswith("PREPARE")]
+
+        self.db.setPreparedStatement(1)
+        assert self.execute("a") == ["DEALLOCATE danbi_stmt", "DEALLOCATE danbi_stmt", "PREPARE danbi_stmt", "EXECUTE danbi_stmt"]
+        deallocated = [sql for sql in self.conn.sqls if sql.startswith("DEALLOCATE")]
+        assert [sql.split()[1] for sql in deallocated] == [sql.split()[1] for sql in prepared]
+        self.execute("b")
+        assert self.db.getStatementCacheInfo()["prepared"]["size"] == 1
+    
+    def test_disable(self):
+        self.db.setPreparedStatement(2)
+        self.execute("a")
+        self.db.setPreparedStatement(0)
+        assert self.execute("a") == ["DEALLOCATE danbi_stmt", "SELECT 'a'"]
+        assert self.execute("a") == ["SELECT 'a'"]
+        assert self.db.getStatementCacheInfo()["prepared"]["connections"] == 0
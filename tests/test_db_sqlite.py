@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import pyarrow as pa
+import pyarrow.parquet as pq
+from danbi.database.ConnMngSqliteWAL import ConnMngSqliteWAL
+from danbi.database.DBSqlite import DBSqlite
+from danbi.mapping.Jinja2Mapper import Jinja2Mapper
+
+MAPPER = """
+namespace: test
+tag: 1
+mapper:
+- name: code.create
+  temp: CREATE TABLE code (id INTEGER, name TEXT)
+- name: code.select
+  ttl: 60
+  tags: [code]
+  temp: SELECT id, name FROM code ORDER BY id
+- name: code.insert
+  tags: [code]
+  temp: INSERT INTO code VALUES (:id, :name)
+"""
+
+class TestDBSqlite(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        mapper_path = os.path.join(self.directory, "mapper.yaml")
+        with open(mapper_path, "w") as file:
+            file.write(MAPPER)
+        manager = ConnMngSqliteWAL().connect(database=os.path.join(self.directory, "test.db"))
+        self.db = DBSqlite(manager, Jinja2Mapper([mapper_path], "test", 1))
+        self.db.execute("code.create")
+    
+    def tearDown(self):
+        self.db.getManager().close()
+        shutil.rmtree(self.directory)
+    
+    def test_transaction(self):
+        with self.db.transaction() as tx:
+            tx.execute("code.insert", {"id": 1, "name": "a"})
+            tx.execute("code.insert", {"id": 2, "name": "b"})
+        with self.assertRaises(ZeroDivisionError):
+            with self.db.transaction() as tx:
+                tx.execute("code.insert", {"id": 3, "name": "c"})
+                1 / 0
+
+        assert self.db.query("code.select") == [(1, "a"), (2, "b")]
+    
+    def test_savepoint(self):
+        with self.db.transaction() as tx:
+            tx.execute("code.insert", {"id": 1, "name": "a"})
+            with self.assertRaises(ZeroDivisionError):
+                with tx.savepoint():
+                    tx.execute("code.insert", {"id": 2, "name": "b"})
+                    1 / 0
+            with tx.transaction():
+                tx.execute("code.insert", {"id": 3, "name": "c"})
+
+        assert self.db.query("code.select") == [(1, "a"), (3, "c")]
+    
+    def test_result_cache(self):
+        self.db.setResultCache()
+        self.db.execute("code.insert", {"id": 1, "name": "a"})
+        assert self.db.query("code.select") == [(1, "a")]
+        assert self.db.query("code.select") == [(1, "a")]
+        assert self.db.getResultCache().getInfo()["hits"] == 1
+
+        with self.db.transaction() as tx:
+            tx.execute("code.insert", {"id": 2, "name": "b"})
+            # inside the transaction the cache is bypassed.
+            assert tx.query("code.select") == [(1, "a"), (2, "b")]
+        assert self.db.query("code.select") == [(1, "a"), (2, "b")]
+    
+    def test_arrow(self):
+        self.db.executeManyRaw("INSERT INTO code VALUES (?, ?)", [(None, None)] * 3 + [(idx, "a") for idx in range(3)])
+        table = self.db.queryArrowRaw("SELECT id, name FROM code", (), dictionary=False, chunksize=2)
+
+        # the first chunk has only NULLs, the later ones keep the types of the first values.
+        assert table.schema.field("id").type == pa.int64()
+        assert table.schema.field("name").type == pa.string()
+        assert table.column("id").to_pylist() == [None, None, None, 0, 1, 2]
+
+        self.db.executeRaw("INSERT INTO code VALUES (1.5, 'b')")
+        table = self.db.queryArrowRaw("SELECT id FROM code", (), chunksize=2)
+        assert table.column("id").to_pylist()[-1] == 1.5
+    
+    def test_parquet(self):
+        self.db.executeManyRaw("INSERT INTO code VALUES (?, ?)", [(None, None)] * 3 + [(idx, "a") for idx in range(3)])
+        path = os.path.join(self.directory, "code.parquet")
+
+        assert self.db.queryParquetRaw("SELECT id, name FROM code", path, (), chunksize=2) == 6
+        table = pq.read_table(path)
+        assert table.schema.field("id").type == pa.int64()
+        assert table.column("name").to_pylist() == [None, None, None, "a", "a", "a"]
+    
+    def test_parquet_conflict(self):
+        self.db.executeManyRaw("INSERT INTO code VALUES (?, ?)", [(1, "a"), (2, "b"), (2.5, "c")])
+        path = os.path.join(self.directory, "code.parquet")
+
+        with self.assertRaises(TypeError):
+            self.db.queryParquetRaw("SELECT id FROM code", path, (), chunksize=2)
+        # no partial file is left behind.
+        assert not any(name.startswith("code.parquet") for name in os.listdir(self.directory))
@@ -0,0 +1,63 @@
+import time
+import threading
+from unittest import TestCase
+from danbi.database.FairSlots import FairSlots
+
+class TestFairSlots(TestCase):
+    def test_acquire(self):
+        slots = FairSlots(2)
+
+        assert slots.acquire(0)
+        assert slots.acquire(0)
+        assert not slots.acquire(0.01)
+        slots.release()
+        assert slots.acquire(0)
+    
+    def test_timeout(self):
+        slots = FairSlots(1)
+        slots.acquire()
+
+        start = time.perf_counter()
+        assert not slots.acquire(0.05)
+        assert time.perf_counter() - start >= 0.05
+        assert slots.waiting() == 0
+    
+    def test_arrival_order(self):
+        slots = FairSlots(1)
+        slots.acquire()
+        order = []
+        def waiter(idx: int) -> None:
+            slots.acquire()
+            order.append(idx)
+            slots.release()
+
+        threads = []
+        for idx in range(5):
+            thread = threading.Thread(target=waiter, args=(idx,))
+            thread.start()
+            threads.append(thread)
+            while slots.waiting() <= idx:
+                time.sleep(0.001)
+        slots.release()
+        for thread in threads:
+            thread.join(1)
+
+        assert order == [0, 1, 2, 3, 4]
+    
+    def test_no_barging(self):
+        slots = FairSlots(1)
+        slots.acquire()
+        acquired = threading.Event()
+        def waiter() -> None:
+            slots.acquire()
+            acquired.set()
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        while slots.waiting() == 0:
+            time.sleep(0.001)
+
+        # the freed slot belongs to the waiter, a new caller doesn't take it.
+        slots.release()
+        assert not slots.acquire(0)
+        thread.join(1)
+        assert acquired.is_set()
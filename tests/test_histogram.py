@@ -0,0 +1,21 @@
+from unittest import TestCase
+from danbi.database.Histogram import Histogram
+
+class TestHistogram(TestCase):
+    def test_buckets(self):
+        histogram = Histogram([0.1, 1.0])
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        info = histogram.getInfo()
+        assert info["buckets"] == {0.1: 2, 1.0: 3, "+Inf": 4}
+        assert info["count"] == 4
+        assert abs(info["sum"] - 2.65) < 1e-9
+        assert (info["min"], info["max"]) == (0.05, 2.0)
+    
+    def test_empty(self):
+        info = Histogram().getInfo()
+
+        assert info["count"] == 0
+        assert info["min"] is None and info["max"] is None
+        assert list(info["buckets"].values()) == [0] * (len(Histogram.DEFAULT_BUCKETS) + 1)
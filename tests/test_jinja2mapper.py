@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from danbi.mapping.Jinja2Mapper import Jinja2Mapper
+
+MAPPER = """
+namespace: test
+tag: 1
+mapper:
+- name: code.select
+  ttl: {ttl}
+  temp: SELECT {column} FROM code WHERE id = {{{{ values.id }}}}
+- name: code.count
+  temp: SELECT count(*) FROM code
+"""
+
+class TestJinja2Mapper(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "mapper.yaml")
+        self.write("id", 60)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def write(self, column: str, ttl: int) -> None:
+        stamp = os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+        with open(self.path, "w") as file:
+            file.write(MAPPER.format(column=column, ttl=ttl))
+        if stamp is not None:
+            os.utime(self.path, ns=(stamp + 10**9, stamp + 10**9))
+    
+    def test_reload(self):
+        mapper = Jinja2Mapper([self.path], "test", 1)
+        version = mapper.getVersion()
+        assert mapper.get("code.select", {"id": 1}) == "SELECT id FROM code WHERE id = 1"
+        mapper.get("code.count")
+        assert mapper.reload() is False
+        assert mapper.getVersion() == version
+
+        self.write("name", 30)
+        assert mapper.reload() is True
+        assert mapper.getVersion() == version + 1
+        assert mapper.get("code.select", {"id": 2}) == "SELECT name FROM code WHERE id = 2"
+        assert mapper.getMeta("code.select") == {"ttl": 30}
+        assert mapper.getMeta("code.count") == {}
+
+        assert mapper.getCacheInfo()["misses"] == 2
+    
+    def test_reload_failure(self):
+        mapper = Jinja2Mapper([self.path], "test", 1)
+        stamp = os.stat(self.path).st_mtime_ns
+        with open(self.path, "w") as file:
+            file.write(MAPPER.format(column="id", ttl=60).replace("tag: 1", "tag: 2"))
+        os.utime(self.path, ns=(stamp + 10**9, stamp + 10**9))
+
+        with self.assertRaises(Exception):
+            mapper.reload()
+        assert mapper.get("code.select", {"id": 1}) == "SELECT id FROM code WHERE id = 1"
+    
+    def test_bundle(self):
+        bundle = os.path.join(self.directory, "mapper.bundle")
+        digest = Jinja2Mapper([self.path], "test", 1).buildBundle(bundle)
+
+        mapper = Jinja2Mapper([self.path])
+        assert mapper.loadBundle(bundle, "test", 1) is True
+        assert mapper.loadBundle(bundle, "test", 2) is False
+        assert mapper.get("code.select", {"id": 1}) == "SELECT id FROM code WHERE id = 1"
+        assert mapper.getMeta("code.select") == {"ttl": 60}
+        assert Jinja2Mapper([self.path], "test", 1).buildBundle(bundle) == digest
+    
+    def test_bundle_invalidation(self):
+        bundle = os.path.join(self.directory, "mapper.bundle")
+        Jinja2Mapper([self.path], "test", 1, bundle=bundle)
+        assert os.path.exists(bundle)
+
+        self.write("name", 30)
+        assert Jinja2Mapper([self.path]).loadBundle(bundle, "test", 1) is False
+        mapper = Jinja2Mapper([self.path], "test", 1, bundle=bundle)
+        assert mapper.get("code.select", {"id": 1}) == "SELECT name FROM code WHERE id = 1"
+        assert Jinja2Mapper([self.path]).loadBundle(bundle, "test", 1) is True
+
+        with open(bundle, "wb") as file:
+            file.write(b"broken")
+        assert Jinja2Mapper([self.path]).loadBundle(bundle, "test", 1) is False
+        mapper = Jinja2Mapper([self.path], "test", 1, bundle=bundle)
+        assert mapper.getMeta("code.select") == {"ttl": 30}
@@ -0,0 +1,98 @@
+import struct
+import datetime
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from danbi.database.pgbinary import COPY_SIGNATURE, decodeCopyBinary
+
+def copyBinary(rows: list) -> bytes:
+    """binary COPY output of rows of already encoded fields. None is NULL."""
+    data = COPY_SIGNATURE + struct.pack(">ii", 0, 0)
+    for row in rows:
+        data += struct.pack(">h", len(row))
+        for field in row:
+            data += struct.pack(">i", -1) if field is None else struct.pack(">i", len(field)) + field
+    return data + struct.pack(">h", -1)
+
+def numeric(digits: list, weight: int, negative: bool = False, scale: int = 0) -> bytes:
+    return struct.pack(">hhHH", len(digits), weight, 0x4000 if negative else 0, scale) + struct.pack(f">{len(digits)}H", *digits)
+
+class TestDecodeCopyBinary(TestCase):
+    def test_fixed(self):
+        data = copyBinary([
+            (struct.pack(">q", 1), struct.pack(">d", 1.5), struct.pack(">?", True)),
+            (struct.pack(">q", -2), struct.pack(">d", 2.5), struct.pack(">?", False)),
+        ])
+        df = decodeCopyBinary(data, ["id", "price", "flag"], [20, 701, 16])
+
+        assert df["id"].tolist() == [1, -2]
+        assert df["id"].dtype == np.int64
+        assert df["price"].tolist() == [1.5, 2.5]
+        assert df["flag"].tolist() == [True, False]
+    
+    def test_nulls(self):
+        data = copyBinary([
+            (struct.pack(">i", 1), None, None),
+            (None, struct.pack(">d", 2.5), struct.pack(">?", True)),
+        ])
+        df = decodeCopyBinary(data, ["id", "price", "flag"], [23, 701, 16])
+
+        assert str(df["id"].dtype) == "Int32"
+        assert df["id"].isna().tolist() == [False, True]
+        assert np.isnan(df["price"][0])
+        assert str(df["flag"].dtype) == "boolean"
+        assert df["flag"].isna().tolist() == [True, False]
+    
+    def test_text_numeric(self):
+        data = copyBinary([
+            ("가나다".encode("utf-8"), numeric([12, 3400], 0, scale=2)),
+            (None, numeric([5], -1, negative=True, scale=4)),
+            ("b".encode("utf-8"), None),
+        ])
+        df = decodeCopyBinary(data, ["name", "amount"], [25, 1700])
+
+        assert df["name"].tolist()[0] == "가나다"
+        assert df["name"].isna().tolist() == [False, True, False]
+        assert df["amount"].tolist()[:2] == [12.34, -0.0005]
+        assert np.isnan(df["amount"][2])
+    
+    def test_layouts(self):
+        # long runs, alternating and many distinct sets of NULLs in the same result.
+        rows, expected = [], []
+        for idx in range(3000):
+            ids = [idx] + [idx if (idx >> bit) % 2 == 0 or idx < 1000 else None for bit in range(6)]
+            name = None if idx % 3 == 0 else "n" * (idx % 5)
+            rows.append(tuple(None if value is None else struct.pack(">q", value) for value in ids) + (None if name is None else name.encode("utf-8"),))
+            expected.append(ids + [name])
+        df = decodeCopyBinary(copyBinary(rows), [f"c{idx}" for idx in range(8)], [20] * 7 + [25])
+
+        assert df.astype(object).where(df.notna(), None).values.tolist() == expected
+        assert df["c0"].dtype == np.int64
+        assert str(df["c1"].dtype) == "Int64"
+
+        df = decodeCopyBinary(copyBinary([row[:7] for row in rows]), [f"c{idx}" for idx in range(7)], [20] * 7)
+        assert df.astype(object).where(df.notna(), None).values.tolist() == [values[:7] for values in expected]
+    
+    def test_datetime(self):
+        data = copyBinary([
+            (struct.pack(">i", 1), struct.pack(">q", 1000000), struct.pack(">q", 0)),
+            (None, None, None),
+        ])
+        df = decodeCopyBinary(data, ["day", "at", "at_tz"], [1082, 1114, 1184])
+
+        assert df["day"][0] == pd.Timestamp(datetime.date(2000, 1, 2))
+        assert df["at"][0] == pd.Timestamp("2000-01-01 00:00:01")
+        assert df["at_tz"][0] == pd.Timestamp("2000-01-01", tz="UTC")
+        assert df.iloc[1].isna().all()
+    
+    def test_empty(self):
+        df = decodeCopyBinary(copyBinary([]), ["id", "name"], [20, 25])
+
+        assert len(df) == 0
+        assert df.columns.tolist() == ["id", "name"]
+    
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            decodeCopyBinary(b"not a copy", ["id"], [20])
+        with self.assertRaises(ValueError):
+            decodeCopyBinary(copyBinary([]), ["data"], [3802])
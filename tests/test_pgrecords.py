@@ -0,0 +1,75 @@
+import decimal
+import datetime
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from danbi.database.pgrecords import decodeRecords, inferOids
+
+UTC = datetime.timezone.utc
+
+class TestDecodeRecords(TestCase):
+    def test_types(self):
+        records = [
+            (1, 1.5, True, "a", datetime.datetime(2020, 1, 1, tzinfo=UTC), datetime.date(2020, 1, 2)),
+            (2, 2.5, False, "b", datetime.datetime(2020, 1, 3, tzinfo=UTC), datetime.date(2020, 1, 4)),
+        ]
+        df = decodeRecords(records, ["id", "price", "flag", "name", "at", "day"], [20, 701, 16, 25, 1184, 1082])
+
+        assert df["id"].dtype == np.int64
+        assert df["price"].dtype == np.float64
+        assert df["flag"].dtype == bool
+        assert df["at"].tolist() == [pd.Timestamp("2020-01-01", tz="UTC"), pd.Timestamp("2020-01-03", tz="UTC")]
+        assert df["day"].tolist() == [pd.Timestamp("2020-01-02"), pd.Timestamp("2020-01-04")]
+        assert df["name"].tolist() == ["a", "b"]
+    
+    def test_nulls(self):
+        records = [(1, None, True, None), (None, 2.5, None, datetime.datetime(2020, 1, 1, tzinfo=UTC))]
+        df = decodeRecords(records, ["id", "price", "flag", "at"], [23, 701, 16, 1184])
+
+        assert str(df["id"].dtype) == "Int32"
+        assert df["id"].isna().tolist() == [False, True]
+        assert np.isnan(df["price"][0])
+        assert str(df["flag"].dtype) == "boolean"
+        assert df["at"].isna().tolist() == [True, False]
+    
+    def test_numeric(self):
+        records = [(decimal.Decimal("0.10"),), (None,)]
+
+        df = decodeRecords(records, ["amount"], [1700])
+        assert df["amount"].tolist() == [decimal.Decimal("0.10"), None]
+
+        df = decodeRecords(records, ["amount"], [1700], {"amount": "float64"})
+        assert df["amount"].dtype == np.float64
+        assert df["amount"][0] == 0.1
+    
+    def test_empty(self):
+        df = decodeRecords([], ["id", "name"], [20, 25])
+
+        assert len(df) == 0
+        assert df.columns.tolist() == ["id", "name"]
+    
+    def test_dtype_category(self):
+        records = [(1, "a"), (2, "b"), (3, "a")]
+
+        df = decodeRecords(records, ["id", "name"], [20, 25], {"id": "float32"}, category=True)
+        assert df["id"].dtype == np.float32
+        assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+        assert sorted(df["name"].cat.categories) == ["a", "b"]
+
+        with self.assertRaises(ValueError):
+            decodeRecords(records, ["id", "name"], [20, 25], {"name": "int64"})
+    
+    def test_nullable(self):
+        chunks = [[(1, True, "a")], [(None, None, None)]]
+        dtypes = [decodeRecords(chunk, ["id", "flag", "name"], [20, 16, 25], nullable=True).dtypes.tolist() for chunk in chunks]
+
+        assert dtypes[0] == dtypes[1]
+        assert str(dtypes[0][0]) == "Int64"
+    
+    def test_infer_oids(self):
+        records = [
+            (None, True, 1.5, decimal.Decimal("1"), datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 1, tzinfo=UTC), datetime.date(2020, 1, 1), "a", None),
+            (1, False, None, None, None, None, None, None, None),
+        ]
+
+        assert inferOids(records) == [20, 16, 701, 1700, 1114, 1184, 1082, 25, None]
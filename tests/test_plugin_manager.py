@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+import textwrap
+from unittest import TestCase
+from danbi.plugable import PluginManager
+
+class TestPluginManager(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.packages = []
+        sys.path.insert(0, self.directory)
+    
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in list(sys.modules):
+            if name.split(".")[0] in self.packages:
+                del sys.modules[name]
+        shutil.rmtree(self.directory)
+    
+    def package(self, name: str, modules: dict) -> str:
+        self.packages.append(name)
+        for module, source in modules.items():
+            path = os.path.join(self.directory, name, *module.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for directory in range(len(module.split("/"))):
+                init = os.path.join(self.directory, name, *module.split("/")[:directory], "__init__.py")
+                if not os.path.exists(init):
+                    open(init, "w").close()
+            with open(path, "w") as file:
+                file.write(textwrap.dedent(source))
+        return name
+    
+    def test_lazy_scan(self):
+        package = self.package("lazy_scan", {
+            "base.py": """
+                from danbi.plugable import IPlugin
+                class Base(IPlugin):
+                    def plug(self, **kwargs): return True
+                    def unplug(self, **kwargs): return True
+                """,
+            "real.py": """
+                from .base import Base
+                class Real(Base):
+                    pass
+                class Helper:
+                    pass
+                """,
+            "alias.py": """
+                import danbi.plugable as dp
+                class Aliased(dp.IPluginAsync):
+                    async def plug(self, **kwargs): return True
+                    async def unplug(self, **kwargs): return True
+                """,
+            "fake.py": """
+                class IPlugin:
+                    pass
+                class NotPlugin(IPlugin):
+                    pass
+                """,
+            "sub/deep.py": """
+                from ..real import Real as Parent
+                class Deep(Parent):
+                    pass
+                """,
+        })
+        manager = PluginManager().addPackagePath(package, lazy=True)
+        assert sorted(manager.getPlugins()) == [
+            "lazy_scan.alias.Aliased", "lazy_scan.base.Base", "lazy_scan.real.Real", "lazy_scan.sub.deep.Deep",
+        ]
+        assert "lazy_scan.real" not in sys.modules
+
+        manager.plug("lazy_scan.sub.deep.Deep")
+        assert "lazy_scan.sub.deep" in sys.modules
+        assert "lazy_scan.real" in sys.modules
+        assert "lazy_scan.alias" not in sys.modules
+
+        eager = PluginManager().addPackagePath(package)
+        assert sorted(eager.getPlugins()) == sorted(manager.getPlugins())
+    
+    def test_discovery_cache(self):
+        package = self.package("lazy_cache", {
+            "plugin.py": """
+                from danbi.plugable.IPlugin import IPlugin
+                class First(IPlugin):
+                    def plug(self, **kwargs): return True
+                    def unplug(self, **kwargs): return True
+                """,
+        })
+        cache_file = os.path.join(self.directory, "discovery.json")
+        PluginManager.setDiscoveryCache(cache_file)
+        try:
+            assert PluginManager().addPackagePath(package, lazy=True).getPlugins() == ["lazy_cache.plugin.First"]
+            with open(cache_file) as file:
+                assert any(path.endswith(os.path.join("lazy_cache", "plugin.py")) for path in json.load(file))
+
+            path = os.path.join(self.directory, package, "plugin.py")
+            stamp = os.stat(path).st_mtime_ns
+            with open(path, "a") as file:
+                file.write("class Second(First):\n    pass\n")
+            os.utime(path, ns=(stamp + 10**9, stamp + 10**9))
+            assert PluginManager().addPackagePath(package, lazy=True).getPlugins() == ["lazy_cache.plugin.First", "lazy_cache.plugin.Second"]
+        finally:
+            PluginManager.setDiscoveryCache(None)
+    
+    def plugins(self, package: str, plugins: dict) -> str:
+        # plugins: class name -> (delay, depends, asynchronous). every call is appended to the 'events' kwarg.
+        source = ["import time, asyncio", "from danbi.plugable import IPlugin, IPluginAsync"]
+        for name, (delay, depends, asynchronous) in plugins.items():
+            source += [
+                f"class {name}({'IPluginAsync' if asynchronous else 'IPlugin'}):",
+                f"    depends = {[f'{package}.plugins.{dep}' for dep in depends]!r}",
+            ]
+            for method in ("plug", "unplug"):
+                if asynchronous:
+                    source += [f"    async def {method}(self, events, **kwargs):", f"        await asyncio.sleep({delay})"]
+                else:
+                    source += [f"    def {method}(self, events, **kwargs):", f"        time.sleep({delay})"]
+                source += [f"        events.append(('{method}', '{name}'))", "        return True"]
+        return self.package(package, {"plugins.py": "\n".join(source) + "\n"})
+    
+    def test_order(self):
+        package = self.plugins("plug_order", {"A": (0, ["B"], False), "B": (0, ["C"], False), "C": (0, [], False), "D": (0, [], False)})
+        events = []
+        manager = PluginManager(events=events).addPackagePath(package, lazy=True)
+        manager.plug(f"{package}.plugins.A")
+        assert events == [("plug", "C"), ("plug", "B"), ("plug", "A")]
+
+        manager.plug()
+        manager.unplug(f"{package}.plugins.C")
+        assert events[3:] == [("plug", "D"), ("unplug", "A"), ("unplug", "B"), ("unplug", "C")]
+        assert set(manager.getTimings()) == {f"{package}.plugins.{name}" for name in "ABCD"}
+    
+    def test_workers(self):
+        package = self.plugins("plug_workers", {name: (0.3, [], False) for name in "ABCD"})
+        events = []
+        manager = PluginManager(events=events).addPackagePath(package)
+        manager.plug(workers=2, timeout=0.5)
+        assert sorted(events) == [("plug", name) for name in "ABCD"]
+        assert all(0.3 <= timing["plug"] < 0.5 for timing in manager.getTimings().values())
+    
+    def test_timeout(self):
+        package = self.plugins("plug_timeout", {"Slow": (0.5, [], False), "After": (0, ["Slow"], False)})
+        events = []
+        manager = PluginManager(events=events).addPackagePath(package)
+        with self.assertRaises(TimeoutError):
+            manager.plug(workers=2, timeout=0.1)
+        time.sleep(0.6)
+        assert events == [("plug", "Slow")]
+        assert manager.getTimings() == {}
+
+        manager.plug(f"{package}.plugins.After")
+        assert events[1:] == [("plug", "Slow"), ("plug", "After")]
+    
+    def test_async_dependency(self):
+        package = self.plugins("plug_async", {"Sync": (0, ["Async"], False), "Async": (0, [], True), "Other": (0, [], False)})
+        events = []
+        manager = PluginManager(events=events).addPackagePath(package)
+        with self.assertRaises(TypeError):
+            manager.plug(f"{package}.plugins.Sync")
+        with self.assertRaises(TypeError):
+            manager.plug()
+        assert events == []
+
+        asyncio.run(manager.plugAsync())
+        assert events.index(("plug", "Async")) < events.index(("plug", "Sync"))
+        with self.assertRaises(TypeError):
+            manager.unplug(f"{package}.plugins.Async")
+        asyncio.run(manager.unplugAsync())
+        assert len(events) == 6
+    
+    def test_unplug_lazy(self):
+        package = self.package("unplug_lazy", {
+            name.lower() + ".py": f"""
+                from danbi.plugable import IPlugin
+                class {name}(IPlugin):
+                    def plug(self, **kwargs): return True
+                    def unplug(self, **kwargs): return True
+                """ for name in ("First", "Second")
+        })
+        manager = PluginManager().addPackagePath(package, lazy=True)
+        manager.plug(f"{package}.first.First")
+        manager.unplug()
+        manager.unplug()
+        assert "unplug_lazy.first" in sys.modules
+        assert "unplug_lazy.second" not in sys.modules
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import contextvars
+from unittest import TestCase
+from danbi.database.QueryStats import QueryStats, QueryTrace
+from danbi.database.ConnMngSqliteWAL import ConnMngSqliteWAL
+from danbi.database.DBSqlite import DBSqlite
+from danbi.mapping.Jinja2Mapper import Jinja2Mapper
+
+MAPPER = """
+namespace: test
+tag: 1
+mapper:
+- name: code.create
+  temp: CREATE TABLE code (id INTEGER)
+- name: code.select
+  ttl: 60
+  temp: SELECT id FROM code
+"""
+
+class TestQueryStats(TestCase):
+    def trace(self, stats: QueryStats, mapper_name: str, sql: str = "SELECT 1") -> None:
+        with QueryTrace(stats, contextvars.ContextVar("trace"), mapper_name) as trace:
+            trace.lap("execute", sql)
+            trace.count(2, [(1,), (2,)])
+    
+    def test_record(self):
+        stats = QueryStats(slow_seconds=None)
+        self.trace(stats, "code.select")
+        self.trace(stats, "code.select")
+        self.trace(stats, None)
+
+        info = stats.getInfo()
+        assert (info["code.select"]["calls"], info["code.select"]["rows"]) == (2, 4)
+        assert info["code.select"]["phases"]["execute"]["count"] == 2
+        assert info["raw"]["calls"] == 1
+        assert stats.getSlowQueries() == []
+    
+    def test_slow(self):
+        stats = QueryStats(slow_seconds=0, slow_log_size=2)
+        for idx in range(3):
+            self.trace(stats, "code.select", f"SELECT {idx}")
+
+        assert [info["sql"] for info in stats.getSlowQueries()] == ["SELECT 1", "SELECT 2"]
+    
+    def test_hook(self):
+        stats = QueryStats()
+        infos = []
+        def broken(info: dict) -> None:
+            raise ValueError("broken hook")
+        stats.addHook(broken).addHook(infos.append)
+
+        with self.assertLogs("danbi.database", "ERROR"):
+            self.trace(stats, "code.select")
+        assert infos[0]["mapper"] == "code.select"
+        assert infos[0]["failed"] is False
+    
+    def test_prometheus(self):
+        stats = QueryStats()
+        self.trace(stats, 'code."select"')
+        text = stats.toPrometheus()
+
+        assert '# TYPE danbi_query_seconds histogram' in text
+        assert 'danbi_query_calls_total{mapper="code.\\"select\\""} 1' in text
+        assert 'le="+Inf"' in text
+    
+    def test_db(self):
+        directory = tempfile.mkdtemp()
+        try:
+            mapper_path = os.path.join(directory, "mapper.yaml")
+            with open(mapper_path, "w") as file:
+                file.write(MAPPER)
+            db = DBSqlite(ConnMngSqliteWAL().connect(database=os.path.join(directory, "test.db")), Jinja2Mapper([mapper_path], "test", 1))
+            db.setResultCache().setQueryStats()
+            db.execute("code.create")
+            db.query("code.select")
+            db.query("code.select")
+
+            phases = db.getQueryStats().getInfo()["code.select"]["phases"]
+            assert phases["total"]["count"] == 2
+            assert phases["execute"]["count"] == 1
+            assert phases["cache"]["count"] == 1
+            db.getManager().close()
+        finally:
+            shutil.rmtree(directory)
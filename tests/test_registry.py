@@ -0,0 +1,39 @@
+import gc
+from unittest import TestCase
+from danbi.database.ConnMngSqliteWAL import ConnMngSqliteWAL
+from danbi.database.DBSqlite import DBSqlite
+from danbi.mapping.Jinja2Mapper import Jinja2Mapper
+
+class TestRegistry(TestCase):
+    def test_manager(self):
+        manager = ConnMngSqliteWAL(name="test_registry")
+        assert ConnMngSqliteWAL.getNamed("test_registry") is manager
+        with self.assertRaises(ValueError):
+            ConnMngSqliteWAL(name="test_registry")
+
+        manager.unregister()
+        with self.assertRaises(KeyError):
+            ConnMngSqliteWAL.getNamed("test_registry")
+        other = ConnMngSqliteWAL(name="test_registry")
+        manager.unregister()
+        assert ConnMngSqliteWAL.getNamed("test_registry") is other
+
+        del other
+        gc.collect()
+        with self.assertRaises(KeyError):
+            ConnMngSqliteWAL.getNamed("test_registry")
+    
+    def test_db(self):
+        db = DBSqlite(ConnMngSqliteWAL(), Jinja2Mapper(), name="test_registry")
+        assert DBSqlite.getNamed("test_registry") is db
+        with self.assertRaises(ValueError):
+            DBSqlite(ConnMngSqliteWAL(), Jinja2Mapper(), name="test_registry")
+        db.unregister()
+        assert DBSqlite(ConnMngSqliteWAL(), Jinja2Mapper(), name="test_registry").getName() == "test_registry"
+    
+    def test_not_connected(self):
+        manager = ConnMngSqliteWAL()
+        with self.assertRaises(RuntimeError):
+            manager.getConnection()
+        with self.assertRaises(RuntimeError):
+            manager.getStats()
@@ -0,0 +1,68 @@
+import time
+from unittest import TestCase
+import pandas as pd
+from danbi.database.ResultCache import ResultCache
+
+class TestResultCache(TestCase):
+    def test_ttl(self):
+        cache = ResultCache()
+        cache.put("a", [(1,)], 0.05)
+
+        assert cache.get("a") == (True, [(1,)])
+        time.sleep(0.1)
+        assert cache.get("a") == (False, None)
+        assert cache.getInfo()["size"] == 0
+    
+    def test_lru(self):
+        cache = ResultCache(max_entries=2)
+        cache.put("a", 1, 60)
+        cache.put("b", 2, 60)
+        cache.get("a")
+        cache.put("c", 3, 60)
+
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, 1)
+        assert cache.get("c") == (True, 3)
+        assert cache.getInfo()["evictions"] == 1
+    
+    def test_bytes(self):
+        df = pd.DataFrame({"value": range(1000)})
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        cache = ResultCache(max_bytes=size * 2 + 1)
+        cache.put("a", df, 60)
+        cache.put("b", df.copy(), 60)
+        cache.put("c", df.copy(), 60)
+
+        info = cache.getInfo()
+        assert info["size"] == 2
+        assert info["bytes"] <= size * 2 + 1
+        assert cache.get("a") == (False, None)
+
+        cache.put("big", pd.DataFrame({"value": range(10000)}), 60)
+        assert cache.get("big") == (False, None)
+    
+    def test_tags(self):
+        cache = ResultCache()
+        cache.put("book", 1, 60, ["book"])
+        cache.put("author", 2, 60, ["author"])
+        cache.put("both", 3, 60, ["book", "author"])
+
+        assert cache.invalidate(["book"]) == 2
+        assert cache.get("book") == (False, None)
+        assert cache.get("both") == (False, None)
+        assert cache.get("author") == (True, 2)
+
+        assert cache.invalidate() == 1
+        assert cache.getInfo()["size"] == 0
+        assert cache.getInfo()["invalidations"] == 3
+    
+    def test_generation(self):
+        cache = ResultCache()
+        generation = cache.getGeneration()
+        cache.invalidate(["book"])
+
+        # a result loaded before the invalidation is not cached.
+        cache.put("book", 1, 60, ["book"], generation)
+        assert cache.get("book") == (False, None)
+        cache.put("book", 1, 60, ["book"], cache.getGeneration())
+        assert cache.get("book") == (True, 1)
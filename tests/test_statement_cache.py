@@ -0,0 +1,41 @@
+from unittest import TestCase
+from danbi.database.StatementCache import StatementCache
+
+class TestStatementCache(TestCase):
+    def test_lru(self):
+        cache = StatementCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+
+        assert cache.put("c", 3) == [("b", 2)]
+        assert cache.get("b") is None
+        assert cache.get("b", "default") == "default"
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert len(cache) == 2
+    
+    def test_unbounded(self):
+        cache = StatementCache(0)
+        for idx in range(1000):
+            assert cache.put(idx, idx) == []
+
+        assert len(cache) == 1000
+    
+    def test_clear(self):
+        cache = StatementCache(4)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        assert sorted(cache.clear()) == [("a", 1), ("b", 2)]
+        assert len(cache) == 0
+    
+    def test_info(self):
+        cache = StatementCache(4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+
+        info = cache.getInfo()
+        assert (info["hits"], info["misses"], info["size"], info["maxsize"]) == (2, 1, 1, 4)
+        assert abs(info["hit_rate"] - 2 / 3) < 1e-9
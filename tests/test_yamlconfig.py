@@ -0,0 +1,137 @@
+import os
+import sys
+import shutil
+import tempfile
+from unittest import TestCase
+from danbi.mapping.YAMLConfig import YAMLConfig
+
+CONFIG = """
+namespace: app
+tag: 1
+db:
+  hosts:
+  - name: primary
+    port: 5432
+  - name: replica
+    port: 5433
+  'a.b': dotted
+---
+namespace: app
+tag: [1, 2]
+db:
+  hosts: []
+---
+namespace: app
+tag: {major: 2}
+db:
+  hosts: []
+"""
+
+OTHER = """
+namespace: app
+tag: 1
+db:
+  hosts: []
+"""
+
+class TestYAMLConfig(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "config.yaml")
+        self.other = os.path.join(self.directory, "other.yaml")
+        with open(self.path, "w") as file:
+            file.write(CONFIG)
+        with open(self.other, "w") as file:
+            file.write(OTHER)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_index(self):
+        config = YAMLConfig([self.path, self.other])
+        assert [path for _, _, path in config.getSignatures()] == [self.path] * 3 + [self.other]
+        assert len(config.getConfig("app", 1)) == 2
+        assert config.getConfig("app", [1, 2])[0]["db"]["hosts"] == []
+        assert config.getConfig("app", {"major": 2})[0]["tag"] == {"major": 2}
+        with self.assertRaises(Exception):
+            config.getConfig("app", 3)
+        with self.assertRaises(Exception):
+            config.getConfig("app", [3])
+    
+    def test_reindex(self):
+        config = YAMLConfig([self.path])
+        config.setCurrent("app", [1, 2]).setValue("tag", 3)
+        assert config.getConfig("app", 3)[0]["db"]["hosts"] == []
+        with self.assertRaises(Exception):
+            config.getConfig("app", [1, 2])
+    
+    def test_path(self):
+        config = YAMLConfig([self.path])
+        assert config.getValue("db.hosts[1].port") == [5433]
+        assert config.getValue("db['a.b']") == ["dotted"]
+        assert config.getValue("db.hosts[-1][\"name\"]") == ["replica"]
+        assert config.getValues(["tag", "db.hosts[0].name"]) == {"tag": [1], "db.hosts[0].name": ["primary"]}
+
+        config.setValue("db.hosts[0].port", "__import__('os')")
+        assert config.getValue("db.hosts[0].port") == ["__import__('os')"]
+        with self.assertRaises(KeyError):
+            config.getValue("db.missing")
+    
+    def test_path_error(self):
+        config = YAMLConfig([self.path])
+        for dot_query in ("", "db..hosts", "db.", "db.hosts[x]", "db.hosts[0]port", ".db"):
+            with self.assertRaises(ValueError):
+                config.getValue(dot_query)
+    
+    def test_parse_cache(self):
+        cache_dir = os.path.join(self.directory, "cache")
+        YAMLConfig.setParseCache(cache_dir)
+        try:
+            docs = YAMLConfig.loadFile(self.path)
+            assert len(os.listdir(cache_dir)) == 1
+            assert YAMLConfig.loadFile(self.path) == docs
+
+            # an unchanged (mtime, size) is served from the cache without reading the file.
+            stat = os.stat(self.path)
+            with open(self.path, "w") as file:
+                file.write(CONFIG.replace("primary", "primarz"))
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            assert YAMLConfig.loadFile(self.path) == docs
+
+            stamp = os.stat(self.other).st_mtime_ns
+            YAMLConfig.loadFile(self.other)
+            with open(self.other, "w") as file:
+                file.write(OTHER.replace("tag: 1", "tag: 9"))
+            os.utime(self.other, ns=(stamp + 10**9, stamp + 10**9))
+            assert YAMLConfig.loadFile(self.other)[0]["tag"] == 9
+            assert YAMLConfig([self.other]).getConfig("app", 9)[0]["db"]["hosts"] == []
+
+            for cache_file in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, cache_file), "wb") as file:
+                    file.write(b"broken")
+            assert YAMLConfig.loadFile(self.path)[0]["db"]["hosts"][0]["name"] == "primarz"
+            assert YAMLConfig.loadFile(self.other)[0]["tag"] == 9
+        finally:
+            YAMLConfig.setParseCache(None)
+        assert YAMLConfig.loadFile(self.path)[0]["db"]["hosts"][0]["name"] == "primarz"
+    
+    def test_parse_cache_package(self):
+        package = os.path.join(self.directory, "yaml_package")
+        os.makedirs(package)
+        open(os.path.join(package, "__init__.py"), "w").close()
+        shutil.copy(self.path, os.path.join(package, "config.yaml"))
+        cache_dir = os.path.join(self.directory, "cache")
+        YAMLConfig.setParseCache(cache_dir)
+        sys.path.insert(0, self.directory)
+        try:
+            assert YAMLConfig(["config.yaml"], "yaml_package").getValue("db.hosts[0].port") == [5432]
+            cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            stat = os.stat(cache_file)
+
+            # an unchanged resource is read from the cache without writing it again.
+            assert YAMLConfig(["config.yaml"], "yaml_package").getValue("db.hosts[0].port") == [5432]
+            assert os.stat(cache_file).st_ino == stat.st_ino
+        finally:
+            sys.path.remove(self.directory)
+            sys.modules.pop("yaml_package", None)
+            YAMLConfig.setParseCache(None)